@@ -0,0 +1,253 @@
+"""
+Benchmark every Driver query and the page loads against the current graph.
+
+The query cache is disabled, so every call reaches Neo4j. Each benchmark is
+run ``--warmup`` times untimed and ``--repeat`` times timed. Query arguments
+(a CVE, a software sequence, a second-page cursor) are picked from the graph
+itself, so the runner works on any dataset, e.g. one built with
+``generate_graph.py``. Page loads issue the same calls as the Streamlit pages.
+
+Results are printed as a table and can be written as JSON. Given a baseline
+JSON from an earlier run, a benchmark whose median is more than
+``--threshold`` slower (and at least ``--min-delta-ms`` slower, to ignore
+noise on fast queries) is reported as a regression and the exit code is 1.
+Run from the repository root:
+
+    python benchmarks/driver_queries.py --output after.json --baseline before.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.async_connection import AsyncDriver  # noqa: E402
+from database.connection import Driver  # noqa: E402
+from database.frames import cursor_value  # noqa: E402
+from database.instrumentation import percentile  # noqa: E402
+
+
+def pick_arguments(driver):
+    """Realistic arguments for the parameterized queries, taken from the graph."""
+    with driver.session() as session:
+        record = session.run(
+            """
+            MATCH (v:Vulnerability)<-[:related_vulnerability]-(:Finding)
+            WITH v, COUNT(*) AS hits
+            ORDER BY hits DESC
+            LIMIT 1
+            RETURN v.cve AS cve
+            """
+        ).single()
+    cve = record['cve'] if record is not None else 'CVE-0000-0000'
+
+    catalog = driver.get_software_catalog()
+    search = (['publisher'], ['product'], ['1.0'], ['2.0'])
+    for publisher in catalog.publishers():
+        for product in catalog.products(publisher):
+            versions = catalog.versions(publisher, product)
+            if versions:
+                search = ([publisher], [product], [versions[0]], [versions[len(versions) // 2]])
+                break
+        else:
+            continue
+        break
+
+    first_page = driver.get_host_risk_page(page_size=50)
+    last = first_page.iloc[-1] if len(first_page) else None
+    after = (cursor_value(last['Total_Risk_Score']), cursor_value(last['ID'])) if last is not None else None
+    return {'cve': cve, 'search': search, 'after': after}
+
+
+def query_benchmarks(driver, args):
+    cve, search, after = args['cve'], args['search'], args['after']
+    return {
+        'get_general_summary': lambda: driver.get_general_summary(),
+        'get_hosts': lambda: driver.get_hosts(),
+        'get_critical_hosts': lambda: driver.get_critical_hosts(),
+        'get_findings': lambda: driver.get_findings(),
+        'get_vulnerabilities': lambda: driver.get_vulnerabilities(),
+        'get_findings_by_severity': lambda: driver.get_findings_by_severity(),
+        'get_total_unique_findings': lambda: driver.get_total_unique_findings(),
+        'get_host_criticality_count': lambda: driver.get_host_criticality_count(),
+        'get_host_criticality': lambda: driver.get_host_criticality(),
+        'get_software_catalog': lambda: driver.get_software_catalog(),
+        'get_systems_by_cve_vulnerability': lambda: driver.get_systems_by_cve_vulnerability(cve),
+        'advanced_search': lambda: driver.advanced_search(*search),
+        'get_host_risk_page (first)': lambda: driver.get_host_risk_page(),
+        'get_host_risk_page (next)': lambda: driver.get_host_risk_page(after),
+        'get_host_risk_page (cve)': lambda: driver.get_host_risk_page(cve=cve),
+        'get_host_risk_page (search)': lambda: driver.get_host_risk_page(search=search),
+        'get_host_filter_options': lambda: driver.get_host_filter_options(),
+        'get_mitigation': lambda: driver.get_mitigation(cve),
+        'get_country_count': lambda: driver.get_country_count(),
+    }
+
+
+def page_benchmarks(driver, async_driver, args):
+    """The queries each page issues on first load, in the same order and concurrency."""
+    cve, search = args['cve'], args['search']
+
+    def general():
+        driver.get_general_summary()
+
+    def investigation_fleet():
+        async_driver.gather(async_driver.get_host_criticality_count(), async_driver.get_host_filter_options())
+        driver.get_host_filter_options()
+        driver.get_host_risk_page()
+
+    def investigation_cve():
+        async_driver.gather(async_driver.get_systems_by_cve_vulnerability(cve), async_driver.get_mitigation(cve))
+        driver.get_host_filter_options()
+        driver.get_host_risk_page(cve=cve)
+
+    def investigation_search():
+        driver.get_software_catalog()
+        driver.advanced_search(*search)
+        driver.get_host_filter_options()
+        driver.get_host_risk_page(search=search)
+
+    def mitigations():
+        driver.get_mitigation(cve)
+
+    return {
+        'page: General': general,
+        'page: Investigation (all systems)': investigation_fleet,
+        'page: Investigation (CVE)': investigation_cve,
+        'page: Investigation (advanced search)': investigation_search,
+        'page: Mitigations': mitigations,
+    }
+
+
+def run(benchmark, warmup, repeat):
+    for _ in range(warmup):
+        benchmark()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        benchmark()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        'min_ms': timings[0],
+        'p50_ms': statistics.median(timings),
+        'p90_ms': percentile(timings, 0.9),
+        'mean_ms': statistics.fmean(timings),
+        'max_ms': timings[-1],
+        'runs': repeat,
+    }
+
+
+def graph_size(driver):
+    with driver.session() as session:
+        record = session.run(
+            """
+            CALL { MATCH (s:System) RETURN COUNT(s) AS systems }
+            CALL { MATCH (f:Finding) RETURN COUNT(f) AS findings }
+            CALL { MATCH (v:Vulnerability) RETURN COUNT(v) AS vulnerabilities }
+            CALL { MATCH (n:SoftwareInstallation) RETURN COUNT(n) AS software }
+            RETURN systems, findings, vulnerabilities, software
+            """
+        ).single()
+    return dict(record)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """
+    Returns:
+        list: ``(name, baseline_p50, p50, ratio)`` of every regressed benchmark.
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        delta = result['p50_ms'] - before['p50_ms']
+        if delta > min_delta_ms and result['p50_ms'] > before['p50_ms'] * (1 + threshold):
+            regressions.append((name, before['p50_ms'], result['p50_ms'], result['p50_ms'] / before['p50_ms']))
+    return regressions
+
+
+def print_table(results, baseline=None):
+    header = f"{'benchmark':<40}{'p50 ms':>10}{'p90 ms':>10}{'min ms':>10}{'max ms':>10}"
+    if baseline:
+        header += f"{'base p50':>10}{'change':>9}"
+    print(header)
+    print('-' * len(header))
+    for name, r in results.items():
+        line = f"{name:<40}{r['p50_ms']:>10.1f}{r['p90_ms']:>10.1f}{r['min_ms']:>10.1f}{r['max_ms']:>10.1f}"
+        before = (baseline or {}).get(name)
+        if before is not None:
+            line += f"{before['p50_ms']:>10.1f}{(r['p50_ms'] / before['p50_ms'] - 1) * 100:>+8.0f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the FuSec Driver queries and page loads.')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--only', help='Run only benchmarks whose name contains this text')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed p50 slowdown, 0.2 = 20%%')
+    parser.add_argument('--min-delta-ms', type=float, default=5.0, help='Ignore slowdowns smaller than this')
+    args = parser.parse_args()
+
+    driver = Driver()
+    async_driver = AsyncDriver()
+    driver.cache = async_driver.cache = None
+    driver.metrics = async_driver.metrics = None
+
+    arguments = pick_arguments(driver)
+    benchmarks = {**query_benchmarks(driver, arguments), **page_benchmarks(driver, async_driver, arguments)}
+    if args.only:
+        benchmarks = {name: b for name, b in benchmarks.items() if args.only in name}
+
+    results = {}
+    for name, benchmark in benchmarks.items():
+        print(f'{name} ...', file=sys.stderr)
+        results[name] = run(benchmark, args.warmup, args.repeat)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+
+    print_table(results, baseline)
+
+    if args.output:
+        report = {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'graph': graph_size(driver),
+            'arguments': {**arguments, 'after': list(arguments['after']) if arguments['after'] else None},
+            'repeat': args.repeat,
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        for name, before, after, ratio in regressions:
+            print(f'REGRESSION {name}: p50 {before:.1f} ms -> {after:.1f} ms ({ratio:.2f}x)')
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
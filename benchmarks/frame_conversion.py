@@ -0,0 +1,83 @@
+"""
+Benchmark DataFrame construction from Neo4j records: the per-row dict path
+(``pd.DataFrame([r.data() for r in result])``) against
+``database.frames.records_to_frame``.
+
+Records are generated lazily, the way a streaming result delivers them, and
+peak memory is measured with tracemalloc. Run from the repository root:
+
+    python benchmarks/frame_conversion.py [--rows 1000000]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+from neo4j import Record
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.frames import records_to_frame  # noqa: E402
+from database.queries import HOST_COLUMNS  # noqa: E402
+
+RISK_LEVELS = ['N/A', 'Low', 'Medium', 'High', 'Critical']
+TYPES = ['vm', 'container', 'bare-metal', 'database', 'function']
+STATES = ['running', 'stopped', 'terminated']
+
+
+def host_records(rows):
+    for i in range(rows):
+        yield Record(zip(HOST_COLUMNS, (
+            f'host-{i:08d}',
+            TYPES[i % len(TYPES)],
+            f'sub-{i % 17}',
+            STATES[i % len(STATES)],
+            i % 7 == 0 and 1 or 0,
+            (i * 7919) % 512,
+            RISK_LEVELS[i % len(RISK_LEVELS)],
+        )))
+
+
+def dict_rows(records):
+    return pd.DataFrame([r.data() for r in records])
+
+
+def measure(convert, rows):
+    """Time one conversion, then repeat it under tracemalloc for the peak memory."""
+    gc.collect()
+    started = time.perf_counter()
+    df = convert(host_records(rows))
+    seconds = time.perf_counter() - started
+    size = int(df.memory_usage(index=True, deep=True).sum())
+    del df
+
+    gc.collect()
+    tracemalloc.start()
+    convert(host_records(rows))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark record to DataFrame conversion.')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    results = {
+        'dict rows': measure(dict_rows, args.rows),
+        'columnar': measure(records_to_frame, args.rows),
+    }
+    print(f"{args.rows} rows")
+    print(f"{'path':<12}{'time (s)':>10}{'peak (MiB)':>12}{'frame (MiB)':>13}")
+    for name, (seconds, peak, size) in results.items():
+        print(f"{name:<12}{seconds:>10.2f}{peak / 2**20:>12.1f}{size / 2**20:>13.1f}")
+    base, new = results['dict rows'], results['columnar']
+    print(f"time {base[0] / new[0]:.1f}x faster, peak memory {base[1] / new[1]:.1f}x lower, frame {base[2] / new[2]:.1f}x smaller")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Generate a synthetic FuSec graph at a given scale for benchmarking.
+
+Hosts get a type, state, provider, country and critical flag, zero or more
+applications, findings and software installations. Findings are drawn from a
+shared pool of weaknesses with a skewed popularity, so a few CVEs affect large
+parts of the fleet and most affect a handful of hosts, as in real scans. Each
+weakness has a fixed severity (50% Low, 30% Medium, 20% High) and about 5% of
+CVEs are known exploited.
+
+The rows go through ``database.ingest``, so the graph has exactly the shape
+the scanner import produces; risk scores are materialized and the dashboard
+counters reconciled at the end. The
+same ``--hosts`` and ``--seed`` always produce the same graph. Run from the
+repository root against a local, disposable Neo4j:
+
+    python benchmarks/generate_graph.py --hosts 100000 [--clear]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.connection import Driver  # noqa: E402
+from database.ingest import ingest  # noqa: E402
+from database.risk import materialize_risk_scores  # noqa: E402
+from database.schema import ensure_schema  # noqa: E402
+from database.statistics import reconcile  # noqa: E402
+
+COUNTRIES = [
+    'Germany', 'United States', 'France', 'United Kingdom', 'Netherlands', 'Ireland', 'Sweden', 'Poland',
+    'Spain', 'Italy', 'Switzerland', 'Austria', 'Canada', 'Brazil', 'India', 'Japan', 'Singapore',
+    'Australia', 'South Africa', 'Mexico',
+]
+PROVIDERS = ['AWS', 'Azure', 'GCP', 'On-Premise']
+TYPES = {'VM': ['Linux', 'Windows'], 'Container': ['Docker', 'Kubernetes'], 'Database': ['PostgreSQL', 'MSSQL']}
+STATES = ['running', 'stopped', 'terminated']
+APPLICATIONS = ['nginx', 'api-gateway', 'billing', 'crm', 'jenkins', 'grafana', 'erp', 'webshop']
+SEVERITIES = [('Low', 0.5), ('Medium', 0.3), ('High', 0.2)]
+SOFTWARE = {
+    'Microsoft': ['Windows Server', '.NET Runtime', 'SQL Server', 'Edge'],
+    'Oracle': ['Java SE', 'MySQL'],
+    'Apache': ['HTTP Server', 'Tomcat', 'Log4j'],
+    'OpenSSL Project': ['OpenSSL'],
+    'Canonical': ['Ubuntu'],
+    'Mozilla': ['Firefox'],
+    'Google': ['Chrome'],
+    'PostgreSQL Global Development Group': ['PostgreSQL'],
+}
+
+
+def weaknesses(hosts, rng):
+    """Pool of (title, severity, cve, kev) shared by all hosts, growing with the fleet."""
+    pool = []
+    for i in range(max(200, int(hosts ** 0.75))):
+        year = 2015 + i % 10
+        severity = rng.choices([s for s, _ in SEVERITIES], [w for _, w in SEVERITIES])[0]
+        pool.append((f'Weakness {i:06d}', severity, f'CVE-{year}-{10000 + i}', rng.random() < 0.05))
+    return pool
+
+
+def software_catalog(rng):
+    catalog = []
+    for publisher, products in SOFTWARE.items():
+        for product in products:
+            major = rng.randint(1, 20)
+            for minor in range(rng.randint(3, 12)):
+                for patch in range(rng.randint(1, 6)):
+                    catalog.append((publisher, product, f'{major}.{minor}.{patch}'))
+            catalog.append((publisher, product, f'{major + 1}.0.0-rc1'))
+    return catalog
+
+
+def _skewed(rng, size, power=3):
+    """Index into a pool of ``size`` entries, favouring low indexes; higher powers skew harder."""
+    return int(size * rng.random() ** power)
+
+
+def finding_rows(hosts, seed=0, findings_per_host=8):
+    rng = random.Random(seed)
+    pool = weaknesses(hosts, rng)
+    for i in range(hosts):
+        system_id = f'host-{i:07d}'
+        system_type = rng.choice(list(TYPES))
+        system = {
+            'system_id': system_id,
+            'system_type': system_type,
+            'system_sub_type': rng.choice(TYPES[system_type]),
+            'system_state': rng.choices(STATES, [0.8, 0.15, 0.05])[0],
+            'provider_name': rng.choice(PROVIDERS),
+            'critical': 1 if rng.random() < 0.1 else 0,
+            'country': COUNTRIES[_skewed(rng, len(COUNTRIES), 2)],
+        }
+        applications = rng.sample(APPLICATIONS, rng.choices([0, 1, 2], [0.5, 0.35, 0.15])[0])
+        # Healthy hosts exist: about 10% have no findings at all
+        count = 0 if rng.random() < 0.1 else int(rng.expovariate(1 / findings_per_host)) + 1
+        titles = {_skewed(rng, len(pool)) for _ in range(count)}
+        if not titles:
+            yield system
+        for n, index in enumerate(sorted(titles)):
+            title, severity, cve, kev = pool[index]
+            row = {
+                **system,
+                'finding_id': f'{system_id}-{n}',
+                'title': title,
+                'severity': severity,
+                'known_exploited_vulnerability': 'TRUE' if kev else 'FALSE',
+                'cve': cve,
+            }
+            if applications and rng.random() < 0.5:
+                row['application'] = rng.choice(applications)
+            yield row
+
+
+def software_rows(hosts, seed=0, software_per_host=6):
+    rng = random.Random(seed + 1)
+    catalog = software_catalog(rng)
+    for i in range(hosts):
+        for index in {rng.randrange(len(catalog)) for _ in range(software_per_host)}:
+            publisher, product, version = catalog[index]
+            yield {'system_id': f'host-{i:07d}', 'publisher': publisher, 'product': product, 'version': version}
+
+
+def clear_graph(driver):
+    with driver.session() as session:
+        session.run(
+            """
+            MATCH (n)
+            CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS
+            """
+        ).consume()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic FuSec graph.')
+    parser.add_argument('--hosts', type=int, default=10_000, help='Number of systems, e.g. 1000 to 1000000')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--findings-per-host', type=int, default=8, help='Mean findings per affected host')
+    parser.add_argument('--software-per-host', type=int, default=6)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--clear', action='store_true', help='Delete the whole existing graph first')
+    args = parser.parse_args()
+
+    driver = Driver()
+    driver.cache = None
+    if args.clear:
+        print('Deleting the existing graph')
+        clear_graph(driver)
+    with driver.session() as session:
+        ensure_schema(session)
+
+    started = time.perf_counter()
+    stats = ingest(finding_rows(args.hosts, args.seed, args.findings_per_host), 'findings', driver,
+                   args.workers, args.batch_size, materialize=False)
+    print(f"findings: {stats['rows']} rows in {stats['seconds']:.1f}s")
+    stats = ingest(software_rows(args.hosts, args.seed, args.software_per_host), 'software', driver,
+                   args.workers, args.batch_size, materialize=False)
+    print(f"software: {stats['rows']} rows in {stats['seconds']:.1f}s")
+    print(f"risk scores: {materialize_risk_scores(driver, full=True)} systems")
+    counter_drift, _ = reconcile(driver)
+    print(f"statistics: reconciled, {len(counter_drift)} counters drifted")
+    print(f"Generated {args.hosts} hosts in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
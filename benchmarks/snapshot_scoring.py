@@ -0,0 +1,109 @@
+"""
+Benchmark fleet-wide risk scoring and the ranking queries on a GraphSnapshot.
+
+The snapshot arrays are generated directly with NumPy (random severities, KEV
+flags, critical hosts and CSR adjacency), so a million-host fleet is ready in
+seconds and no database is needed. Run from the repository root:
+
+    python benchmarks/snapshot_scoring.py [--hosts 1000000] [--findings-per-host 8]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database.snapshot import ARRAYS, GraphSnapshot, SnapshotDriver, _csr  # noqa: E402
+
+
+def synthetic_snapshot(hosts, findings_per_host, seed=0):
+    rng = np.random.default_rng(seed)
+    findings = hosts * findings_per_host
+    owners = rng.integers(0, hosts, findings)
+    via_application = rng.random(findings) < 0.3
+    cves = 50_000
+    arrays = {
+        'system_id': np.char.add('host-', np.char.zfill(np.arange(hosts).astype(str), 7)),
+        'system_type': rng.integers(0, 3, hosts, dtype=np.int32),
+        'system_sub_type': rng.integers(0, 6, hosts, dtype=np.int32),
+        'system_state': rng.integers(0, 3, hosts, dtype=np.int32),
+        'system_provider': rng.integers(0, 4, hosts, dtype=np.int32),
+        'system_country': rng.integers(0, 20, hosts, dtype=np.int32),
+        'system_critical': (rng.random(hosts) < 0.1).astype(np.int8),
+        'finding_severity': rng.choice(3, findings, p=[0.5, 0.3, 0.2]).astype(np.int32),
+        'finding_title': rng.integers(0, cves, findings, dtype=np.int32),
+        'finding_kev': rng.random(findings) < 0.05,
+        'installation_publisher': np.zeros(0, dtype=np.int32),
+        'installation_product': np.zeros(0, dtype=np.int32),
+        'installation_version': np.zeros(0, dtype=np.int32),
+        'installation_version_key': np.zeros(0, dtype=str),
+    }
+    finding_ids = np.arange(findings)
+    arrays['system_findings_indptr'], arrays['system_findings_indices'] = _csr(
+        owners[~via_application], finding_ids[~via_application], hosts)
+    arrays['system_application_findings_indptr'], arrays['system_application_findings_indices'] = _csr(
+        owners[via_application], finding_ids[via_application], hosts)
+    arrays['application_id'] = np.zeros(0, dtype=str)
+    arrays['application_systems_indptr'], arrays['application_systems_indices'] = _csr([], [], 0)
+    arrays['application_findings_indptr'], arrays['application_findings_indices'] = _csr([], [], 0)
+    arrays['finding_cves_indptr'], arrays['finding_cves_indices'] = _csr(
+        finding_ids, arrays['finding_title'], findings)
+    arrays['system_software_indptr'], arrays['system_software_indices'] = _csr([], [], hosts)
+    assert set(arrays) == set(ARRAYS)
+
+    labels = {
+        'type': ['VM', 'Container', 'Database'],
+        'sub_type': ['Linux', 'Windows', 'Docker', 'Kubernetes', 'PostgreSQL', 'MSSQL'],
+        'state': ['running', 'stopped', 'terminated'],
+        'provider': ['AWS', 'Azure', 'GCP', 'On-Premise'],
+        'country': [f'Country {i}' for i in range(20)],
+        'severity': ['Low', 'Medium', 'High'],
+        'title': [f'Weakness {i}' for i in range(cves)],
+        'cve': [f'CVE-2024-{i:05d}' for i in range(cves)],
+        'publisher': [],
+        'product': [],
+        'version': [],
+    }
+    return GraphSnapshot(arrays, labels)
+
+
+def timed(label, function, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    print(f"{label:<36}{min(timings):>10.1f}{sorted(timings)[len(timings) // 2]:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark vectorized risk scoring on a synthetic snapshot.')
+    parser.add_argument('--hosts', type=int, default=1_000_000)
+    parser.add_argument('--findings-per-host', type=int, default=8)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    snapshot = synthetic_snapshot(args.hosts, args.findings_per_host)
+    print(f"{args.hosts} hosts, {len(snapshot.finding_severity)} findings, "
+          f"built and scored in {time.perf_counter() - started:.1f}s")
+    snapshot.ranking  # noqa: B018, sorted once per snapshot
+    driver = SnapshotDriver(snapshot)
+    kev = snapshot.finding_kev | (snapshot.finding_title == 0)
+
+    print(f"{'benchmark':<36}{'min ms':>10}{'p50 ms':>10}")
+    timed('score (fleet)', snapshot.score)
+    timed('score (what-if: one CVE becomes KEV)', lambda: snapshot.score(finding_kev=kev))
+    timed('get_host_criticality_count', driver.get_host_criticality_count)
+    timed('get_host_criticality', driver.get_host_criticality)
+    timed('get_systems_by_cve_vulnerability', lambda: driver.get_systems_by_cve_vulnerability('CVE-2024-00000'))
+    timed('get_host_risk_page (filtered)', lambda: driver.get_host_risk_page(types=['VM'], states=['running']))
+    timed('get_general_summary', driver.get_general_summary)
+    timed('get_blast_radius (one CVE)', lambda: driver.get_blast_radius(['CVE-2024-00000']))
+    timed('get_blast_radius (100 CVEs)', lambda: driver.get_blast_radius([f'CVE-2024-{i:05d}' for i in range(100)]))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,27 +1,23 @@
 import streamlit as st
 
-from database.connection import Driver
+from database.backend import create_driver
+from database.hll import approximate_mode
 from visualization.dashboard import Dashboard
 
 st.set_page_config(layout="wide")
 
-driver = Driver()
+driver = create_driver()
 dashboard = Dashboard()
 
-findings_by_severity = driver.get_findings_by_severity()
-total_unique_findings = driver.get_total_unique_findings()
+summary = driver.get_general_summary()
 
-total_hosts = driver.get_hosts()
-total_findings = driver.get_findings()
-total_vulnerabilities = driver.get_vulnerabilities()
-total_critical_hosts = driver.get_critical_hosts()
-country_count = driver.get_country_count()
 
-
-dashboard.display_general_dashboard(total_hosts, total_critical_hosts, total_findings, total_unique_findings, total_vulnerabilities)
+dashboard.display_general_dashboard(summary)
+if approximate_mode():
+    dashboard.display_distinct_slice(driver)
 with st.container(border=True):
     col1, col2 = st.columns(2)
     with col1:
-        dashboard.display_findings_dashboard(findings_by_severity, total_unique_findings)
+        dashboard.display_findings_dashboard(summary)
     with col2:
-        dashboard.display_country_dashboard(country_count)
\ No newline at end of file
+        dashboard.display_country_dashboard(summary)
\ No newline at end of file
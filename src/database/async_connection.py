@@ -0,0 +1,149 @@
+"""
+Async counterpart of Driver, built on the Neo4j async driver.
+
+Streamlit runs pages synchronously, so the async driver lives on one
+background event loop per process and ``AsyncDriver.gather`` runs a set of
+independent queries on it concurrently:
+
+    count_df, table_df = driver.gather(
+        driver.get_host_criticality_count(),
+        driver.get_host_criticality(),
+    )
+
+Page latency is then roughly that of the slowest query rather than the sum.
+"""
+import asyncio
+import atexit
+from contextlib import asynccontextmanager
+import threading
+
+from neo4j import AsyncGraphDatabase
+
+from database.connection import Driver, SessionUsage, get_query_cache, get_query_metrics, register_pool
+from database.instrumentation import instrument
+from database.reads import ENSURE_RISK_SCORES, Call, bind_reads
+from database.settings import get_setting
+
+
+class AsyncRuntime:
+    """Background event loop thread owning the process-wide async Neo4j driver."""
+
+    def __init__(self):
+        self.max_connection_pool_size = get_setting('NEO4J', 'MAX_CONNECTION_POOL_SIZE', 50, int)
+        self.connection_acquisition_timeout = get_setting('NEO4J', 'CONNECTION_ACQUISITION_TIMEOUT', 30.0, float)
+        self.max_connection_lifetime = get_setting('NEO4J', 'MAX_CONNECTION_LIFETIME', 3600.0, float)
+        self.fetch_size = get_setting('NEO4J', 'FETCH_SIZE', 1000, int)
+        self.usage = SessionUsage()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='neo4j-async', daemon=True)
+        self.thread.start()
+        self.driver = self.run(self._create_driver())
+
+    async def _create_driver(self):
+        return AsyncGraphDatabase.driver(
+            get_setting('NEO4J', 'URI'),
+            auth=(get_setting('NEO4J', 'USER'), get_setting('NEO4J', 'PASSWORD')),
+            max_connection_pool_size=self.max_connection_pool_size,
+            connection_acquisition_timeout=self.connection_acquisition_timeout,
+            max_connection_lifetime=self.max_connection_lifetime,
+        )
+
+    @asynccontextmanager
+    async def session(self, **config):
+        config.setdefault('fetch_size', self.fetch_size)
+        self.usage.opened()
+        failed = False
+        try:
+            async with self.driver.session(**config) as session:
+                yield session
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.usage.closed(failed)
+
+    def stats(self):
+        return {
+            'max_connection_pool_size': self.max_connection_pool_size,
+            'connection_acquisition_timeout': self.connection_acquisition_timeout,
+            'max_connection_lifetime': self.max_connection_lifetime,
+            'fetch_size': self.fetch_size,
+            **self.usage.stats(),
+        }
+
+    def run(self, coroutine):
+        """Run a coroutine on the background loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def close(self):
+        self.run(self.driver.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+
+def get_async_runtime():
+    global _runtime
+    if _runtime is None:
+        with _runtime_lock:
+            if _runtime is None:
+                _runtime = AsyncRuntime()
+                register_pool('async', _runtime.stats)
+    return _runtime
+
+
+@atexit.register
+def close_async_runtime():
+    global _runtime
+    with _runtime_lock:
+        if _runtime is not None:
+            _runtime.close()
+            _runtime = None
+
+
+@bind_reads(asynchronous=True)
+class AsyncDriver:
+    """Async Neo4j backend. The read methods come from ``database.reads``."""
+
+    def __init__(self):
+        self.runtime = get_async_runtime()
+        self.driver = self.runtime.driver
+        self.cache = get_query_cache()
+        self.metrics = get_query_metrics()
+
+    def gather(self, *coroutines):
+        """Run independent query coroutines concurrently and return their results in order."""
+        async def gather():
+            return await asyncio.gather(*coroutines)
+
+        return self.runtime.run(gather())
+
+    def session(self, **config):
+        return self.runtime.session(**config)
+
+    def pool_stats(self):
+        return self.runtime.stats()
+
+    async def _execute(self, name, query, convert, **params):
+        async with self.session() as session:
+            with instrument(self.metrics, name, query, params) as probe:
+                result = await session.run(probe.query, params)
+                records = [record async for record in result]
+                probe.finish(await result.consume())
+                return convert(probe.count(records))
+
+    async def _ensure_risk_scores(self):
+        from database.risk import ensure_risk_scores
+
+        # Materializing uses the sync driver, so keep it off the event loop
+        await asyncio.to_thread(ensure_risk_scores, Driver())
+
+    async def _request(self, request):
+        if request == ENSURE_RISK_SCORES:
+            return await self._ensure_risk_scores()
+        if isinstance(request, Call):
+            return await getattr(self, request.method)(*request.args)
+        return await self._execute(request.name, request.query, request.convert, **request.params)
@@ -0,0 +1,142 @@
+"""
+Read interface shared by the query backends, and the factory the pages use.
+
+``Driver`` answers every method with Cypher against Neo4j.
+``SnapshotDriver`` (``database.snapshot``) answers them from an in-memory,
+array-backed copy of the graph, without a database. The backend is chosen by
+``[BACKEND] TYPE``: ``neo4j`` (default) or ``snapshot``.
+"""
+import abc
+
+from database.settings import get_setting
+
+
+class QueryBackend(abc.ABC):
+    """
+    Read methods behind the dashboards. Implementations return the same shapes:
+    scalars, DataFrames with the column names of ``database.queries``, a
+    ``SoftwareCatalog``, and ``(top_hosts, distribution)`` tuples for breakdowns.
+    """
+
+    @abc.abstractmethod
+    def get_general_summary(self):
+        """Dict of the General page totals, ``findings_by_severity`` and ``country_count``."""
+
+    @abc.abstractmethod
+    def get_hosts(self):
+        pass
+
+    @abc.abstractmethod
+    def get_critical_hosts(self):
+        pass
+
+    @abc.abstractmethod
+    def get_findings(self):
+        pass
+
+    @abc.abstractmethod
+    def get_vulnerabilities(self):
+        pass
+
+    @abc.abstractmethod
+    def get_findings_by_severity(self):
+        pass
+
+    @abc.abstractmethod
+    def get_total_unique_findings(self):
+        pass
+
+    @abc.abstractmethod
+    def get_host_criticality_count(self):
+        pass
+
+    @abc.abstractmethod
+    def get_host_criticality(self):
+        pass
+
+    @abc.abstractmethod
+    def get_software_catalog(self):
+        pass
+
+    @abc.abstractmethod
+    def get_systems_by_cve_vulnerability(self, cve):
+        pass
+
+    @abc.abstractmethod
+    def advanced_search(self, publishers, products=None, min_versions=None, max_versions=None):
+        pass
+
+    @abc.abstractmethod
+    def get_host_risk_page(self, after=None, page_size=50, types=None, states=None, providers=None,
+                           include_na=False, cve=None, search=None):
+        pass
+
+    @abc.abstractmethod
+    def get_host_filter_options(self):
+        pass
+
+    @abc.abstractmethod
+    def get_mitigation(self, cve):
+        pass
+
+    @abc.abstractmethod
+    def get_country_count(self):
+        pass
+
+    def get_publishers(self):
+        return self.get_software_catalog().publishers()
+
+    def get_products(self, publisher):
+        return self.get_software_catalog().products(publisher)
+
+    def get_versions(self, publisher, product):
+        return self.get_software_catalog().versions(publisher, product)
+
+    def get_blast_radius(self, cves, via_software=True, min_share=0.5, min_lift=2.0):
+        """
+        Every host and application affected by ``cves``, directly, through an
+        application or through shared software, with counts by country, provider
+        and risk level. See ``database.snapshot.blast_radius_report``.
+
+        The multi-hop expansion runs on the adjacency index of a graph snapshot
+        rather than as a variable-length Cypher pattern, so it stays interactive on
+        large graphs. The result is as fresh as the snapshot, see ``as_of``.
+
+        Returns:
+            dict: The report, or None while the first snapshot is being built.
+        """
+        from database.snapshot import blast_radius_report, get_snapshot
+
+        return blast_radius_report(get_snapshot(), cves, via_software, min_share, min_lift)
+
+    def get_distinct_estimates(self, countries=None, providers=None):
+        """HyperLogLog estimates of the distinct counts of a slice, or None without sketches."""
+        return None
+
+    def get_sketch_partitions(self):
+        """``(countries, providers)`` that have sketches."""
+        return [], []
+
+    def pool_stats(self):
+        return None
+
+    def cache_stats(self):
+        return None
+
+
+def backend_type():
+    return get_setting('BACKEND', 'TYPE', 'neo4j').lower()
+
+
+def create_driver():
+    """Return a Driver for the configured backend."""
+    kind = backend_type()
+    if kind == 'neo4j':
+        from database.connection import Driver
+
+        return Driver()
+    if kind == 'snapshot':
+        from database.snapshot import SnapshotDriver
+
+        return SnapshotDriver()
+    raise ValueError(f"Unknown [BACKEND] TYPE {kind!r}, expected 'neo4j' or 'snapshot'")
@@ -0,0 +1,225 @@
+import asyncio
+from collections import OrderedDict
+import functools
+import inspect
+import logging
+import sys
+import threading
+import time
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def _sizeof(value):
+    """Rough in-memory size of a cached query result in bytes."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(_sizeof(v) for v in value)
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    return sys.getsizeof(value)
+
+
+def _freeze(value):
+    """Turn query arguments into something hashable for use in a cache key."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, set):
+        return tuple(sorted(_freeze(v) for v in value))
+    return value
+
+
+class QueryCache:
+    """
+    Thread-safe LRU cache for query results with a TTL, a memory bound and
+    invalidation on graph changes.
+
+    ``version_loader`` returns the current data version of the graph. It is
+    polled at most every ``version_check_interval`` seconds and the whole cache
+    is dropped whenever the returned value changes. The loader runs outside the
+    cache lock; if it fails, e.g. while the database is briefly unreachable, the
+    last known version is kept and cached results continue to be served.
+
+    Every drop starts a new generation. ``put`` skips a value computed in an
+    earlier generation, so a result that was being computed while the cache was
+    invalidated is not stored under the new data version.
+
+    Cached values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, ttl=300.0, max_bytes=256 * 1024 * 1024, version_loader=None, version_check_interval=5.0):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.version_loader = version_loader
+        self.version_check_interval = version_check_interval
+
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self._version = None
+        self._version_checked_at = 0.0
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def version_check_due(self):
+        """Whether the next ``check_version`` would poll the loader."""
+        return (self.version_loader is not None
+                and time.monotonic() - self._version_checked_at >= self.version_check_interval)
+
+    def check_version(self):
+        """Poll the data version if the check interval has passed, dropping the cache if it changed."""
+        if self.version_loader is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if now - self._version_checked_at < self.version_check_interval:
+                return
+            # Claimed before loading, so concurrent readers do not all query the version
+            self._version_checked_at = now
+        try:
+            version = self.version_loader()
+        except Exception as e:
+            logger.warning("Data version check failed, keeping version %r: %s", self._version, e)
+            return
+        with self._lock:
+            if version != self._version:
+                if self._entries:
+                    self.invalidations += 1
+                self._clear()
+                self._version = version
+
+    def _clear(self):
+        self._entries.clear()
+        self._bytes = 0
+        self._generation += 1
+
+    @property
+    def generation(self):
+        """Incremented whenever the cache is dropped; pass it to ``put``."""
+        return self._generation
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key, check_version=True):
+        """
+        Return ``(True, value)`` on a hit and ``(False, None)`` on a miss. With
+        ``check_version=False`` the caller has already called ``check_version``.
+        """
+        if check_version:
+            self.check_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, _, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                self._remove(key)
+                self.expirations += 1
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value, ttl=None, generation=None):
+        """
+        Store a value. With ``generation``, the value read before computing it,
+        the value is dropped if the cache was invalidated in the meantime.
+        """
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self):
+        with self._lock:
+            self.invalidations += 1
+            self._clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'data_version': self._version,
+            }
+
+
+def cached(method=None, ttl=None):
+    """
+    Cache a Driver read method in ``self.cache``, keyed on the method name and
+    its arguments. Set ``self.cache`` to ``None`` to bypass the cache.
+
+    Coroutine methods are supported, so Driver and AsyncDriver methods of the
+    same name share cache entries. For those, the data version is polled in a
+    worker thread rather than on the event loop.
+    """
+    if method is None:
+        return functools.partial(cached, ttl=ttl)
+
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def async_wrapper(self, *args, **kwargs):
+            cache = getattr(self, 'cache', None)
+            if cache is None:
+                return await method(self, *args, **kwargs)
+            key = (method.__name__, _freeze(args), _freeze(kwargs))
+            if cache.version_check_due():
+                await asyncio.to_thread(cache.check_version)
+            hit, value = cache.get(key, check_version=False)
+            if hit:
+                return value
+            generation = cache.generation
+            value = await method(self, *args, **kwargs)
+            cache.put(key, value, ttl=ttl, generation=generation)
+            return value
+
+        return async_wrapper
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        cache = getattr(self, 'cache', None)
+        if cache is None:
+            return method(self, *args, **kwargs)
+        key = (method.__name__, _freeze(args), _freeze(kwargs))
+        hit, value = cache.get(key)
+        if hit:
+            return value
+        generation = cache.generation
+        value = method(self, *args, **kwargs)
+        cache.put(key, value, ttl=ttl, generation=generation)
+        return value
+
+    return wrapper
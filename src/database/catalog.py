@@ -0,0 +1,78 @@
+from bisect import bisect_left
+
+from database.versions import sort_versions
+
+
+class SoftwareCatalog:
+    """
+    In-memory publisher -> product -> versions tree of the software inventory.
+
+    Built from a single query by ``Driver.get_software_catalog`` and used by the
+    advanced search dropdowns, so the cascade never touches the database.
+    Publishers and products are sorted case-insensitively, versions newest first.
+    """
+
+    def __init__(self, rows):
+        tree = {}
+        for publisher, product, versions in rows:
+            if publisher is None or product is None:
+                continue
+            products = tree.setdefault(publisher, {})
+            products.setdefault(product, set()).update(v for v in versions if v is not None)
+
+        self._tree = {
+            publisher: {product: sort_versions(versions, reverse=True) for product, versions in products.items()}
+            for publisher, products in tree.items()
+        }
+        self._publishers = sorted(self._tree, key=str.lower)
+        self._publisher_keys = [p.lower() for p in self._publishers]
+        self._products = {
+            publisher: sorted(products, key=str.lower) for publisher, products in self._tree.items()
+        }
+
+    def __len__(self):
+        return len(self._publishers)
+
+    @staticmethod
+    def _prefixed(names, keys, prefix):
+        if not prefix:
+            return list(names)
+        prefix = prefix.lower()
+        start = bisect_left(keys, prefix)
+        end = start
+        while end < len(keys) and keys[end].startswith(prefix):
+            end += 1
+        return names[start:end]
+
+    def publishers(self, prefix=''):
+        return self._prefixed(self._publishers, self._publisher_keys, prefix)
+
+    def products(self, publisher, prefix=''):
+        products = self._products.get(publisher, [])
+        if not prefix:
+            return list(products)
+        prefix = prefix.lower()
+        return [p for p in products if p.lower().startswith(prefix)]
+
+    def versions(self, publisher, product):
+        return list(self._tree.get(publisher, {}).get(product, []))
+
+    def complete(self, prefix, limit=20):
+        """
+        Type-ahead over publishers and products.
+
+        Returns:
+            list: Up to ``limit`` ``(publisher, product)`` pairs, where product is
+            None for a matching publisher.
+        """
+        matches = [(publisher, None) for publisher in self.publishers(prefix)[:limit]]
+        lowered = prefix.lower()
+        for publisher in self._publishers:
+            if len(matches) >= limit:
+                break
+            for product in self._products[publisher]:
+                if product.lower().startswith(lowered):
+                    matches.append((publisher, product))
+                    if len(matches) >= limit:
+                        break
+        return matches
@@ -1,458 +1,285 @@
 from neo4j import GraphDatabase
-import configparser
-import os
-import pandas as pd
+from contextlib import contextmanager
+import atexit
+import threading
 
+from database.backend import QueryBackend
+from database.cache import QueryCache
+from database.instrumentation import MetricsExporter, QueryMetrics, instrument
+from database.reads import ENSURE_RISK_SCORES, Call, bind_reads
+from database.settings import get_setting
+
+
+class SessionUsage:
+    """Thread-safe counts of the sessions a pool has handed out."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._peak_in_use = 0
+        self._sessions_opened = 0
+        self._failed_sessions = 0
+
+    def opened(self):
+        with self._lock:
+            self._in_use += 1
+            self._sessions_opened += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+
+    def closed(self, failed=False):
+        with self._lock:
+            self._in_use -= 1
+            if failed:
+                self._failed_sessions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sessions_in_use': self._in_use,
+                'peak_sessions_in_use': self._peak_in_use,
+                'sessions_opened': self._sessions_opened,
+                'failed_sessions': self._failed_sessions,
+            }
+
+
+class ConnectionPool:
+    """
+    Process-wide Neo4j driver shared by every Streamlit session and rerun.
+
+    Wraps the ``GraphDatabase.driver`` so pool sizing comes from config and
+    session usage can be reported through ``stats()``.
+    """
+
+    def __init__(self):
+        self.uri = get_setting('NEO4J', 'URI')
+        self.max_connection_pool_size = get_setting('NEO4J', 'MAX_CONNECTION_POOL_SIZE', 50, int)
+        self.connection_acquisition_timeout = get_setting('NEO4J', 'CONNECTION_ACQUISITION_TIMEOUT', 30.0, float)
+        self.max_connection_lifetime = get_setting('NEO4J', 'MAX_CONNECTION_LIFETIME', 3600.0, float)
+        self.fetch_size = get_setting('NEO4J', 'FETCH_SIZE', 1000, int)
+
+        self.driver = GraphDatabase.driver(
+            self.uri,
+            auth=(get_setting('NEO4J', 'USER'), get_setting('NEO4J', 'PASSWORD')),
+            max_connection_pool_size=self.max_connection_pool_size,
+            connection_acquisition_timeout=self.connection_acquisition_timeout,
+            max_connection_lifetime=self.max_connection_lifetime,
+        )
+
+        self.usage = SessionUsage()
+
+    @contextmanager
+    def session(self, **config):
+        config.setdefault('fetch_size', self.fetch_size)
+        self.usage.opened()
+        failed = False
+        try:
+            with self.driver.session(**config) as session:
+                yield session
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.usage.closed(failed)
+
+    def stats(self):
+        return {
+            'max_connection_pool_size': self.max_connection_pool_size,
+            'connection_acquisition_timeout': self.connection_acquisition_timeout,
+            'max_connection_lifetime': self.max_connection_lifetime,
+            'fetch_size': self.fetch_size,
+            **self.usage.stats(),
+        }
+
+    def close(self):
+        self.driver.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_connection_pool():
+    """Return the process-wide ConnectionPool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+@atexit.register
+def close_connection_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+# Other pools of this process, e.g. the async driver's, by name -> stats callable
+_pool_reporters = {}
+
+
+def register_pool(name, stats):
+    """Report another Neo4j pool next to the sync pool in ``all_pool_stats``."""
+    _pool_reporters[name] = stats
+
+
+def all_pool_stats():
+    """Stats of every Neo4j pool opened in this process, by pool name."""
+    pools = {'sync': _pool.stats()} if _pool is not None else {}
+    pools.update((name, stats()) for name, stats in _pool_reporters.items())
+    return pools
+
+
+def get_data_version(session):
+    record = session.run(
+        """
+        MATCH (v:DataVersion {name: 'graph'})
+        RETURN v.version AS version
+        """
+    ).single()
+    return record['version'] if record is not None else None
+
+
+def bump_data_version(tx):
+    """
+    Mark the graph as changed so cached query results are dropped. Writers call
+    this inside the transaction that modifies the graph.
+    """
+    return tx.run(
+        """
+        MERGE (v:DataVersion {name: 'graph'})
+        SET v.version = COALESCE(v.version, 0) + 1,
+            v.updated_at = datetime()
+        RETURN v.version AS version
+        """
+    ).single()['version']
+
+
+_query_cache = None
+_query_cache_lock = threading.Lock()
+
+
+def get_query_cache():
+    """Return the process-wide QueryCache, or None if caching is disabled."""
+    global _query_cache
+    if not get_setting('CACHE', 'ENABLED', True, bool):
+        return None
+    if _query_cache is None:
+        with _query_cache_lock:
+            if _query_cache is None:
+                def load_version():
+                    with get_connection_pool().session() as session:
+                        return get_data_version(session)
+
+                _query_cache = QueryCache(
+                    ttl=get_setting('CACHE', 'TTL', 300.0, float),
+                    max_bytes=get_setting('CACHE', 'MAX_MB', 256, int) * 1024 * 1024,
+                    version_loader=load_version,
+                    version_check_interval=get_setting('CACHE', 'VERSION_CHECK_INTERVAL', 5.0, float),
+                )
+    return _query_cache
+
+
+_query_metrics = None
+_query_metrics_lock = threading.Lock()
+
+
+def get_query_metrics():
+    """
+    Return the process-wide QueryMetrics, or None if instrumentation is disabled.
+
+    When ``[METRICS] EXPORT_PATH`` is set, the metrics are also written there in
+    the Prometheus text format every ``EXPORT_INTERVAL`` seconds.
+    """
+    global _query_metrics
+    if not get_setting('METRICS', 'ENABLED', True, bool):
+        return None
+    if _query_metrics is None:
+        with _query_metrics_lock:
+            if _query_metrics is None:
+                slow_query_ms = get_setting('METRICS', 'SLOW_QUERY_MS', 500.0, float)
+                _query_metrics = QueryMetrics(
+                    max_samples=get_setting('METRICS', 'MAX_SAMPLES', 1000, int),
+                    slow_query_ms=slow_query_ms if slow_query_ms > 0 else None,
+                    profile_sample_rate=get_setting('METRICS', 'PROFILE_SAMPLE_RATE', 0.0, float),
+                )
+                export_path = get_setting('METRICS', 'EXPORT_PATH')
+                if export_path:
+                    MetricsExporter(
+                        export_path,
+                        render=prometheus_text,
+                        interval=get_setting('METRICS', 'EXPORT_INTERVAL', 15.0, float),
+                    ).start()
+    return _query_metrics
+
+
+def prometheus_text():
+    """Query metrics, cache and pool stats of this process in the Prometheus text format."""
+    metrics = get_query_metrics()
+    if metrics is None:
+        return ''
+    cache = get_query_cache()
+    return metrics.prometheus_text(
+        cache_stats=cache.stats() if cache is not None else None,
+        pool_stats=all_pool_stats(),
+    )
+
+
+@bind_reads()
+class Driver(QueryBackend):
+    """Neo4j backend. The read methods come from ``database.reads``."""
 
-class Driver:
     def __init__(self):
-        self.driver = None
-        self._load_config()
-
-
-    def _load_config(self):
-        # Determine absolute path to config.ini
-        config_path = os.path.join(os.path.dirname(__file__), '..', 'config.ini')
-
-        if os.path.exists(config_path):
-            # Load configuration
-            config = configparser.ConfigParser()
-            config.read(config_path)
-
-            # Read connection details from config file
-            uri = config['NEO4J']['URI']
-            user = config['NEO4J']['USER']
-            password = config['NEO4J']['PASSWORD']
-        else:
-            # Read connection details from environment variables
-            uri = os.getenv('NEO4J_URI')
-            user = os.getenv('NEO4J_USER')
-            password = os.getenv('NEO4J_PASSWORD')
-
-
-        # Initialize Neo4j driver
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
-
-    # Queries
-    def get_hosts(self):
-        with self.driver.session() as session:
-            result = session.run(
-                """
-                MATCH (s:System)
-                RETURN COUNT(DISTINCT s.id) AS HostCount
-                """
-            )
-            return result.single().value()
-
-    def get_critical_hosts(self):
-        with self.driver.session() as session:
-            result = session.run(
-                """
-                MATCH (s:System)
-                WHERE s.critical > 0
-                RETURN COUNT(DISTINCT s.id) AS CriticalHostCount
-                """
-            )
-            return result.single().value()
-
-    def get_findings(self):
-        with self.driver.session() as session:
-            result = session.run(
-                """
-                MATCH (n:Finding)
-                RETURN COUNT(n) AS FindingCount
-                """
-            )
-            return result.single().value()
-
-    def get_vulnerabilities(self):
-        with self.driver.session() as session:
-            result = session.run(
-                """
-                MATCH (n:Vulnerability)
-                RETURN COUNT(DISTINCT n.cve) AS VulnerabilityCount
-                """
-            )
-            return result.single().value()
-
-    def get_findings_by_severity(self):
-        with self.driver.session() as session:
-            result = session.run(
-                """
-                MATCH (n:Finding)
-                RETURN n.severity AS Severity, COUNT(n) AS Count
-                """
-            )
-            return pd.DataFrame([r.data() for r in result])
-
-    def get_total_unique_findings(self):
-        with self.driver.session() as session:
-            result = session.run(
-                """
-                MATCH (n:Finding)
-                RETURN COUNT(DISTINCT n.title) AS UniqueFindingsCount
-                """
-            )
-            return result.single().value()
-
-    def get_host_criticality_count(self):
-        with self.driver.session() as session:
-            result = session.run(
-                """
-                MATCH (s:System)
-                OPTIONAL MATCH (s)<-[:runs_on]-(a:Application)-[:related_weakness]->(f1:Finding)
-                OPTIONAL MATCH (s)-[:related_weakness]->(f2:Finding)
-                WITH s, COLLECT(f1) + COLLECT(f2) AS allFindings
-                
-                // Ensure that we handle cases where there are no findings
-                WITH s, allFindings, CASE WHEN SIZE(allFindings) = 0 THEN 0 ELSE REDUCE(total = 0, f IN allFindings | 
-                    total + CASE 
-                        WHEN f.severity = "Low" AND f.known_exploited_vulnerability = "FALSE" THEN 1
-                        WHEN f.severity = "Low" AND f.known_exploited_vulnerability = "TRUE" THEN 8
-                        WHEN f.severity = "Medium" AND f.known_exploited_vulnerability = "FALSE" THEN 2
-                        WHEN f.severity = "Medium" AND f.known_exploited_vulnerability = "TRUE" THEN 16
-                        WHEN f.severity = "High" AND f.known_exploited_vulnerability = "FALSE" THEN 4
-                        WHEN f.severity = "High" AND f.known_exploited_vulnerability = "TRUE" THEN 32
-                        ELSE 0
-                    END)
-                END AS total_risk_score
-                
-                WITH CASE
-                    WHEN s.critical = 1 THEN total_risk_score * 2
-                    ELSE total_risk_score
-                END AS total_risk_score
-                
-                WITH CASE 
-                         WHEN total_risk_score = 0 THEN "N/A"
-                         WHEN total_risk_score >= 32 THEN "Critical"
-                         WHEN total_risk_score >= 16 THEN "High"
-                         WHEN total_risk_score >= 8 THEN "Medium"
-                         ELSE "Low"
-                     END AS risk_level
-                RETURN risk_level, COUNT(*) AS count
-                ORDER BY count DESC
-                """
-            )
-            return pd.DataFrame([r.data() for r in result])
-
-    def get_host_criticality(self):
-        with self.driver.session() as session:
-            result = session.run(
-                """
-                MATCH (s:System)
-                OPTIONAL MATCH (s)<-[:runs_on]-(a:Application)-[:related_weakness]->(f1:Finding)
-                OPTIONAL MATCH (s)-[:related_weakness]->(f2:Finding)
-                WITH s, 
-                     COLLECT(f1) + COLLECT(f2) AS all_findings
-                UNWIND all_findings AS f
-                WITH s, 
-                     CASE 
-                         WHEN f.severity = "Low" THEN 1
-                         WHEN f.severity = "Medium" THEN 2
-                         WHEN f.severity = "High" THEN 4
-                         ELSE 0
-                     END * 
-                     CASE 
-                         WHEN f.known_exploited_vulnerability = "TRUE" THEN 8
-                         ELSE 1
-                     END AS score,
-                     s.critical AS Critical
-                WITH s.id AS ID,
-                     s.provider_name AS Provider,
-                     s.type AS Type,
-                     s.sub_type AS Sub_Type,
-                     s.state AS State,
-                     s.critical AS Critical,
-                     SUM(score) AS Base_Risk_Score
-                WITH ID,
-                     Provider,
-                     Type,
-                     Sub_Type,
-                     State,
-                     Critical,
-                     CASE 
-                         WHEN Critical = 1 THEN Base_Risk_Score * 2
-                         ELSE Base_Risk_Score
-                     END AS Total_Risk_Score
-                RETURN ID,
-                       Type,
-                       Sub_Type,
-                       State,
-                       Critical,
-                       Total_Risk_Score,
-                       CASE 
-                           WHEN Total_Risk_Score >= 32 THEN "Critical"
-                           WHEN Total_Risk_Score >= 16 THEN "High"
-                           WHEN Total_Risk_Score >= 8 THEN "Medium"
-                           ELSE "Low"
-                       END AS risk_level
-                ORDER BY Total_Risk_Score DESC LIMIT 10
-                """
-            )
-            return pd.DataFrame([r.data() for r in result])
-
-    def get_publishers(self):
-        with self.driver.session() as session:
-            result = session.run(
-                """
-                MATCH (n:SoftwareInstallation)
-                RETURN DISTINCT n.publisher AS Publisher
-                """
-            )
-            return [r['Publisher'] for r in result]
-
-    def get_products(self, publisher):
-        with self.driver.session() as session:
-            result = session.run(
-                f"""
-                MATCH (n:SoftwareInstallation)
-                WHERE n.publisher = '{publisher}'
-                RETURN DISTINCT n.product AS Product
-                """
-            )
-            return [r['Product'] for r in result]
-
-    def get_versions(self, publisher, product):
-        with self.driver.session() as session:
-            result = session.run(
-                f"""
-                MATCH (n:SoftwareInstallation)
-                WHERE n.publisher = '{publisher}' AND n.product = '{product}'
-                RETURN DISTINCT n.version AS Version
-                ORDER BY Version DESC
-                """
-            )
-            return [r['Version'] for r in result]
-
-    def get_systems_by_cve_vulnerability(self, cve):
-        with self.driver.session() as session:
-            tableresult = session.run(
-                f"""
-                MATCH (v:Vulnerability)--(n:Weakness)--(s:System)
-                WHERE v.cve = "{cve}" 
-                WITH s
-                OPTIONAL MATCH (s)<-[:runs_on]-(a:Application)-[:related_weakness]->(f1:Finding)
-                OPTIONAL MATCH (s)-[:related_weakness]->(f2:Finding)
-                WITH s, 
-                     COLLECT(f1) + COLLECT(f2) AS all_findings
-                UNWIND all_findings AS f
-                WITH s, 
-                     CASE 
-                         WHEN f.severity = "Low" THEN 1
-                         WHEN f.severity = "Medium" THEN 2
-                         WHEN f.severity = "High" THEN 4
-                         ELSE 0
-                     END * 
-                     CASE 
-                         WHEN f.known_exploited_vulnerability = "TRUE" THEN 8
-                         ELSE 1
-                     END AS score,
-                     s.critical AS Critical
-                WITH s.id AS ID,
-                     s.provider_name AS Provider,
-                     s.type AS Type,
-                     s.sub_type AS Sub_Type,
-                     s.state AS State,
-                     s.critical AS Critical,
-                     SUM(score) AS Base_Risk_Score
-                WITH ID,
-                     Provider,
-                     Type,
-                     Sub_Type,
-                     State,
-                     Critical,
-                     CASE 
-                         WHEN Critical = 1 THEN Base_Risk_Score * 2
-                         ELSE Base_Risk_Score
-                     END AS Total_Risk_Score
-                RETURN ID,
-                       Type,
-                       Sub_Type,
-                       State,
-                       Critical,
-                       Total_Risk_Score,
-                       CASE 
-                           WHEN Total_Risk_Score >= 32 THEN "Critical"
-                           WHEN Total_Risk_Score >= 16 THEN "High"
-                           WHEN Total_Risk_Score >= 8 THEN "Medium"
-                           ELSE "Low"
-                       END AS risk_level
-                ORDER BY Total_Risk_Score DESC LIMIT 10
-                """
-            )
-            # Pie Chart
-            pieresult = session.run(
-                f"""
-                MATCH (v:Vulnerability)--(n:Weakness)--(s:System)
-                WHERE v.cve = "{cve}" 
-                WITH s
-                OPTIONAL MATCH (s)<-[:runs_on]-(a:Application)-[:related_weakness]->(f1:Finding)
-                OPTIONAL MATCH (s)-[:related_weakness]->(f2:Finding)
-                WITH s, COLLECT(f1) + COLLECT(f2) AS allFindings
-                
-                // Ensure that we handle cases where there are no findings
-                WITH s, allFindings, CASE WHEN SIZE(allFindings) = 0 THEN 0 ELSE REDUCE(total = 0, f IN allFindings | 
-                    total + CASE 
-                        WHEN f.severity = "Low" AND f.known_exploited_vulnerability = "FALSE" THEN 1
-                        WHEN f.severity = "Low" AND f.known_exploited_vulnerability = "TRUE" THEN 8
-                        WHEN f.severity = "Medium" AND f.known_exploited_vulnerability = "FALSE" THEN 2
-                        WHEN f.severity = "Medium" AND f.known_exploited_vulnerability = "TRUE" THEN 16
-                        WHEN f.severity = "High" AND f.known_exploited_vulnerability = "FALSE" THEN 4
-                        WHEN f.severity = "High" AND f.known_exploited_vulnerability = "TRUE" THEN 32
-                        ELSE 0
-                    END)
-                END AS total_risk_score
-                
-                WITH CASE
-                    WHEN s.critical = 1 THEN total_risk_score * 2
-                    ELSE total_risk_score
-                END AS total_risk_score
-                
-                WITH CASE 
-                         WHEN total_risk_score = 0 THEN "N/A"
-                         WHEN total_risk_score >= 32 THEN "Critical"
-                         WHEN total_risk_score >= 16 THEN "High"
-                         WHEN total_risk_score >= 8 THEN "Medium"
-                         ELSE "Low"
-                     END AS risk_level
-                RETURN risk_level, COUNT(*) AS count
-                ORDER BY count DESC
-                """
-            )
-
-            return pd.DataFrame([r.data() for r in tableresult]), pd.DataFrame([r.data() for r in pieresult])
-
-    def advanced_search(self, publishers, products=None, min_versions=None, max_versions=None):
-        with self.driver.session() as session:
-            # Ensure publishers, products, and versions are lists for iteration
-            if products is None:
-                products = [None] * len(publishers)
-            if min_versions is None:
-                min_versions = [None] * len(publishers)
-            if max_versions is None:
-                max_versions = [None] * len(publishers)
-
-            # Generate conditions based on provided lists
-            conditions = []
-            for publisher, product, min_version, max_version in zip(publishers, products, min_versions, max_versions):
-                condition = f"(n.publisher = '{publisher}'"
-                if product is not None:
-                    condition += f" AND n.product = '{product}'"
-                if min_version is not None:
-                    condition += f" AND n.version >= '{min_version}'"
-                if max_version is not None:
-                    condition += f" AND n.version <= '{max_version}'"
-                condition += ")"
-                conditions.append(condition)
-
-            # Join all conditions using OR
-            where_clause = " OR ".join(conditions)
-
-            # Run the query
-            result = session.run(
-                f"""
-                MATCH (n:SoftwareInstallation)
-                WHERE {where_clause}
-                WITH n AS software
-                MATCH (software)--(s:System)
-                OPTIONAL MATCH (s)<-[:runs_on]-(a:Application)-[:related_weakness]->(f1:Finding)
-                OPTIONAL MATCH (s)-[:related_weakness]->(f2:Finding)
-                WITH s, 
-                     COLLECT(f1) + COLLECT(f2) AS all_findings
-                UNWIND all_findings AS f
-                WITH s, 
-                     CASE 
-                         WHEN f.severity = "Low" THEN 1
-                         WHEN f.severity = "Medium" THEN 2
-                         WHEN f.severity = "High" THEN 4
-                         ELSE 0
-                     END * 
-                     CASE 
-                         WHEN f.known_exploited_vulnerability = "TRUE" THEN 8
-                         ELSE 1
-                     END AS score,
-                     s.critical AS Critical
-                WITH s.id AS ID,
-                     s.provider_name AS Provider,
-                     s.type AS Type,
-                     s.sub_type AS Sub_Type,
-                     s.state AS State,
-                     s.critical AS Critical,
-                     SUM(score) AS Base_Risk_Score
-                WITH ID,
-                     Provider,
-                     Type,
-                     Sub_Type,
-                     State,
-                     Critical,
-                     CASE 
-                         WHEN Critical = 1 THEN Base_Risk_Score * 2
-                         ELSE Base_Risk_Score
-                     END AS Total_Risk_Score
-                RETURN ID,
-                       Type,
-                       Sub_Type,
-                       State,
-                       Critical,
-                       Total_Risk_Score,
-                       CASE 
-                           WHEN Total_Risk_Score >= 32 THEN "Critical"
-                           WHEN Total_Risk_Score >= 16 THEN "High"
-                           WHEN Total_Risk_Score >= 8 THEN "Medium"
-                           ELSE "Low"
-                       END AS risk_level
-                ORDER BY Total_Risk_Score DESC LIMIT 10
-                """
-            )
-
-            result_pie = session.run(
-                f"""
-                MATCH (n:SoftwareInstallation)
-                WHERE {where_clause}
-                WITH n AS software
-                MATCH (software)--(s:System)
-                OPTIONAL MATCH (s)<-[:runs_on]-(a:Application)-[:related_weakness]->(f1:Finding)
-                OPTIONAL MATCH (s)-[:related_weakness]->(f2:Finding)
-                WITH s, COLLECT(f1) + COLLECT(f2) AS allFindings
-                
-                // Ensure that we handle cases where there are no findings
-                WITH s, allFindings, CASE WHEN SIZE(allFindings) = 0 THEN 0 ELSE REDUCE(total = 0, f IN allFindings | 
-                    total + CASE 
-                        WHEN f.severity = "Low" AND f.known_exploited_vulnerability = "FALSE" THEN 1
-                        WHEN f.severity = "Low" AND f.known_exploited_vulnerability = "TRUE" THEN 8
-                        WHEN f.severity = "Medium" AND f.known_exploited_vulnerability = "FALSE" THEN 2
-                        WHEN f.severity = "Medium" AND f.known_exploited_vulnerability = "TRUE" THEN 16
-                        WHEN f.severity = "High" AND f.known_exploited_vulnerability = "FALSE" THEN 4
-                        WHEN f.severity = "High" AND f.known_exploited_vulnerability = "TRUE" THEN 32
-                        ELSE 0
-                    END)
-                END AS total_risk_score
-                
-                WITH CASE
-                    WHEN s.critical = 1 THEN total_risk_score * 2
-                    ELSE total_risk_score
-                END AS total_risk_score
-                
-                WITH CASE 
-                         WHEN total_risk_score = 0 THEN "N/A"
-                         WHEN total_risk_score >= 32 THEN "Critical"
-                         WHEN total_risk_score >= 16 THEN "High"
-                         WHEN total_risk_score >= 8 THEN "Medium"
-                         ELSE "Low"
-                     END AS risk_level
-                RETURN risk_level, COUNT(*) AS count
-                ORDER BY count DESC
-                """
-            )
-            return pd.DataFrame([r.data() for r in result]), pd.DataFrame([r.data() for r in result_pie])
-
-    def get_country_count(self):
-        with self.driver.session() as session:
-            result = session.run(
-                """
-                MATCH (system)-[:in_country]->(country)
-                RETURN country.name AS country, COUNT(system) AS count
-                ORDER BY count DESC
-                """
-            )
-            return pd.DataFrame([r.data() for r in result])
+        self.pool = get_connection_pool()
+        self.driver = self.pool.driver
+        self.cache = get_query_cache()
+        self.metrics = get_query_metrics()
+
+    def session(self, **config):
+        return self.pool.session(**config)
+
+    def pool_stats(self):
+        """Stats of the sync pool and of any other pool of this process, by pool name."""
+        return all_pool_stats()
+
+    def cache_stats(self):
+        return self.cache.stats() if self.cache is not None else None
+
+    def _execute(self, name, query, convert, **params):
+        with self.session() as session:
+            with instrument(self.metrics, name, query, params) as probe:
+                result = session.run(probe.query, params)
+                value = convert(probe.count(result))
+                probe.finish(result.consume())
+        return value
+
+    def get_blast_radius(self, cves, via_software=True, min_share=0.5, min_lift=2.0):
+        """
+        See ``QueryBackend.get_blast_radius``. The snapshot is exported out of band
+        and re-exported once the data version moves on; ``refreshing`` tells
+        whether a newer one is being built.
+        """
+        from database.snapshot import blast_radius_report, get_graph_snapshot, snapshot_refreshing
+
+        with self.session() as session:
+            snapshot = get_graph_snapshot(get_data_version(session))
+        if snapshot is None:
+            return None
+        report = blast_radius_report(snapshot, cves, via_software, min_share, min_lift)
+        report['refreshing'] = snapshot_refreshing()
+        return report
+
+    def _ensure_risk_scores(self):
+        from database.risk import ensure_risk_scores
+
+        ensure_risk_scores(self)
+
+    def _request(self, request):
+        if request == ENSURE_RISK_SCORES:
+            return self._ensure_risk_scores()
+        if isinstance(request, Call):
+            return getattr(self, request.method)(*request.args)
+        return self._execute(request.name, request.query, request.convert, **request.params)
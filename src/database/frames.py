@@ -0,0 +1,115 @@
+"""
+Columnar conversion of query results into DataFrames.
+
+Records are consumed in chunks. Each chunk is transposed column-wise with
+``zip`` (records are tuples, so no per-row dict is built) and compacted into a
+typed column right away: NumPy integers, categoricals for low-cardinality
+labels and, when pyarrow is installed, Arrow-backed strings. Peak memory is
+therefore one chunk of Python objects plus the compact columns.
+"""
+from itertools import chain, islice
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import CategoricalDtype, union_categoricals
+
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = 'string[pyarrow]'
+except ImportError:
+    STRING_DTYPE = object
+
+RISK_LEVEL_DTYPE = CategoricalDtype(['N/A', 'Low', 'Medium', 'High', 'Critical'])
+
+# Column name -> dtype. 'category' builds categories from the data. System IDs
+# stay object: ingest stores digit-only IDs as integers and others as strings,
+# and either is sent back unchanged as a keyset cursor.
+COLUMN_DTYPES = {
+    'risk_level': RISK_LEVEL_DTYPE,
+    'Severity': 'category',
+    'Type': 'category',
+    'Sub_Type': 'category',
+    'State': 'category',
+    'Critical': 'Int64',
+    'Total_Risk_Score': 'int64',
+    'count': 'int64',
+    'Count': 'int64',
+    'country': STRING_DTYPE,
+}
+
+CHUNK_SIZE = 10000
+
+
+def _column_chunk(values, dtype):
+    if dtype == 'category':
+        return pd.Categorical(values)
+    if isinstance(dtype, CategoricalDtype):
+        return pd.Categorical(values, dtype=dtype)
+    if dtype == 'int64':
+        try:
+            return np.fromiter(values, dtype=np.int64, count=len(values))
+        except TypeError:
+            # Nulls in the column: fall back to the nullable integer type
+            return pd.array(values, dtype='Int64')
+    if dtype is None or dtype is object:
+        return np.array(values, dtype=object)
+    return pd.array(values, dtype=dtype)
+
+
+def _concat(chunks):
+    if len(chunks) == 1:
+        return chunks[0]
+    if isinstance(chunks[0], pd.Categorical):
+        return union_categoricals(chunks)
+    if all(isinstance(c, np.ndarray) for c in chunks):
+        return np.concatenate(chunks)
+    return pd.concat([pd.Series(c) for c in chunks], ignore_index=True).array
+
+
+def records_to_frame(records, columns=None, dtypes=None, chunk_size=CHUNK_SIZE):
+    """
+    Build a DataFrame from an iterable of records without per-row dicts.
+
+    Args:
+        records (iterable): Neo4j records or plain tuples in ``columns`` order.
+        columns (list): Column names; taken from the first record's keys if omitted.
+        dtypes (dict): Per-column dtype overrides on top of ``COLUMN_DTYPES``.
+        chunk_size (int): Records transposed and compacted at a time.
+
+    Returns:
+        pandas.DataFrame
+    """
+    iterator = iter(records)
+    first = next(iterator, None)
+    if columns is None:
+        columns = list(first.keys()) if first is not None else []
+    dtypes = {**COLUMN_DTYPES, **(dtypes or {})}
+    if first is None:
+        return pd.DataFrame({c: pd.Series(dtype=_empty_dtype(dtypes.get(c))) for c in columns}, columns=columns)
+
+    chunks = [[] for _ in columns]
+    iterator = chain([first], iterator)
+    while True:
+        rows = list(islice(iterator, chunk_size))
+        if not rows:
+            break
+        for i, values in enumerate(zip(*rows)):
+            chunks[i].append(_column_chunk(values, dtypes.get(columns[i])))
+        del rows
+    return pd.DataFrame({c: _concat(chunks[i]) for i, c in enumerate(columns)}, columns=columns)
+
+
+def _empty_dtype(dtype):
+    return object if dtype is None else dtype
+
+
+def cursor_value(value):
+    """A frame cell as a plain Python value for a query parameter, NA as None."""
+    if value is None or value is pd.NA or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def maps_to_frame(maps, columns, dtypes=None):
+    """Build a DataFrame from a list of maps, e.g. a ``COLLECT({...})`` in a record."""
+    return records_to_frame((tuple(m.get(c) for c in columns) for m in maps), columns, dtypes)
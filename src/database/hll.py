@@ -0,0 +1,309 @@
+"""
+Approximate distinct counts with mergeable HyperLogLog sketches.
+
+Counting distinct hosts, CVEs and finding titles exactly makes Neo4j hold a
+hash set of every value. In approximate mode (``[HLL] ENABLED``) ingest also
+folds each batch into HyperLogLog sketches, one per metric, country, provider
+and writer stripe:
+
+    (:Sketch {metric, country, provider, stripe, precision, registers})
+
+A sketch is 2^p one-byte registers, 16 KiB at the default precision p = 14,
+stored zlib-compressed. Sketches merge by taking the register-wise maximum, so
+any slice of countries and providers is estimated by merging its sketches, and
+a value seen in several partitions or batches is still counted once. The
+relative standard error is 1.04 / sqrt(2^p), about 0.81% at p = 14; estimates
+are within twice that for about 95% of counts. The dashboards mark them with ≈.
+
+Sketches only grow: deleted systems and findings are not subtracted. Rebuild
+them from the graph after large deletions. Run from the ``src`` directory:
+
+    python -m database.hll rebuild
+    python -m database.hll show [--country Germany] [--provider AWS]
+"""
+import argparse
+import hashlib
+import zlib
+
+import numpy as np
+
+from database.settings import get_setting
+
+DEFAULT_PRECISION = 14
+
+HOSTS = 'total_hosts'
+VULNERABILITIES = 'total_vulnerabilities'
+UNIQUE_FINDINGS = 'total_unique_findings'
+METRICS = [HOSTS, VULNERABILITIES, UNIQUE_FINDINGS]
+
+REBUILD_BATCH_SIZE = 10_000
+
+SKETCHES = """
+    MATCH (k:Sketch)
+    WHERE ($countries IS NULL OR k.country IN $countries)
+      AND ($providers IS NULL OR k.provider IN $providers)
+    RETURN k.metric AS metric, k.precision AS precision, k.registers AS registers
+"""
+
+SKETCH_PARTITIONS = """
+    MATCH (k:Sketch)
+    RETURN COLLECT(DISTINCT k.country) AS countries, COLLECT(DISTINCT k.provider) AS providers
+"""
+
+
+def approximate_mode():
+    return get_setting('HLL', 'ENABLED', False, bool)
+
+
+def precision():
+    return get_setting('HLL', 'PRECISION', DEFAULT_PRECISION, int)
+
+
+class HyperLogLog:
+    """
+    HyperLogLog sketch over 64-bit BLAKE2b hashes of string values.
+
+    The first ``precision`` bits of a hash select a register, which keeps the
+    longest run of leading zeros (plus one) seen in the remaining bits.
+    """
+
+    def __init__(self, precision=DEFAULT_PRECISION, registers=None):
+        if not 4 <= precision <= 18:
+            raise ValueError(f"HyperLogLog precision must be between 4 and 18, got {precision}")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8) if registers is None else registers
+
+    @property
+    def relative_error(self):
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def update(self, values):
+        tail_bits = 64 - self.precision
+        tail_mask = (1 << tail_bits) - 1
+        indexes = []
+        ranks = []
+        for value in values:
+            h = int.from_bytes(hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest(), 'big')
+            indexes.append(h >> tail_bits)
+            ranks.append(tail_bits - (h & tail_mask).bit_length() + 1)
+        if indexes:
+            np.maximum.at(self.registers, np.array(indexes), np.array(ranks, dtype=np.uint8))
+        return self
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError(f"Cannot merge sketches of precision {self.precision} and {other.precision}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int32)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are still empty
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        return zlib.compress(self.registers.tobytes())
+
+    @classmethod
+    def from_bytes(cls, data, precision=DEFAULT_PRECISION):
+        registers = np.frombuffer(zlib.decompress(bytes(data)), dtype=np.uint8).copy()
+        if len(registers) != 1 << precision:
+            raise ValueError(f"Sketch has {len(registers)} registers, expected {1 << precision}")
+        return cls(precision, registers)
+
+
+def batch_sketches(batch, p=None):
+    """
+    Sketch a ``prepare_findings`` batch.
+
+    Returns:
+        dict: ``(metric, country, provider)`` -> HyperLogLog. Systems without a
+        country or provider in the batch are filed under ``''``.
+    """
+    p = p or precision()
+    countries = {c['system_id']: c['country'] for c in batch['countries']}
+    partitions = {s['id']: (countries.get(s['id'], ''), s['props'].get('provider_name', '')) for s in batch['systems']}
+    owners = {a['id']: a['system_id'] for a in batch['applications']}
+    finding_partitions = {}
+    for finding in batch['system_findings'] + batch['application_findings']:
+        finding_partitions[finding['id']] = partitions[owners.get(finding['owner'], finding['owner'])]
+
+    values = {}
+    for system_id, partition in partitions.items():
+        values.setdefault((HOSTS, *partition), []).append(system_id)
+    for finding in batch['findings']:
+        if finding['title'] is not None:
+            values.setdefault((UNIQUE_FINDINGS, *finding_partitions[finding['id']]), []).append(finding['title'])
+    for vulnerability in batch['vulnerabilities']:
+        values.setdefault((VULNERABILITIES, *finding_partitions[vulnerability['finding_id']]), []).append(
+            vulnerability['cve'])
+    return {key: HyperLogLog(p).update(v) for key, v in values.items()}
+
+
+class SketchPrecisionError(ValueError):
+    """A stored sketch has another precision than the one merged into it."""
+
+
+def merge_sketches(tx, sketches, stripe=0):
+    """
+    Merge sketches into the stored sketches of ``stripe``, inside the writer's
+    transaction.
+
+    Raises:
+        SketchPrecisionError: A stored sketch has another precision, e.g. after
+            ``[HLL] PRECISION`` changed. Rebuild the sketches first.
+    """
+    if not sketches:
+        return
+    keys = [{'metric': m, 'country': c, 'provider': p} for m, c, p in sorted(sketches)]
+    for r in tx.run(
+        """
+        UNWIND $keys AS key
+        MATCH (k:Sketch {metric: key.metric, country: key.country, provider: key.provider, stripe: $stripe})
+        RETURN k.metric AS metric, k.country AS country, k.provider AS provider,
+               k.precision AS precision, k.registers AS registers
+        """,
+        keys=keys,
+        stripe=stripe,
+    ):
+        sketch = sketches[(r['metric'], r['country'], r['provider'])]
+        if r['precision'] != sketch.precision:
+            raise SketchPrecisionError(
+                f"Stored {r['metric']} sketch has precision {r['precision']}, not {sketch.precision}. "
+                "Run 'python -m database.hll rebuild' after changing [HLL] PRECISION")
+        sketch.merge(HyperLogLog.from_bytes(r['registers'], r['precision']))
+    tx.run(
+        """
+        UNWIND $sketches AS sketch
+        MERGE (k:Sketch {metric: sketch.metric, country: sketch.country, provider: sketch.provider, stripe: $stripe})
+        SET k.precision = sketch.precision,
+            k.registers = sketch.registers
+        """,
+        sketches=[
+            {**key, 'precision': sketches[(key['metric'], key['country'], key['provider'])].precision,
+             'registers': sketches[(key['metric'], key['country'], key['provider'])].to_bytes()}
+            for key in keys
+        ],
+        stripe=stripe,
+    )
+
+
+def to_estimates(records):
+    """
+    Returns:
+        dict: Metric -> estimated distinct count of the merged sketches, or None
+        if there are no sketches. Sketches of another precision are skipped.
+    """
+    merged = {}
+    for r in records:
+        if r['precision'] != precision():
+            continue
+        sketch = HyperLogLog.from_bytes(r['registers'], r['precision'])
+        if r['metric'] in merged:
+            merged[r['metric']].merge(sketch)
+        else:
+            merged[r['metric']] = sketch
+    if not merged:
+        return None
+    return {metric: merged[metric].count() if metric in merged else 0 for metric in METRICS}
+
+
+def to_partitions(records):
+    record = next(iter(records))
+    return sorted(record['countries']), sorted(record['providers'])
+
+
+def _replace_sketches(tx, sketches):
+    tx.run("MATCH (k:Sketch) DELETE k")
+    merge_sketches(tx, sketches)
+
+
+def rebuild(driver):
+    """
+    Recompute every sketch from the graph, dropping deleted values.
+
+    Returns:
+        int: Number of sketches written.
+    """
+    p = precision()
+    sketches = {}
+
+    def add(metric, rows):
+        pending = {}
+        for r in rows:
+            key = (metric, r['country'] or '', r['provider'] or '')
+            values = pending.setdefault(key, [])
+            values.append(r['value'])
+            if len(values) >= REBUILD_BATCH_SIZE:
+                sketches.setdefault(key, HyperLogLog(p)).update(values)
+                values.clear()
+        for key, values in pending.items():
+            sketches.setdefault(key, HyperLogLog(p)).update(values)
+
+    with driver.session() as session:
+        partition = """
+            OPTIONAL MATCH (s)-[:in_country]->(c:Country)
+            WITH value, s, c.name AS country
+        """
+        add(HOSTS, session.run(
+            f"""
+            MATCH (s:System)
+            WITH s.id AS value, s
+            {partition}
+            RETURN value, country, s.provider_name AS provider
+            """
+        ))
+        add(UNIQUE_FINDINGS, session.run(
+            f"""
+            MATCH (s:System)<-[:runs_on*0..1]-()-[:related_weakness]->(f:Finding)
+            WHERE f.title IS NOT NULL
+            WITH DISTINCT f.title AS value, s
+            {partition}
+            RETURN value, country, s.provider_name AS provider
+            """
+        ))
+        add(VULNERABILITIES, session.run(
+            f"""
+            MATCH (s:System)<-[:runs_on*0..1]-()-[:related_weakness]->(:Finding)-[:related_vulnerability]->(v)
+            WITH DISTINCT v.cve AS value, s
+            {partition}
+            RETURN value, country, s.provider_name AS provider
+            """
+        ))
+        session.execute_write(_replace_sketches, sketches)
+    return len(sketches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain the HyperLogLog sketches of the approximate mode.')
+    parser.add_argument('command', choices=['rebuild', 'show'])
+    parser.add_argument('--country', action='append', help='Only merge sketches of this country, repeatable')
+    parser.add_argument('--provider', action='append', help='Only merge sketches of this provider, repeatable')
+    args = parser.parse_args()
+
+    from database.connection import Driver, bump_data_version
+
+    driver = Driver()
+    if args.command == 'rebuild':
+        print(f"Rebuilt {rebuild(driver)} sketches")
+        with driver.session() as session:
+            session.execute_write(bump_data_version)
+        return
+
+    with driver.session() as session:
+        estimates = to_estimates(session.run(SKETCHES, countries=args.country, providers=args.provider))
+    if estimates is None:
+        print('No sketches, run rebuild or ingest with [HLL] ENABLED')
+        return
+    error = HyperLogLog(precision()).relative_error
+    for metric, estimate in estimates.items():
+        print(f"{metric:<24}≈{estimate:>12}  ±{estimate * error:.0f} (1 standard error)")
+
+
+if __name__ == '__main__':
+    main()
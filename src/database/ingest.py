@@ -0,0 +1,498 @@
+"""
+Bulk ingestion of scanner exports into the FuSec graph.
+
+Input files are CSV or JSON Lines, optionally gzipped, and are streamed row by
+row so memory stays constant regardless of file size. Three kinds are supported.
+
+``findings``: one row per finding.
+    system_id (required), system_type, system_sub_type, system_state,
+    provider_name, critical, country, application, finding_id, title,
+    severity, known_exploited_vulnerability, cve
+
+``software``: one row per installed package.
+    system_id (required), publisher, product, version
+
+System IDs made of digits only are stored as integers, like the IDs of the
+existing graph, and any other ID as a string. ``critical`` is an integer, or a flag such as ``TRUE`` or ``no`` read as 1 or 0;
+other values leave the system's criticality unchanged. Software rows without a
+publisher, product or version are skipped.
+
+``delete``: one row per system to remove.
+    system_id (required)
+
+Findings produce this shape, which the Driver queries read:
+
+    (:Application)-[:runs_on]->(:System)-[:in_country]->(:Country)
+    (:System|Application)-[:related_weakness]->(:Finding:Weakness)
+    (:Finding:Weakness)-[:related_vulnerability]->(:Vulnerability)
+    (:System)-[:has_software]->(:SoftwareInstallation)
+
+A finding without ``application`` belongs to the system itself. Without
+``finding_id`` it is identified by a hash of system, application, title and CVE.
+A row with none of ``finding_id``, ``title`` and ``cve`` only upserts its system,
+which is how hosts without findings are imported.
+
+Rows are upserted with batched ``UNWIND ... MERGE`` statements by parallel
+writer workers. Rows are partitioned by ``system_id``, so every System and its
+findings are written by one worker and writers do not contend for the same
+host nodes. Software installations are shared between hosts; the
+``(publisher, product, version)`` constraint of ``database.schema`` serializes
+concurrent MERGEs of the same package, so run the schema step before ingesting
+software. Touched systems are flagged for risk recomputation and scored once the
+writers are done, before the data version is bumped, and the
+dashboard counters of ``database.statistics`` are updated in the same
+transaction, each worker in its own stripe. With ``[HLL] ENABLED`` the batch is
+also folded into the distinct-count sketches of ``database.hll``. Deleting a system also deletes its
+applications and the findings only it owned. Run from the
+``src`` directory:
+
+    python -m database.ingest findings scan.csv.gz [--workers 4] [--batch-size 5000] [--no-materialize]
+"""
+import argparse
+import csv
+import gzip
+import hashlib
+import json
+import logging
+import queue
+import threading
+import time
+import zlib
+from collections import Counter
+
+from database import hll, risk, statistics
+from database.connection import Driver, bump_data_version
+from database.versions import version_key
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROPERTIES = {
+    'system_type': 'type',
+    'system_sub_type': 'sub_type',
+    'system_state': 'state',
+    'provider_name': 'provider_name',
+    'critical': 'critical',
+}
+
+FINDING_COLUMNS = {'finding_id', 'title', 'cve'}
+
+
+def _open(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def read_rows(path):
+    """Stream the rows of a CSV or JSON Lines file as dicts with empty values removed."""
+    with _open(path) as f:
+        if '.jsonl' in path or '.ndjson' in path:
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for row in rows:
+            yield {k: v for k, v in row.items() if v is not None and v != ''}
+
+
+def _flag(value):
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    return 'TRUE' if str(value).strip().upper() in ('TRUE', '1', 'YES') else 'FALSE'
+
+
+def system_id(value):
+    """
+    The stored form of a ``system_id`` value: integers, and strings of digits as
+    CSV delivers them, become int; anything else is a stripped string.
+    """
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    text = str(value).strip()
+    if text.isdigit() and str(int(text)) == text:
+        return int(text)
+    return text
+
+
+def _critical(value):
+    """Criticality as an int, from a number or a flag string, or None if it is neither."""
+    if isinstance(value, bool):
+        return int(value)
+    text = str(value).strip().upper()
+    if text in ('TRUE', 'YES'):
+        return 1
+    if text in ('FALSE', 'NO', ''):
+        return 0
+    try:
+        return int(float(text))
+    except (ValueError, OverflowError):
+        return None
+
+
+def _finding_id(row):
+    raw = '|'.join(str(row.get(k, '')) for k in ('system_id', 'application', 'title', 'cve'))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def prepare_findings(rows):
+    """Split a batch of finding rows into the parameter lists of ``write_findings``."""
+    systems = {}
+    countries = {}
+    applications = {}
+    system_findings = []
+    application_findings = []
+    vulnerabilities = []
+    for row in rows:
+        host_id = system_id(row['system_id'])
+        props = systems.setdefault(host_id, {})
+        for column, prop in SYSTEM_PROPERTIES.items():
+            if column not in row:
+                continue
+            value = _critical(row[column]) if prop == 'critical' else row[column]
+            if value is None:
+                logger.warning("Ignoring critical value %r of system %s", row[column], host_id)
+                continue
+            props[prop] = value
+        if 'country' in row:
+            countries[host_id] = row['country']
+        if not FINDING_COLUMNS.intersection(row):
+            continue
+
+        finding = {
+            'id': str(row.get('finding_id') or _finding_id(row)),
+            'title': row.get('title'),
+            'severity': row.get('severity'),
+            'known_exploited_vulnerability': _flag(row.get('known_exploited_vulnerability', False)),
+        }
+        if 'application' in row:
+            application_id = f"{host_id}/{row['application']}"
+            applications[application_id] = {'id': application_id, 'name': row['application'], 'system_id': host_id}
+            application_findings.append({**finding, 'owner': application_id})
+        else:
+            system_findings.append({**finding, 'owner': host_id})
+        if 'cve' in row:
+            vulnerabilities.append({'finding_id': finding['id'], 'cve': row['cve'].strip().upper()})
+
+    return {
+        'systems': [{'id': k, 'props': v} for k, v in systems.items()],
+        'findings': list({f['id']: f for f in system_findings + application_findings}.values()),
+        'cves': sorted({v['cve'] for v in vulnerabilities}),
+        'countries': [{'system_id': k, 'country': v} for k, v in countries.items()],
+        'applications': list(applications.values()),
+        'system_findings': system_findings,
+        'application_findings': application_findings,
+        'vulnerabilities': vulnerabilities,
+    }
+
+
+def write_findings(tx, batch, stripe=0):
+    counters = Counter()
+    titles = Counter()
+    record = tx.run(
+        """
+        UNWIND $systems AS row
+        MERGE (s:System {id: row.id})
+        ON CREATE SET s.statistics_created = true
+        WITH s, row, s.statistics_created IS NOT NULL AS created, COALESCE(s.critical, 0) > 0 AS was_critical
+        SET s += row.props, s.risk_dirty = true
+        REMOVE s.statistics_created
+        RETURN COUNT(CASE WHEN created THEN 1 END) AS created,
+               COUNT(CASE WHEN COALESCE(s.critical, 0) > 0 THEN 1 END)
+               - COUNT(CASE WHEN was_critical THEN 1 END) AS critical
+        """,
+        systems=batch['systems'],
+    ).single()
+    counters[statistics.HOSTS] += record['created']
+    counters[statistics.CRITICAL_HOSTS] += record['critical']
+    for r in tx.run(
+        """
+        UNWIND $countries AS row
+        MATCH (s:System {id: row.system_id})
+        MERGE (c:Country {name: row.country})
+        MERGE (s)-[r:in_country]->(c)
+        ON CREATE SET r.statistics_created = true
+        WITH c, r, r.statistics_created IS NOT NULL AS created
+        REMOVE r.statistics_created
+        WITH c, created
+        WHERE created
+        RETURN c.name AS country, COUNT(*) AS created
+        """,
+        countries=batch['countries'],
+    ):
+        counters[statistics.country_counter(r['country'])] += r['created']
+    tx.run(
+        """
+        UNWIND $applications AS row
+        MATCH (s:System {id: row.system_id})
+        MERGE (a:Application {id: row.id})
+        SET a.name = row.name
+        MERGE (a)-[:runs_on]->(s)
+        """,
+        applications=batch['applications'],
+    )
+    # Only new findings and findings whose severity or title changed move the counters
+    for r in tx.run(
+        """
+        UNWIND $findings AS row
+        MERGE (f:Finding:Weakness {id: row.id})
+        ON CREATE SET f.statistics_created = true
+        WITH f, row, f.statistics_created IS NOT NULL AS created, f.severity AS old_severity, f.title AS old_title
+        SET f.title = row.title,
+            f.severity = row.severity,
+            f.known_exploited_vulnerability = row.known_exploited_vulnerability
+        REMOVE f.statistics_created
+        WITH row, created, old_severity, old_title
+        WHERE created
+           OR COALESCE(old_severity, '') <> COALESCE(row.severity, '')
+           OR COALESCE(old_title, '') <> COALESCE(row.title, '')
+        RETURN created, old_severity, old_title, row.severity AS severity, row.title AS title
+        """,
+        findings=batch['findings'],
+    ):
+        if r['created']:
+            counters[statistics.FINDINGS] += 1
+        else:
+            counters[statistics.severity_counter(r['old_severity'])] -= 1
+            if r['old_title'] is not None:
+                titles[r['old_title']] -= 1
+        counters[statistics.severity_counter(r['severity'])] += 1
+        if r['title'] is not None:
+            titles[r['title']] += 1
+    for owner, findings in (('System', batch['system_findings']), ('Application', batch['application_findings'])):
+        tx.run(
+            f"""
+            UNWIND $findings AS row
+            MATCH (o:{owner} {{id: row.owner}})
+            MATCH (f:Finding {{id: row.id}})
+            MERGE (o)-[:related_weakness]->(f)
+            """,
+            findings=findings,
+        )
+    record = tx.run(
+        """
+        UNWIND $cves AS cve
+        MERGE (v:Vulnerability {cve: cve})
+        ON CREATE SET v.statistics_created = true
+        WITH v, v.statistics_created IS NOT NULL AS created
+        REMOVE v.statistics_created
+        RETURN COUNT(CASE WHEN created THEN 1 END) AS created
+        """,
+        cves=batch['cves'],
+    ).single()
+    counters[statistics.VULNERABILITIES] += record['created']
+    tx.run(
+        """
+        UNWIND $vulnerabilities AS row
+        MATCH (f:Finding {id: row.finding_id})
+        MATCH (v:Vulnerability {cve: row.cve})
+        MERGE (f)-[:related_vulnerability]->(v)
+        """,
+        vulnerabilities=batch['vulnerabilities'],
+    )
+    statistics.apply_statistics(tx, counters, titles, stripe)
+    if hll.approximate_mode():
+        hll.merge_sketches(tx, hll.batch_sketches(batch), stripe)
+
+
+def prepare_software(rows):
+    """
+    The ``write_software`` rows of a batch. Rows missing a publisher, product or
+    version cannot be merged into a SoftwareInstallation and are skipped.
+    """
+    prepared = [
+        {
+            'system_id': system_id(row['system_id']),
+            'publisher': row.get('publisher'),
+            'product': row.get('product'),
+            'version': row.get('version'),
+            'version_key': version_key(row.get('version')),
+        }
+        for row in rows
+    ]
+    complete = [r for r in prepared if None not in (r['publisher'], r['product'], r['version'])]
+    if len(complete) < len(prepared):
+        logger.warning("Skipped %d software rows without publisher, product or version",
+                       len(prepared) - len(complete))
+    return complete
+
+
+def write_software(tx, batch, stripe=0):
+    tx.run(
+        """
+        UNWIND $rows AS row
+        MATCH (s:System {id: row.system_id})
+        MERGE (n:SoftwareInstallation {publisher: row.publisher, product: row.product, version: row.version})
+        SET n.version_key = row.version_key
+        MERGE (s)-[:has_software]->(n)
+        """,
+        rows=batch,
+    )
+
+
+def prepare_deletes(rows):
+    return sorted({system_id(row['system_id']) for row in rows}, key=str)
+
+
+def delete_systems(tx, system_ids, stripe=0):
+    """
+    Delete systems with their applications and the findings no remaining owner
+    links to. Vulnerabilities, countries and software installations are shared
+    and stay.
+    """
+    counters = Counter()
+    titles = Counter()
+    for r in tx.run(
+        """
+        UNWIND $ids AS id
+        MATCH (s:System {id: id})
+        OPTIONAL MATCH (s)<-[:runs_on]-(a:Application)
+        WITH COLLECT(DISTINCT s) + COLLECT(DISTINCT a) AS owners
+        UNWIND owners AS owner
+        MATCH (owner)-[:related_weakness]->(f:Finding)
+        WITH DISTINCT f, owners
+        WHERE ALL(other IN [(o)-[:related_weakness]->(f) | o] WHERE other IN owners)
+        WITH f, f.severity AS severity, f.title AS title
+        DETACH DELETE f
+        RETURN severity, title, COUNT(*) AS count
+        """,
+        ids=system_ids,
+    ):
+        counters[statistics.FINDINGS] -= r['count']
+        counters[statistics.severity_counter(r['severity'])] -= r['count']
+        if r['title'] is not None:
+            titles[r['title']] -= r['count']
+    tx.run(
+        """
+        UNWIND $ids AS id
+        MATCH (:System {id: id})<-[:runs_on]-(a:Application)
+        WITH DISTINCT a
+        WHERE ALL(host IN [(a)-[:runs_on]->(h) | h] WHERE host.id IN $ids)
+        DETACH DELETE a
+        """,
+        ids=system_ids,
+    )
+    for r in tx.run(
+        """
+        UNWIND $ids AS id
+        MATCH (s:System {id: id})
+        OPTIONAL MATCH (s)-[:in_country]->(c:Country)
+        WITH s, COALESCE(s.critical, 0) > 0 AS critical, COLLECT(c.name) AS countries
+        DETACH DELETE s
+        RETURN critical, countries
+        """,
+        ids=system_ids,
+    ):
+        counters[statistics.HOSTS] -= 1
+        counters[statistics.CRITICAL_HOSTS] -= int(r['critical'])
+        for country in r['countries']:
+            counters[statistics.country_counter(country)] -= 1
+    statistics.apply_statistics(tx, counters, titles, stripe)
+
+
+KINDS = {
+    'findings': (prepare_findings, write_findings),
+    'software': (prepare_software, write_software),
+    'delete': (prepare_deletes, delete_systems),
+}
+
+
+def ingest(rows, kind='findings', driver=None, workers=4, batch_size=5000, report_interval=10.0, materialize=True):
+    """
+    Upsert rows into the graph with parallel writers.
+
+    Args:
+        rows (iterable): Row dicts, e.g. from ``read_rows``.
+        kind (str): ``findings``, ``software`` or ``delete``.
+        driver (Driver): Connection to use, defaults to a new Driver.
+        workers (int): Number of writer threads, each with its own session.
+        batch_size (int): Rows per write transaction.
+        report_interval (float): Seconds between throughput reports.
+        materialize (bool): Score the flagged systems before bumping the data
+            version. Otherwise they stay flagged for ``database.risk``.
+
+    Returns:
+        dict: ``rows``, ``batches``, ``scored``, ``seconds`` and ``rows_per_second``.
+    """
+    prepare, write = KINDS[kind]
+    driver = driver or Driver()
+    queues = [queue.Queue(maxsize=2) for _ in range(workers)]
+    errors = []
+    lock = threading.Lock()
+    stats = {'rows': 0, 'batches': 0}
+
+    def writer(stripe, q):
+        with driver.session() as session:
+            while True:
+                batch = q.get()
+                if batch is None:
+                    return
+                if errors:
+                    continue
+                try:
+                    session.execute_write(write, prepare(batch), stripe)
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                with lock:
+                    stats['rows'] += len(batch)
+                    stats['batches'] += 1
+
+    threads = [threading.Thread(target=writer, args=(i, q), daemon=True) for i, q in enumerate(queues)]
+    for thread in threads:
+        thread.start()
+
+    started = last_report = time.perf_counter()
+    buffers = [[] for _ in range(workers)]
+    try:
+        for row in rows:
+            if errors:
+                break
+            partition = zlib.crc32(str(system_id(row['system_id'])).encode('utf-8')) % workers
+            buffers[partition].append(row)
+            if len(buffers[partition]) >= batch_size:
+                queues[partition].put(buffers[partition])
+                buffers[partition] = []
+            now = time.perf_counter()
+            if now - last_report >= report_interval:
+                last_report = now
+                print(f"{stats['rows']} rows written, {stats['rows'] / (now - started):.0f} rows/s")
+        for partition, buffer in enumerate(buffers):
+            if buffer:
+                queues[partition].put(buffer)
+    finally:
+        for q in queues:
+            q.put(None)
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+
+    with driver.session() as session:
+        stats['scored'] = risk.score_dirty_systems(session) if materialize else 0
+        session.execute_write(bump_data_version)
+
+    seconds = time.perf_counter() - started
+    stats['seconds'] = seconds
+    stats['rows_per_second'] = stats['rows'] / seconds if seconds else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load scanner exports into the FuSec graph.')
+    parser.add_argument('kind', choices=sorted(KINDS))
+    parser.add_argument('files', nargs='+', help='CSV or JSON Lines files, optionally gzipped')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--no-materialize', dest='materialize', action='store_false',
+                        help='Leave touched hosts flagged for python -m database.risk instead of scoring them')
+    args = parser.parse_args()
+
+    driver = Driver()
+    for path in args.files:
+        stats = ingest(read_rows(path), args.kind, driver, args.workers, args.batch_size,
+                       materialize=args.materialize)
+        print(f"{path}: {stats['rows']} rows in {stats['seconds']:.1f}s ({stats['rows_per_second']:.0f} rows/s), "
+              f"{stats['scored']} risk scores changed")
+
+
+if __name__ == '__main__':
+    main()
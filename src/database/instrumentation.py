@@ -0,0 +1,304 @@
+"""
+Per-query instrumentation for Driver and AsyncDriver.
+
+Every query runs inside ``instrument(metrics, name, query, params)``, which
+records for that query name:
+
+- wall time on the client, including conversion of the result
+- the server's ``result_available_after`` and ``result_consumed_after``
+- the number of rows returned
+- total db hits, for the sampled fraction of queries that run with ``PROFILE``
+
+Samples are kept in a bounded window per query for percentiles and trends.
+Totals are kept since process start for the Prometheus export. Queries slower
+than ``slow_query_ms`` are logged to ``fusec.slow_queries`` together with their
+parameters.
+"""
+from collections import defaultdict, deque, namedtuple
+from contextlib import contextmanager
+import logging
+import math
+import os
+import random
+import reprlib
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger('fusec.slow_queries')
+
+QuerySample = namedtuple('QuerySample', [
+    'timestamp', 'query', 'wall_ms', 'available_ms', 'consumed_ms', 'rows', 'db_hits', 'error', 'params',
+])
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+_param_repr = reprlib.Repr()
+_param_repr.maxlist = 10
+_param_repr.maxdict = 10
+_param_repr.maxstring = 80
+_param_repr.maxother = 80
+
+
+def format_params(params):
+    """Short, log-friendly rendering of query parameters; long lists are truncated."""
+    return ', '.join(f'{key}={_param_repr.repr(value)}' for key, value in sorted(params.items()))
+
+
+def total_db_hits(profile):
+    """Sum ``dbHits`` over a ``PROFILE`` plan tree."""
+    if not profile:
+        return None
+    return profile.get('dbHits', 0) + sum(total_db_hits(child) or 0 for child in profile.get('children', []))
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a sorted list."""
+    if not values:
+        return None
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+class QueryMetrics:
+    """
+    Thread-safe store of query samples, shared by all drivers in the process.
+
+    Args:
+        max_samples (int): Samples kept per query name for percentiles and trends.
+        slow_query_ms (float): Log queries at least this slow. ``None`` disables the log.
+        profile_sample_rate (float): Fraction of queries run with ``PROFILE`` to
+            collect db hits. PROFILE adds server overhead, so keep this small.
+    """
+
+    def __init__(self, max_samples=1000, slow_query_ms=500.0, profile_sample_rate=0.0):
+        self.max_samples = max_samples
+        self.slow_query_ms = slow_query_ms
+        self.profile_sample_rate = profile_sample_rate
+
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=max_samples))
+        self._slow = deque(maxlen=100)
+        self._totals = defaultdict(lambda: {'count': 0, 'errors': 0, 'rows': 0, 'seconds': 0.0})
+
+    def should_profile(self):
+        return self.profile_sample_rate > 0 and random.random() < self.profile_sample_rate
+
+    def record(self, name, params, wall_ms, rows=None, summary=None, error=None):
+        sample = QuerySample(
+            timestamp=time.time(),
+            query=name,
+            wall_ms=wall_ms,
+            available_ms=getattr(summary, 'result_available_after', None),
+            consumed_ms=getattr(summary, 'result_consumed_after', None),
+            rows=rows,
+            db_hits=total_db_hits(getattr(summary, 'profile', None)),
+            error=error,
+            params=params,
+        )
+        slow = self.slow_query_ms is not None and wall_ms >= self.slow_query_ms
+        with self._lock:
+            self._samples[name].append(sample)
+            totals = self._totals[name]
+            totals['count'] += 1
+            totals['errors'] += error is not None
+            totals['rows'] += rows or 0
+            totals['seconds'] += wall_ms / 1000
+            if slow:
+                self._slow.append(sample)
+        if slow:
+            slow_query_logger.warning(
+                'Slow query %s: %.0f ms wall, %s ms available, %s ms consumed, %s rows, %s db hits%s; params: %s',
+                name, wall_ms, sample.available_ms, sample.consumed_ms, rows, sample.db_hits,
+                f', failed: {error}' if error else '', format_params(params),
+            )
+        return sample
+
+    def samples(self, name=None):
+        """Recorded samples, oldest first, as a DataFrame. Parameters are left out."""
+        with self._lock:
+            names = [name] if name is not None else list(self._samples)
+            rows = [s for n in names for s in self._samples.get(n, ())]
+        frame = pd.DataFrame(rows, columns=QuerySample._fields).drop(columns='params')
+        frame['timestamp'] = pd.to_datetime(frame['timestamp'], unit='s')
+        return frame.sort_values('timestamp', ignore_index=True)
+
+    def slow_queries(self):
+        """The most recent slow queries, newest first, including their parameters."""
+        with self._lock:
+            slow = list(self._slow)
+        frame = pd.DataFrame(reversed(slow), columns=QuerySample._fields)
+        frame['timestamp'] = pd.to_datetime(frame['timestamp'], unit='s')
+        frame['params'] = frame['params'].map(format_params)
+        return frame
+
+    def summary(self):
+        """
+        Per-query latency over the sample window.
+
+        Returns:
+            pandas.DataFrame: One row per query with call and error counts, wall
+            time percentiles, and mean server times, rows and db hits.
+        """
+        with self._lock:
+            windows = {name: list(samples) for name, samples in self._samples.items()}
+            totals = {name: dict(totals) for name, totals in self._totals.items()}
+
+        rows = []
+        for name, samples in sorted(windows.items()):
+            wall = sorted(s.wall_ms for s in samples)
+            rows.append({
+                'query': name,
+                'calls': totals[name]['count'],
+                'errors': totals[name]['errors'],
+                **{f'p{int(q * 100)}_ms': percentile(wall, q) for q in QUANTILES},
+                'max_ms': wall[-1],
+                'available_ms': _mean(s.available_ms for s in samples),
+                'consumed_ms': _mean(s.consumed_ms for s in samples),
+                'rows': _mean(s.rows for s in samples),
+                'db_hits': _mean(s.db_hits for s in samples),
+            })
+        return pd.DataFrame(rows, columns=[
+            'query', 'calls', 'errors', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms',
+            'available_ms', 'consumed_ms', 'rows', 'db_hits',
+        ])
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._slow.clear()
+            self._totals.clear()
+
+    def prometheus_text(self, cache_stats=None, pool_stats=None):
+        """
+        Render the metrics, and optionally cache and pool stats, in the Prometheus
+        text format. ``pool_stats`` maps pool names to their stats.
+        """
+        with self._lock:
+            windows = {name: sorted(s.wall_ms for s in samples) for name, samples in self._samples.items()}
+            totals = {name: dict(totals) for name, totals in self._totals.items()}
+
+        lines = [
+            '# HELP fusec_query_duration_seconds Wall time of Driver queries over the sample window.',
+            '# TYPE fusec_query_duration_seconds summary',
+        ]
+        for name in sorted(totals):
+            for q in QUANTILES:
+                value = percentile(windows.get(name, []), q)
+                if value is not None:
+                    lines.append(f'fusec_query_duration_seconds{{query="{name}",quantile="{q}"}} {value / 1000:.6f}')
+            lines.append(f'fusec_query_duration_seconds_sum{{query="{name}"}} {totals[name]["seconds"]:.6f}')
+            lines.append(f'fusec_query_duration_seconds_count{{query="{name}"}} {totals[name]["count"]}')
+
+        for metric, key, help_text in (
+            ('fusec_query_errors_total', 'errors', 'Failed Driver queries.'),
+            ('fusec_query_rows_total', 'rows', 'Rows returned by Driver queries.'),
+        ):
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} counter')
+            for name in sorted(totals):
+                lines.append(f'{metric}{{query="{name}"}} {totals[name][key]}')
+
+        if cache_stats is not None:
+            for key, kind in (('hits', 'counter'), ('misses', 'counter'), ('evictions', 'counter'),
+                              ('expirations', 'counter'), ('invalidations', 'counter'),
+                              ('entries', 'gauge'), ('bytes', 'gauge')):
+                metric = f'fusec_cache_{key}_total' if kind == 'counter' else f'fusec_cache_{key}'
+                lines.append(f'# TYPE {metric} {kind}')
+                lines.append(f'{metric} {cache_stats[key]}')
+
+        if pool_stats:
+            for key, kind in (('sessions_in_use', 'gauge'), ('peak_sessions_in_use', 'gauge'),
+                              ('sessions_opened', 'counter'), ('failed_sessions', 'counter')):
+                metric = f'fusec_pool_{key}_total' if kind == 'counter' else f'fusec_pool_{key}'
+                lines.append(f'# TYPE {metric} {kind}')
+                for pool in sorted(pool_stats):
+                    lines.append(f'{metric}{{pool="{pool}"}} {pool_stats[pool][key]}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _mean(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+
+class _Probe:
+    def __init__(self, query):
+        self.query = query
+        self.rows = None
+        self.summary = None
+
+    def count(self, records):
+        """Pass records through while counting them."""
+        self.rows = 0
+        for record in records:
+            self.rows += 1
+            yield record
+
+    def finish(self, summary):
+        self.summary = summary
+
+
+@contextmanager
+def instrument(metrics, name, query, params):
+    """
+    Measure one query. Run ``probe.query`` (which carries a ``PROFILE`` prefix
+    when sampled), pass the records through ``probe.count`` and hand the result
+    summary to ``probe.finish``. A ``None`` metrics store measures nothing.
+    """
+    if metrics is None:
+        yield _Probe(query)
+        return
+    probe = _Probe('PROFILE ' + query if metrics.should_profile() else query)
+    started = time.perf_counter()
+    try:
+        yield probe
+    except Exception as e:
+        metrics.record(name, params, (time.perf_counter() - started) * 1000, probe.rows, probe.summary,
+                       error=type(e).__name__)
+        raise
+    metrics.record(name, params, (time.perf_counter() - started) * 1000, probe.rows, probe.summary)
+
+
+class MetricsExporter:
+    """
+    Background thread that periodically writes ``render()`` to a file, for the
+    node_exporter textfile collector or any scraper that reads files. The file
+    is replaced atomically so readers never see a partial write.
+    """
+
+    def __init__(self, path, render, interval=15.0):
+        self.path = path
+        self.render = render
+        self.interval = interval
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='metrics-exporter', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def write(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.fusec-metrics-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(self.render())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except Exception:
+                logger.exception('Writing metrics to %s failed', self.path)
+
+    def stop(self):
+        self._stop.set()
@@ -1,19 +1,183 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
+import random
+import threading
+import time
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from database.nvd_mirror import get_mirror
+from database.settings import get_setting
+
+NVD_API_URL = "https://services.nvd.nist.gov/rest/json/cves/2.0"
+
+# NVD allows 5 requests per rolling 30 seconds without an API key and 50 with one
+NVD_WINDOW = 30.0
+NVD_REQUESTS_PER_WINDOW = 5
+NVD_REQUESTS_PER_WINDOW_WITH_KEY = 50
+
+RETRY_STATUSES = {403, 429, 500, 502, 503, 504}
+
+_session = requests.Session()
+
+logger = logging.getLogger(__name__)
+
 
 def get_vulnerability_by_cve(cve_code):
     """
-    Retrieve vulnerability details from the NIST database using the CVE code.
-    
+    Retrieve vulnerability details using the CVE code.
+
+    The local NVD mirror is queried first. The live NIST API is only used when
+    the CVE is not mirrored and ``[NVD] API_FALLBACK`` is enabled (the default).
+
     Args:
         cve_code (str): The CVE code to look up.
     
     Returns:
-        dict: A dictionary containing vulnerability details, or None if not found.
+        str: The NVD CVE API 2.0 response body, or None if not found.
     """
-    nist_url = f"https://services.nvd.nist.gov/rest/json/cves/2.0?cveId={cve_code}"
-    response = requests.get(nist_url)
+    mirror = get_mirror()
+    if mirror is not None:
+        details = mirror.get_response_text(cve_code)
+        if details is not None:
+            return details
+
+    if not get_setting('NVD', 'API_FALLBACK', True, bool):
+        return None
+
+    try:
+        api_key = get_setting('NVD', 'API_KEY')
+        response = _session.get(
+            get_setting('NVD', 'API_URL', NVD_API_URL),
+            params={'cveId': cve_code},
+            headers={'apiKey': api_key} if api_key else {},
+            timeout=get_setting('NVD', 'API_TIMEOUT', 15.0, float),
+        )
+    except requests.RequestException as e:
+        logger.warning("NVD lookup of %s failed: %s", cve_code, e)
+        return None
     if response.status_code == 200:
         return response.text
-    else:
-        print(f"Error: {response.status_code}")
-        return None
+    logger.warning("NVD lookup of %s failed: HTTP %s", cve_code, response.status_code)
+    return None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket allowing ``rate`` acquisitions per ``per`` seconds.
+
+    ``burst`` defaults to 1, which spaces requests evenly. That keeps a strict
+    rolling-window limit like NVD's from being exceeded by a refilled burst.
+    """
+
+    def __init__(self, rate, per, burst=1):
+        self.interval = per / rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) / self.interval)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) * self.interval
+            time.sleep(wait)
+
+
+def _fetch_with_retries(session, bucket, base_url, cve_code, headers, timeout, max_retries, backoff):
+    for attempt in range(max_retries + 1):
+        bucket.acquire()
+        try:
+            response = session.get(base_url, params={'cveId': cve_code}, headers=headers, timeout=timeout)
+        except requests.RequestException as e:
+            error = str(e)
+            retry_after = None
+        else:
+            if response.status_code == 200:
+                return response.text
+            error = f"HTTP {response.status_code}"
+            if response.status_code not in RETRY_STATUSES:
+                raise RuntimeError(error)
+            retry_after = response.headers.get('Retry-After')
+        if attempt < max_retries:
+            if retry_after is not None and retry_after.isdigit():
+                delay = float(retry_after)
+            else:
+                delay = backoff * (2 ** attempt)
+            time.sleep(delay + random.uniform(0, backoff))
+    raise RuntimeError(f"{error} after {max_retries + 1} attempts")
+
+
+def enrich_cves(cve_codes, max_workers=4, base_url=None, api_key=None, use_mirror=True,
+                max_retries=5, backoff=2.0, timeout=30.0, requests_per_window=None, window=NVD_WINDOW):
+    """
+    Fetch details for many CVEs concurrently, yielding results as they complete.
+
+    Requests share one pooled HTTP session and are paced by a token bucket that
+    respects the NVD per-window limits. Rate limiting, server errors and network
+    failures are retried with exponential backoff, honouring ``Retry-After``.
+    Lookups that still fail are logged and yielded with their error.
+
+    Args:
+        cve_codes (iterable): CVE codes to look up; duplicates are fetched once.
+        max_workers (int): Number of concurrent requests.
+        base_url (str): CVE API endpoint, e.g. a local stub server in tests.
+            Defaults to ``[NVD] API_URL`` or the public NVD API.
+        api_key (str): NVD API key, defaults to ``[NVD] API_KEY``. Raises the
+            default rate limit from 5 to 50 requests per window.
+        use_mirror (bool): Answer CVEs found in the local mirror without a request.
+        max_retries (int): Retries per CVE after the first attempt.
+        backoff (float): Base delay in seconds for exponential backoff.
+        timeout (float): Per-request timeout in seconds.
+        requests_per_window (int): Override the request budget per window.
+        window (float): Rate limit window in seconds.
+
+    Yields:
+        tuple: ``(cve_code, details, error)`` where ``details`` is the NVD API
+        response body, or None together with an ``error`` message.
+    """
+    base_url = base_url or get_setting('NVD', 'API_URL', NVD_API_URL)
+    api_key = api_key or get_setting('NVD', 'API_KEY')
+    if requests_per_window is None:
+        requests_per_window = NVD_REQUESTS_PER_WINDOW_WITH_KEY if api_key else NVD_REQUESTS_PER_WINDOW
+    headers = {'apiKey': api_key} if api_key else {}
+
+    pending = []
+    mirror = get_mirror() if use_mirror else None
+    for cve_code in dict.fromkeys(cve_codes):
+        details = mirror.get_response_text(cve_code) if mirror is not None else None
+        if details is not None:
+            yield cve_code, details, None
+        else:
+            pending.append(cve_code)
+    if not pending:
+        return
+
+    bucket = TokenBucket(requests_per_window, window)
+    with requests.Session() as session:
+        session.mount(base_url, HTTPAdapter(pool_connections=1, pool_maxsize=max_workers))
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            futures = {
+                executor.submit(
+                    _fetch_with_retries, session, bucket, base_url, cve_code, headers, timeout, max_retries, backoff
+                ): cve_code
+                for cve_code in pending
+            }
+            for future in as_completed(futures):
+                cve_code = futures[future]
+                try:
+                    yield cve_code, future.result(), None
+                except Exception as e:
+                    logger.warning("NVD lookup of %s failed: %s", cve_code, e)
+                    yield cve_code, None, str(e)
+        finally:
+            # A consumer that stops early must not wait for the queued, throttled fetches
+            executor.shutdown(wait=False, cancel_futures=True)
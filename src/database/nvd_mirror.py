@@ -0,0 +1,213 @@
+"""
+Local mirror of the NVD CVE database in SQLite.
+
+Imports NVD JSON 2.0 feed files (``nvdcve-2.0-<year>.json[.gz]`` and the
+``-modified``/``-recent`` feeds) by streaming them one CVE at a time, so memory
+stays flat regardless of feed size. Re-importing a feed only replaces CVEs
+whose ``lastModified`` is newer than the stored copy.
+
+Import feeds from the ``src`` directory:
+
+    python -m database.nvd_mirror import feeds/nvdcve-2.0-*.json.gz
+    python -m database.nvd_mirror update feeds/nvdcve-2.0-modified.json.gz
+"""
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from database.settings import get_setting
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'nvd.sqlite3')
+
+_CHUNK_SIZE = 1 << 16
+
+
+def _open_feed(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def iter_feed(path):
+    """
+    Stream the ``cve`` objects of an NVD JSON 2.0 feed file.
+
+    Only the ``vulnerabilities`` array is decoded, one element at a time, so the
+    file is never loaded as a whole.
+    """
+    decoder = json.JSONDecoder()
+    with _open_feed(path) as f:
+        buffer = ''
+        # Skip ahead to the start of the "vulnerabilities" array
+        while True:
+            chunk = f.read(_CHUNK_SIZE)
+            if not chunk:
+                return
+            buffer += chunk
+            start = buffer.find('"vulnerabilities"')
+            if start != -1:
+                bracket = buffer.find('[', start)
+                if bracket != -1:
+                    buffer = buffer[bracket + 1:]
+                    break
+            else:
+                buffer = buffer[-len('"vulnerabilities"'):]
+
+        eof = False
+        while True:
+            stripped = buffer.lstrip(' \t\r\n,')
+            if stripped.startswith(']'):
+                return
+            try:
+                item, end = decoder.raw_decode(stripped)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(_CHUNK_SIZE)
+                eof = not chunk
+                buffer = stripped + chunk
+                continue
+            buffer = stripped[end:]
+            yield item.get('cve', item)
+
+
+class NvdMirror:
+    """SQLite-backed CVE store. One connection per thread, safe to share."""
+
+    def __init__(self, path=None):
+        self.path = path or get_setting('NVD', 'MIRROR_PATH', DEFAULT_PATH)
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS cves (
+                    id TEXT PRIMARY KEY,
+                    published TEXT,
+                    last_modified TEXT,
+                    data TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS feeds (
+                    name TEXT PRIMARY KEY,
+                    imported_at REAL NOT NULL,
+                    cve_count INTEGER NOT NULL
+                );
+                """
+            )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def import_feed(self, path, batch_size=2000):
+        """
+        Upsert every CVE of a feed file, keeping the newer copy on conflicts.
+
+        Returns:
+            int: The number of CVEs read from the feed.
+        """
+        conn = self._connection()
+        count = 0
+        batch = []
+
+        def flush():
+            with conn:
+                conn.executemany(
+                    """
+                    INSERT INTO cves (id, published, last_modified, data) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(id) DO UPDATE SET
+                        published = excluded.published,
+                        last_modified = excluded.last_modified,
+                        data = excluded.data
+                    WHERE excluded.last_modified >= COALESCE(cves.last_modified, '')
+                    """,
+                    batch,
+                )
+            batch.clear()
+
+        for cve in iter_feed(path):
+            batch.append((cve['id'], cve.get('published'), cve.get('lastModified'), json.dumps(cve, separators=(',', ':'))))
+            count += 1
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO feeds (name, imported_at, cve_count) VALUES (?, ?, ?)",
+                (os.path.basename(path), time.time(), count),
+            )
+        return count
+
+    def get(self, cve_id):
+        """Return the NVD ``cve`` object as a dict, or None if it is not mirrored."""
+        row = self._connection().execute("SELECT data FROM cves WHERE id = ?", (cve_id.upper(),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_response_text(self, cve_id):
+        """
+        Return the CVE wrapped like an NVD CVE API 2.0 response body, matching
+        what the live API returns for a ``cveId`` query.
+        """
+        row = self._connection().execute("SELECT data FROM cves WHERE id = ?", (cve_id.upper(),)).fetchone()
+        if row is None:
+            return None
+        return (
+            '{"resultsPerPage":1,"startIndex":0,"totalResults":1,"format":"NVD_CVE","version":"2.0",'
+            '"vulnerabilities":[{"cve":' + row[0] + '}]}'
+        )
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM cves").fetchone()[0]
+
+    def feeds(self):
+        return self._connection().execute(
+            "SELECT name, imported_at, cve_count FROM feeds ORDER BY imported_at"
+        ).fetchall()
+
+
+_mirror = None
+_mirror_lock = threading.Lock()
+
+
+def get_mirror():
+    """Return the process-wide NvdMirror, or None if no mirror database exists yet."""
+    global _mirror
+    if _mirror is None:
+        path = get_setting('NVD', 'MIRROR_PATH', DEFAULT_PATH)
+        if not os.path.exists(path):
+            return None
+        with _mirror_lock:
+            if _mirror is None:
+                _mirror = NvdMirror(path)
+    return _mirror
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain the local NVD CVE mirror.')
+    parser.add_argument('command', choices=['import', 'update', 'stats'],
+                        help='import/update: load feed files (update is meant for the modified feed)')
+    parser.add_argument('feeds', nargs='*', help='NVD JSON 2.0 feed files, optionally gzipped')
+    parser.add_argument('--path', help='Mirror database path')
+    args = parser.parse_args()
+
+    mirror = NvdMirror(args.path)
+    for feed in args.feeds:
+        started = time.perf_counter()
+        count = mirror.import_feed(feed)
+        print(f"{feed}: {count} CVEs in {time.perf_counter() - started:.1f}s")
+    print(f"Mirror {mirror.path} holds {len(mirror)} CVEs")
+
+
+if __name__ == '__main__':
+    main()
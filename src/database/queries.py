@@ -0,0 +1,362 @@
+"""
+Cypher text and result conversion shared by Driver and AsyncDriver.
+
+Each converter takes an iterable of records, so the same function works on a
+synchronous result and on records fetched from an async result.
+"""
+import functools
+
+from database.catalog import SoftwareCatalog
+from database.frames import maps_to_frame, records_to_frame
+from database.versions import version_key
+
+HOST_COLUMNS = ['ID', 'Type', 'Sub_Type', 'State', 'Critical', 'Total_Risk_Score', 'risk_level']
+RISK_LEVEL_COLUMNS = ['risk_level', 'count']
+
+
+def first_value(records):
+    for record in records:
+        return record.value()
+    return None
+
+
+def to_frame(records):
+    return records_to_frame(records)
+
+
+GENERAL_SUMMARY = """
+    CALL {
+        MATCH (s:System)
+        RETURN COUNT(DISTINCT s.id) AS total_hosts,
+               COUNT(DISTINCT CASE WHEN s.critical > 0 THEN s.id END) AS total_critical_hosts
+    }
+    CALL {
+        // One pass over Finding: group by (severity, title), then fold the groups
+        MATCH (f:Finding)
+        WITH f.severity AS severity, f.title AS title, COUNT(*) AS count
+        WITH COUNT(DISTINCT title) AS total_unique_findings,
+             SUM(count) AS total_findings,
+             COLLECT({severity: severity, count: count}) AS groups
+        UNWIND CASE WHEN SIZE(groups) = 0 THEN [NULL] ELSE groups END AS g
+        WITH total_unique_findings, total_findings, g.severity AS severity, SUM(g.count) AS count
+        RETURN total_unique_findings,
+               total_findings,
+               [x IN COLLECT({Severity: severity, Count: count}) WHERE x.Count > 0] AS findings_by_severity
+    }
+    CALL {
+        MATCH (v:Vulnerability)
+        RETURN COUNT(DISTINCT v.cve) AS total_vulnerabilities
+    }
+    CALL {
+        MATCH (system)-[:in_country]->(country)
+        WITH country.name AS country, COUNT(system) AS count
+        ORDER BY count DESC
+        RETURN COLLECT({country: country, count: count}) AS country_count
+    }
+    RETURN total_hosts,
+           total_critical_hosts,
+           total_findings,
+           total_unique_findings,
+           total_vulnerabilities,
+           findings_by_severity,
+           country_count
+"""
+
+
+# Approximate mode: the distinct counts come from database.hll sketches instead
+GENERAL_SUMMARY_APPROXIMATE = """
+    CALL {
+        MATCH (s:System)
+        WHERE s.critical > 0
+        RETURN COUNT(s) AS total_critical_hosts
+    }
+    CALL {
+        MATCH (f:Finding)
+        WITH f.severity AS severity, COUNT(*) AS count
+        RETURN SUM(count) AS total_findings,
+               COLLECT({Severity: severity, Count: count}) AS findings_by_severity
+    }
+    CALL {
+        MATCH (system)-[:in_country]->(country)
+        WITH country.name AS country, COUNT(system) AS count
+        ORDER BY count DESC
+        RETURN COLLECT({country: country, count: count}) AS country_count
+    }
+    RETURN NULL AS total_hosts,
+           total_critical_hosts,
+           total_findings,
+           NULL AS total_unique_findings,
+           NULL AS total_vulnerabilities,
+           findings_by_severity,
+           country_count
+"""
+
+
+def to_summary(records):
+    record = next(iter(records))
+    return {
+        'total_hosts': record['total_hosts'],
+        'total_critical_hosts': record['total_critical_hosts'],
+        'total_findings': record['total_findings'],
+        'total_unique_findings': record['total_unique_findings'],
+        'total_vulnerabilities': record['total_vulnerabilities'],
+        'findings_by_severity': maps_to_frame(record['findings_by_severity'], ['Severity', 'Count']),
+        'country_count': maps_to_frame(record['country_count'], ['country', 'count']),
+    }
+
+
+HOSTS = """
+    MATCH (s:System)
+    RETURN COUNT(DISTINCT s.id) AS HostCount
+"""
+
+CRITICAL_HOSTS = """
+    MATCH (s:System)
+    WHERE s.critical > 0
+    RETURN COUNT(DISTINCT s.id) AS CriticalHostCount
+"""
+
+FINDINGS = """
+    MATCH (n:Finding)
+    RETURN COUNT(n) AS FindingCount
+"""
+
+VULNERABILITIES = """
+    MATCH (n:Vulnerability)
+    RETURN COUNT(DISTINCT n.cve) AS VulnerabilityCount
+"""
+
+FINDINGS_BY_SEVERITY = """
+    MATCH (n:Finding)
+    RETURN n.severity AS Severity, COUNT(n) AS Count
+"""
+
+TOTAL_UNIQUE_FINDINGS = """
+    MATCH (n:Finding)
+    RETURN COUNT(DISTINCT n.title) AS UniqueFindingsCount
+"""
+
+# Risk scores are materialized onto System nodes by database.risk
+HOST_CRITICALITY_COUNT = """
+    MATCH (s:System)
+    RETURN COALESCE(s.risk_level, "N/A") AS risk_level, COUNT(*) AS count
+    ORDER BY count DESC
+"""
+
+HOST_CRITICALITY = """
+    MATCH (s:System)
+    WHERE s.risk_score IS NOT NULL AND s.risk_finding_count > 0
+    RETURN s.id AS ID,
+           s.type AS Type,
+           s.sub_type AS Sub_Type,
+           s.state AS State,
+           s.critical AS Critical,
+           s.risk_score AS Total_Risk_Score,
+           s.risk_level AS risk_level
+    ORDER BY Total_Risk_Score DESC LIMIT 10
+"""
+
+SOFTWARE_CATALOG = """
+    MATCH (n:SoftwareInstallation)
+    RETURN n.publisher AS publisher, n.product AS product, COLLECT(DISTINCT n.version) AS versions
+"""
+
+
+def to_catalog(records):
+    return SoftwareCatalog((r['publisher'], r['product'], r['versions']) for r in records)
+
+
+def risk_breakdown(match_clause):
+    """
+    Rank the systems bound to ``s`` by ``match_clause`` and count them per risk
+    level in one traversal. The result holds the top-10 table and the pie data.
+    """
+    return f"""
+    {match_clause}
+    WITH DISTINCT s
+    WITH COLLECT(s) AS hosts
+    CALL {{
+        WITH hosts
+        UNWIND hosts AS s
+        WITH s
+        WHERE s.risk_finding_count > 0
+        ORDER BY s.risk_score DESC LIMIT 10
+        RETURN COLLECT({{
+            ID: s.id,
+            Type: s.type,
+            Sub_Type: s.sub_type,
+            State: s.state,
+            Critical: s.critical,
+            Total_Risk_Score: s.risk_score,
+            risk_level: s.risk_level
+        }}) AS top_hosts
+    }}
+    CALL {{
+        WITH hosts
+        UNWIND hosts AS s
+        WITH COALESCE(s.risk_level, "N/A") AS risk_level, COUNT(*) AS count
+        ORDER BY count DESC
+        RETURN COLLECT({{risk_level: risk_level, count: count}}) AS distribution
+    }}
+    RETURN top_hosts, distribution
+"""
+
+
+def to_breakdown(records):
+    record = next(iter(records))
+    return (
+        maps_to_frame(record['top_hosts'], HOST_COLUMNS),
+        maps_to_frame(record['distribution'], RISK_LEVEL_COLUMNS),
+    )
+
+
+SYSTEMS_BY_CVE = risk_breakdown("""
+    MATCH (v:Vulnerability {cve: $cve})--(:Weakness)--(s:System)
+""")
+
+def search_sequences(publishers, products=None, min_versions=None, max_versions=None):
+    """One entry per advanced search sequence, grouped into query shapes by ``search_parameters``."""
+    # Ensure publishers, products, and versions are lists for iteration
+    if products is None:
+        products = [None] * len(publishers)
+    if min_versions is None:
+        min_versions = [None] * len(publishers)
+    if max_versions is None:
+        max_versions = [None] * len(publishers)
+    return [
+        {'publisher': publisher, 'product': product, 'min_key': version_key(min_version), 'max_key': version_key(max_version)}
+        for publisher, product, min_version, max_version in zip(publishers, products, min_versions, max_versions)
+    ]
+
+
+# Advanced search sequences are grouped by the parts they set, and each group is
+# matched by its own query shape with only those predicates. Optional
+# predicates like (seq.product IS NULL OR n.product = seq.product) would keep
+# the planner from seeking the (publisher, product, version_key) index.
+SEARCH_PARTS = (('product', 'product'), ('min', 'min_key'), ('max', 'max_key'))
+
+
+def search_parameters(sequences):
+    """
+    Group ``search_sequences`` entries by shape.
+
+    Returns:
+        tuple: ``(shapes, parameters)``: the sorted shape names, to pass to
+        ``advanced_search_query`` or ``host_risk_page``, and one
+        ``$search_<shape>`` list per shape.
+    """
+    groups = {}
+    for seq in sequences:
+        shape = '_'.join(['publisher'] + [part for part, key in SEARCH_PARTS if seq[key] is not None])
+        groups.setdefault(shape, []).append(seq)
+    if not groups:
+        groups['publisher'] = []
+    return tuple(sorted(groups)), {f'search_{shape}': groups[shape] for shape in groups}
+
+
+def search_match(shapes):
+    """Bind ``s`` to each system with software matched by the sequences of ``shapes``."""
+    branches = []
+    for shape in shapes:
+        parts = shape.split('_')
+        properties = 'publisher: seq.publisher' + (', product: seq.product' if 'product' in parts else '')
+        bounds = [predicate for part, predicate in (('min', 'n.version_key >= seq.min_key'),
+                                                    ('max', 'n.version_key <= seq.max_key')) if part in parts]
+        where = f"\n        WHERE {' AND '.join(bounds)}" if bounds else ''
+        branches.append(f"""
+        UNWIND $search_{shape} AS seq
+        MATCH (n:SoftwareInstallation {{{properties}}}){where}
+        MATCH (n)--(s:System)
+        RETURN s""")
+    union = '\n        UNION'.join(branches)
+    return f"""
+    CALL {{{union}
+    }}"""
+
+
+@functools.lru_cache(maxsize=None)
+def advanced_search_query(shapes):
+    return risk_breakdown(search_match(shapes))
+
+
+# Keyset pagination over the host ranking, seeking on (risk_score, id) descending.
+# The first page and the following pages are separate queries so that both
+# keep a plain range predicate on the System(risk_score, id) index. IDs may mix
+# integers and strings; descending, Cypher orders every number before every
+# string, so after an integer ID the string IDs of the same score follow.
+HOST_RISK_SCOPES = {
+    'fleet': """
+    MATCH (s:System)
+    """,
+    'cve': """
+    MATCH (:Vulnerability {cve: $cve})--(:Weakness)--(s:System)
+    WITH DISTINCT s
+    """,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def host_risk_page(scope, first_page, shapes=()):
+    """
+    The page query of ``scope``: ``fleet``, ``cve``, or ``search`` over the
+    sequence ``shapes`` of ``search_parameters``.
+    """
+    match = f"{search_match(shapes)}\n    WITH DISTINCT s" if scope == 'search' else HOST_RISK_SCOPES[scope]
+    seek = "" if first_page else """
+      AND s.risk_score <= $after_score
+      AND (s.risk_score < $after_score OR s.id < $after_id
+           OR (toString(s.id) = s.id AND toString($after_id) <> $after_id))"""
+    return f"""
+    {match.strip()}
+    WHERE s.risk_score IS NOT NULL AND s.risk_finding_count > 0{seek}
+      AND ($include_na OR s.risk_score > 0)
+      AND ($types IS NULL OR s.type IN $types)
+      AND ($states IS NULL OR s.state IN $states)
+      AND ($providers IS NULL OR s.provider_name IN $providers)
+    RETURN s.id AS ID,
+           s.type AS Type,
+           s.sub_type AS Sub_Type,
+           s.state AS State,
+           s.critical AS Critical,
+           s.risk_score AS Total_Risk_Score,
+           s.risk_level AS risk_level
+    ORDER BY Total_Risk_Score DESC, ID DESC
+    LIMIT $page_size
+"""
+
+
+def to_host_frame(records):
+    return records_to_frame(records, HOST_COLUMNS)
+
+
+HOST_FILTER_OPTIONS = """
+    MATCH (s:System)
+    RETURN COLLECT(DISTINCT s.type) AS types,
+           COLLECT(DISTINCT s.state) AS states,
+           COLLECT(DISTINCT s.provider_name) AS providers
+"""
+
+
+def to_filter_options(records):
+    record = next(iter(records))
+    return {key: sorted(record[key], key=str) for key in ('types', 'states', 'providers')}
+
+
+MITIGATION = """
+    MATCH (:Vulnerability {cve: $cve})-[:has_mitigation]->(m:Mitigation)
+    RETURN m.type AS type, m.content AS content, m.description AS description
+    LIMIT 1
+"""
+
+
+def to_mitigation(records):
+    for record in records:
+        return record.data()
+    return None
+
+
+COUNTRY_COUNT = """
+    MATCH (system)-[:in_country]->(country)
+    RETURN country.name AS country, COUNT(system) AS count
+    ORDER BY count DESC
+"""
@@ -0,0 +1,254 @@
+"""
+Read methods of Driver and AsyncDriver, written once.
+
+Each read is a plan: a generator function that yields requests and returns the
+method's result. A driver carries out the requests its own way, blocking or on
+the event loop, and sends each result back into the plan:
+
+- ``Run(name, query, convert, params)`` runs a query, instrumented as ``name``.
+- ``Call(method, args)`` calls another read method of the same driver, through
+  its cache.
+- ``ENSURE_RISK_SCORES`` materializes stale risk scores before they are read.
+
+``@read`` registers a plan, and ``bind_reads`` adds every registered plan to a
+driver class as a ``@cached`` method of the same name and signature.
+"""
+import abc
+from collections import namedtuple
+import functools
+import inspect
+
+from database import hll, queries
+from database.cache import cached
+from database.settings import get_setting
+from database.statistics import STATISTICS, to_statistics
+
+CATALOG_TTL = get_setting('CACHE', 'CATALOG_TTL', 3600.0, float)
+
+Run = namedtuple('Run', ['name', 'query', 'convert', 'params'], defaults=[{}])
+Call = namedtuple('Call', ['method', 'args'], defaults=[()])
+ENSURE_RISK_SCORES = 'ensure_risk_scores'
+
+READS = []
+
+
+def read(plan=None, ttl=None):
+    """Register a read plan, cached for ``ttl`` seconds or the cache default."""
+    if plan is None:
+        return functools.partial(read, ttl=ttl)
+    READS.append((plan, ttl))
+    return plan
+
+
+def _with_self(method, plan):
+    """Give ``method`` the signature of ``plan`` with a leading ``self``."""
+    signature = inspect.signature(plan)
+    self_parameter = inspect.Parameter('self', inspect.Parameter.POSITIONAL_OR_KEYWORD)
+    method.__signature__ = signature.replace(parameters=[self_parameter, *signature.parameters.values()])
+    return method
+
+
+def _sync_method(plan):
+    @functools.wraps(plan)
+    def method(self, *args, **kwargs):
+        requests = plan(*args, **kwargs)
+        value = None
+        while True:
+            try:
+                request = requests.send(value)
+            except StopIteration as stop:
+                return stop.value
+            value = self._request(request)
+
+    return _with_self(method, plan)
+
+
+def _async_method(plan):
+    @functools.wraps(plan)
+    async def method(self, *args, **kwargs):
+        requests = plan(*args, **kwargs)
+        value = None
+        while True:
+            try:
+                request = requests.send(value)
+            except StopIteration as stop:
+                return stop.value
+            value = await self._request(request)
+
+    return _with_self(method, plan)
+
+
+def bind_reads(asynchronous=False):
+    """
+    Class decorator adding every registered read as a cached method. The class
+    implements ``_request(request)``, as a coroutine if ``asynchronous``.
+    """
+    def bind(cls):
+        for plan, ttl in READS:
+            method = _async_method(plan) if asynchronous else _sync_method(plan)
+            setattr(cls, plan.__name__, cached(method, ttl=ttl))
+        return abc.update_abstractmethods(cls)
+
+    return bind
+
+
+def _counted(key, name, query, convert):
+    """A total from the write-time counters when reconciled, else counted by ``query``."""
+    statistics = yield Call('get_statistics')
+    if statistics is not None:
+        return statistics[key]
+    return (yield Run(name, query, convert))
+
+
+@read
+def get_statistics():
+    """Dashboard totals from the write-time counters, or None if they were never reconciled."""
+    return (yield Run('get_statistics', STATISTICS, to_statistics))
+
+
+@read
+def get_general_summary():
+    """
+    In approximate mode, with sketches stored, the distinct counts are
+    HyperLogLog estimates listed under ``approximate``. The other totals, and
+    all of them otherwise, come from the counters when reconciled, or else are
+    counted, without distinct sets in approximate mode.
+    """
+    summary = yield Call('get_statistics')
+    if hll.approximate_mode():
+        estimates = yield Call('get_distinct_estimates')
+        if estimates is not None:
+            if summary is None:
+                summary = yield Run('get_general_summary', queries.GENERAL_SUMMARY_APPROXIMATE, queries.to_summary)
+            return {**summary, **estimates, 'approximate': list(estimates)}
+    if summary is None:
+        summary = yield Run('get_general_summary', queries.GENERAL_SUMMARY, queries.to_summary)
+    return summary
+
+
+@read
+def get_distinct_estimates(countries=None, providers=None):
+    return (yield Run('get_distinct_estimates', hll.SKETCHES, hll.to_estimates,
+                      {'countries': countries, 'providers': providers}))
+
+
+@read
+def get_sketch_partitions():
+    return (yield Run('get_sketch_partitions', hll.SKETCH_PARTITIONS, hll.to_partitions))
+
+
+@read
+def get_hosts():
+    return (yield from _counted('total_hosts', 'get_hosts', queries.HOSTS, queries.first_value))
+
+
+@read
+def get_critical_hosts():
+    return (yield from _counted('total_critical_hosts', 'get_critical_hosts', queries.CRITICAL_HOSTS,
+                                queries.first_value))
+
+
+@read
+def get_findings():
+    return (yield from _counted('total_findings', 'get_findings', queries.FINDINGS, queries.first_value))
+
+
+@read
+def get_vulnerabilities():
+    return (yield from _counted('total_vulnerabilities', 'get_vulnerabilities', queries.VULNERABILITIES,
+                                queries.first_value))
+
+
+@read
+def get_findings_by_severity():
+    return (yield from _counted('findings_by_severity', 'get_findings_by_severity', queries.FINDINGS_BY_SEVERITY,
+                                queries.to_frame))
+
+
+@read
+def get_total_unique_findings():
+    return (yield from _counted('total_unique_findings', 'get_total_unique_findings',
+                                queries.TOTAL_UNIQUE_FINDINGS, queries.first_value))
+
+
+@read
+def get_host_criticality_count():
+    yield ENSURE_RISK_SCORES
+    return (yield Run('get_host_criticality_count', queries.HOST_CRITICALITY_COUNT, queries.to_frame))
+
+
+@read
+def get_host_criticality():
+    yield ENSURE_RISK_SCORES
+    return (yield Run('get_host_criticality', queries.HOST_CRITICALITY, queries.to_frame))
+
+
+@read(ttl=CATALOG_TTL)
+def get_software_catalog():
+    return (yield Run('get_software_catalog', queries.SOFTWARE_CATALOG, queries.to_catalog))
+
+
+@read
+def get_systems_by_cve_vulnerability(cve):
+    yield ENSURE_RISK_SCORES
+    return (yield Run('get_systems_by_cve_vulnerability', queries.SYSTEMS_BY_CVE, queries.to_breakdown,
+                      {'cve': cve}))
+
+
+@read
+def advanced_search(publishers, products=None, min_versions=None, max_versions=None):
+    yield ENSURE_RISK_SCORES
+    shapes, parameters = queries.search_parameters(
+        queries.search_sequences(publishers, products, min_versions, max_versions))
+    return (yield Run('advanced_search', queries.advanced_search_query(shapes), queries.to_breakdown, parameters))
+
+
+@read
+def get_host_risk_page(after=None, page_size=50, types=None, states=None, providers=None,
+                       include_na=False, cve=None, search=None):
+    """
+    One page of the host risk ranking, ordered by risk score, then ID, descending.
+
+    Args:
+        after (tuple): ``(Total_Risk_Score, ID)`` of the last row of the previous
+            page, or None for the first page.
+        page_size (int): Number of rows per page.
+        types, states, providers (list): Only include hosts with these values.
+        include_na (bool): Include hosts whose findings all score 0.
+        cve (str): Only rank hosts affected by this CVE.
+        search (tuple): Only rank hosts matched by these ``advanced_search`` arguments.
+    """
+    yield ENSURE_RISK_SCORES
+    scope = 'cve' if cve is not None else 'search' if search is not None else 'fleet'
+    shapes, parameters = queries.search_parameters(queries.search_sequences(*search) if search is not None else [])
+    return (yield Run(
+        'get_host_risk_page',
+        queries.host_risk_page(scope, after is None, shapes if search is not None else ()),
+        queries.to_host_frame,
+        {
+            **parameters,
+            'after_score': after[0] if after else None,
+            'after_id': after[1] if after else None,
+            'page_size': page_size,
+            'types': list(types) if types else None,
+            'states': list(states) if states else None,
+            'providers': list(providers) if providers else None,
+            'include_na': include_na,
+            'cve': cve,
+        },
+    ))
+
+
+@read
+def get_host_filter_options():
+    return (yield Run('get_host_filter_options', queries.HOST_FILTER_OPTIONS, queries.to_filter_options))
+
+
+@read
+def get_mitigation(cve):
+    return (yield Run('get_mitigation', queries.MITIGATION, queries.to_mitigation, {'cve': cve}))
+
+
+@read
+def get_country_count():
+    return (yield from _counted('country_count', 'get_country_count', queries.COUNTRY_COUNT, queries.to_frame))
@@ -0,0 +1,217 @@
+"""
+Materialize per-host risk scores onto System nodes.
+
+Every System gets ``risk_score``, ``risk_level``, ``risk_finding_count`` and
+``risk_critical`` (the ``critical`` value the score was computed with).
+A host is recomputed only if it was flagged with ``risk_dirty = true`` by a
+writer, has never been scored, or its ``critical`` flag changed since it was
+last scored.
+
+Scores are materialized on the write path: ``database.ingest`` scores the
+systems it touched before it bumps the data version, and the container runs this
+module at startup to catch never-scored and otherwise stale hosts. Writers that
+change findings outside ``database.ingest`` must flag the systems they touch with
+``mark_systems_dirty`` and bump the data version. As a fallback, the Driver calls
+``ensure_risk_scores`` before reading scores, which scores flagged hosts left
+behind by such writers.
+
+Run from the ``src`` directory:
+
+    python -m database.risk [--full] [--batch-size 1000]
+"""
+import argparse
+import threading
+import time
+
+from database.connection import Driver, bump_data_version, get_data_version
+from database.schema import ensure_schema
+
+# Severity weight x known-exploited multiplier, doubled for critical hosts
+SCORE_EXPRESSION = """
+    CASE f.severity
+        WHEN "Low" THEN 1
+        WHEN "Medium" THEN 2
+        WHEN "High" THEN 4
+        ELSE 0
+    END *
+    CASE
+        WHEN f.known_exploited_vulnerability = "TRUE" THEN 8
+        ELSE 1
+    END
+"""
+
+RISK_LEVEL_EXPRESSION = """
+    CASE
+        WHEN score = 0 THEN "N/A"
+        WHEN score >= 32 THEN "Critical"
+        WHEN score >= 16 THEN "High"
+        WHEN score >= 8 THEN "Medium"
+        ELSE "Low"
+    END
+"""
+
+
+def mark_systems_dirty(tx, system_ids):
+    """Flag systems for recomputation. Writers call this in their own transaction."""
+    tx.run(
+        """
+        UNWIND $ids AS id
+        MATCH (s:System {id: id})
+        SET s.risk_dirty = true
+        """,
+        ids=list(system_ids),
+    )
+
+
+# Seeks the system_risk_dirty index, so it is cheap when nothing is flagged
+DIRTY_SYSTEMS = """
+    MATCH (s:System)
+    WHERE s.risk_dirty = true
+    RETURN elementId(s) AS id
+"""
+
+# The never-scored and critical-changed checks scan every System; startup only
+STALE_SYSTEMS = f"""
+    CALL {{
+        {DIRTY_SYSTEMS.strip()}
+        UNION
+        MATCH (s:System)
+        WHERE s.risk_score IS NULL OR s.risk_critical <> COALESCE(s.critical, 0)
+        RETURN elementId(s) AS id
+    }}
+    RETURN id
+"""
+
+ALL_SYSTEMS = """
+    MATCH (s:System)
+    RETURN elementId(s) AS id
+"""
+
+
+def _system_ids(session, query):
+    return [r['id'] for r in session.run(query)]
+
+
+def _score_batch(tx, ids):
+    return tx.run(
+        f"""
+        UNWIND $ids AS id
+        MATCH (s:System)
+        WHERE elementId(s) = id
+        CALL {{
+            WITH s
+            OPTIONAL MATCH (s)<-[:runs_on]-(:Application)-[:related_weakness]->(f:Finding)
+            RETURN COLLECT(f) AS application_findings
+        }}
+        CALL {{
+            WITH s
+            OPTIONAL MATCH (s)-[:related_weakness]->(f:Finding)
+            RETURN COLLECT(f) AS system_findings
+        }}
+        WITH s, application_findings + system_findings AS findings
+        WITH s,
+             SIZE(findings) AS finding_count,
+             REDUCE(total = 0, f IN findings | total + {SCORE_EXPRESSION}) AS base_score
+        WITH s, finding_count, CASE WHEN s.critical = 1 THEN base_score * 2 ELSE base_score END AS score
+        WITH s, finding_count, score, {RISK_LEVEL_EXPRESSION} AS level
+        WITH s, finding_count, score, level,
+             COALESCE(s.risk_score <> score OR s.risk_level <> level
+                      OR s.risk_finding_count <> finding_count
+                      OR s.risk_critical <> COALESCE(s.critical, 0), true) AS changed
+        SET s.risk_score = score,
+            s.risk_level = level,
+            s.risk_finding_count = finding_count,
+            s.risk_critical = COALESCE(s.critical, 0),
+            s.risk_dirty = false
+        RETURN COUNT(CASE WHEN changed THEN s END) AS updated
+        """,
+        ids=ids,
+    ).single()['updated']
+
+
+def score_systems(session, ids, batch_size=1000):
+    """
+    Score the systems with element IDs ``ids`` in batches and clear their flags.
+
+    Returns:
+        int: The number of systems whose stored score changed.
+    """
+    updated = 0
+    for start in range(0, len(ids), batch_size):
+        updated += session.execute_write(_score_batch, ids[start:start + batch_size])
+    return updated
+
+
+def score_dirty_systems(session, batch_size=1000):
+    """Score the systems flagged with ``risk_dirty``. Does not bump the data version."""
+    return score_systems(session, _system_ids(session, DIRTY_SYSTEMS), batch_size)
+
+
+def materialize_risk_scores(driver=None, batch_size=1000, full=False, schema=True):
+    """
+    Recompute the stored risk score of every stale System.
+
+    Args:
+        driver (Driver): Connection to use, defaults to a new Driver.
+        batch_size (int): Number of systems scored per write transaction.
+        full (bool): Recompute every System, not just the stale ones.
+        schema (bool): Create the indexes the stale-system lookup relies on first.
+
+    Returns:
+        int: The number of systems whose stored score changed. The data version
+        is bumped only if this is not 0.
+    """
+    driver = driver or Driver()
+    with driver.session() as session:
+        if schema:
+            ensure_schema(session)
+        updated = score_systems(session, _system_ids(session, ALL_SYSTEMS if full else STALE_SYSTEMS), batch_size)
+        if updated:
+            session.execute_write(bump_data_version)
+    return updated
+
+
+_checked_version = object()  # data version whose scores are known to be fresh
+_checked_lock = threading.Lock()
+
+
+def ensure_risk_scores(driver):
+    """
+    Score hosts that writers flagged but did not materialize, before their scores
+    are read. Checked at most once per data version and process: one DataVersion
+    lookup, plus one ``risk_dirty`` index seek after a version change.
+
+    The data version is not bumped. The writer that flagged the hosts bumped it
+    already, and every read of the new version runs this check first, so no
+    result cached under it holds the old scores.
+
+    Returns:
+        int: The number of systems whose stored score changed.
+    """
+    global _checked_version
+    with driver.session() as session:
+        version = get_data_version(session)
+    if version == _checked_version:
+        return 0
+    with _checked_lock:
+        if version == _checked_version:
+            return 0
+        with driver.session() as session:
+            updated = score_dirty_systems(session)
+        _checked_version = version
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Materialize host risk scores onto System nodes.')
+    parser.add_argument('--full', action='store_true', help='Recompute every System, not just stale ones')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    updated = materialize_risk_scores(batch_size=args.batch_size, full=args.full)
+    print(f"Updated risk scores of {updated} systems in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+"""
+Idempotent schema bootstrap for the FuSec graph.
+
+Creates the constraints and indexes behind every lookup the app performs and
+reports which indexes the Driver queries actually use. Safe to run on every
+container start:
+
+    python -m database.schema [--report] [--strict]
+"""
+import argparse
+from contextlib import contextmanager
+import re
+import sys
+
+from neo4j.exceptions import Neo4jError, ServiceUnavailable
+
+from database.connection import Driver
+from database.reads import ENSURE_RISK_SCORES, Call
+
+# Uniqueness constraints, with the range index to fall back to when existing
+# data contains duplicates and the constraint cannot be created
+CONSTRAINTS = [
+    (
+        'system_id_unique',
+        "CREATE CONSTRAINT system_id_unique IF NOT EXISTS FOR (s:System) REQUIRE s.id IS UNIQUE",
+        "CREATE INDEX system_id IF NOT EXISTS FOR (s:System) ON (s.id)",
+    ),
+    (
+        'vulnerability_cve_unique',
+        "CREATE CONSTRAINT vulnerability_cve_unique IF NOT EXISTS FOR (v:Vulnerability) REQUIRE v.cve IS UNIQUE",
+        "CREATE INDEX vulnerability_cve IF NOT EXISTS FOR (v:Vulnerability) ON (v.cve)",
+    ),
+    (
+        'finding_id_unique',
+        "CREATE CONSTRAINT finding_id_unique IF NOT EXISTS FOR (f:Finding) REQUIRE f.id IS UNIQUE",
+        "CREATE INDEX finding_id IF NOT EXISTS FOR (f:Finding) ON (f.id)",
+    ),
+    (
+        'application_id_unique',
+        "CREATE CONSTRAINT application_id_unique IF NOT EXISTS FOR (a:Application) REQUIRE a.id IS UNIQUE",
+        "CREATE INDEX application_id IF NOT EXISTS FOR (a:Application) ON (a.id)",
+    ),
+    (
+        'country_name_unique',
+        "CREATE CONSTRAINT country_name_unique IF NOT EXISTS FOR (c:Country) REQUIRE c.name IS UNIQUE",
+        "CREATE INDEX country_name IF NOT EXISTS FOR (c:Country) ON (c.name)",
+    ),
+    (
+        'mitigation_cve_unique',
+        "CREATE CONSTRAINT mitigation_cve_unique IF NOT EXISTS FOR (m:Mitigation) REQUIRE m.cve IS UNIQUE",
+        "CREATE INDEX mitigation_cve IF NOT EXISTS FOR (m:Mitigation) ON (m.cve)",
+    ),
+    (
+        'statistic_name_stripe_unique',
+        "CREATE CONSTRAINT statistic_name_stripe_unique IF NOT EXISTS "
+        "FOR (s:Statistic) REQUIRE (s.name, s.stripe) IS UNIQUE",
+        "CREATE INDEX statistic_name_stripe IF NOT EXISTS FOR (s:Statistic) ON (s.name, s.stripe)",
+    ),
+    (
+        # Parallel ingest workers MERGE the same packages; the constraint's lock
+        # is what keeps them from creating duplicates
+        'software_publisher_product_version_unique',
+        "CREATE CONSTRAINT software_publisher_product_version_unique IF NOT EXISTS "
+        "FOR (n:SoftwareInstallation) REQUIRE (n.publisher, n.product, n.version) IS UNIQUE",
+        "CREATE INDEX software_publisher_product_version IF NOT EXISTS "
+        "FOR (n:SoftwareInstallation) ON (n.publisher, n.product, n.version)",
+    ),
+    (
+        'finding_title_unique',
+        "CREATE CONSTRAINT finding_title_unique IF NOT EXISTS FOR (t:FindingTitle) REQUIRE t.title IS UNIQUE",
+        "CREATE INDEX finding_title_title IF NOT EXISTS FOR (t:FindingTitle) ON (t.title)",
+    ),
+]
+
+INDEXES = [
+    ('software_publisher', "CREATE INDEX software_publisher IF NOT EXISTS FOR (n:SoftwareInstallation) ON (n.publisher)"),
+    (
+        'software_publisher_product_version_key',
+        "CREATE INDEX software_publisher_product_version_key IF NOT EXISTS "
+        "FOR (n:SoftwareInstallation) ON (n.publisher, n.product, n.version_key)",
+    ),
+    ('software_version_key', "CREATE INDEX software_version_key IF NOT EXISTS FOR (n:SoftwareInstallation) ON (n.version_key)"),
+    ('system_critical', "CREATE INDEX system_critical IF NOT EXISTS FOR (s:System) ON (s.critical)"),
+    ('system_risk_score', "CREATE INDEX system_risk_score IF NOT EXISTS FOR (s:System) ON (s.risk_score)"),
+    ('system_risk_score_id', "CREATE INDEX system_risk_score_id IF NOT EXISTS FOR (s:System) ON (s.risk_score, s.id)"),
+    ('system_risk_dirty', "CREATE INDEX system_risk_dirty IF NOT EXISTS FOR (s:System) ON (s.risk_dirty)"),
+    ('finding_severity', "CREATE INDEX finding_severity IF NOT EXISTS FOR (f:Finding) ON (f.severity)"),
+    ('finding_title', "CREATE INDEX finding_title IF NOT EXISTS FOR (f:Finding) ON (f.title)"),
+    (
+        'sketch_partition',
+        "CREATE INDEX sketch_partition IF NOT EXISTS FOR (k:Sketch) ON (k.metric, k.country, k.provider, k.stripe)",
+    ),
+    ('data_version_name', "CREATE INDEX data_version_name IF NOT EXISTS FOR (v:DataVersion) ON (v.name)"),
+]
+
+# Driver methods covered by the EXPLAIN report, with placeholder arguments. The
+# advanced search runs one query shape per set of sequence bounds, so each shape
+# is reported under its own label.
+REPORTED_QUERIES = [
+    ('get_statistics', 'get_statistics', ()),
+    ('get_general_summary', 'get_general_summary', ()),
+    ('get_host_criticality_count', 'get_host_criticality_count', ()),
+    ('get_host_criticality', 'get_host_criticality', ()),
+    ('get_software_catalog', 'get_software_catalog', ()),
+    ('get_systems_by_cve_vulnerability', 'get_systems_by_cve_vulnerability', ('CVE-0000-0000',)),
+    ('get_mitigation', 'get_mitigation', ('CVE-0000-0000',)),
+    ('get_host_risk_page', 'get_host_risk_page', ((100, 'id'),)),
+    ('get_host_risk_page (search)', 'get_host_risk_page',
+     ((100, 'id'), 50, None, None, None, False, None, (['publisher'], ['product'], ['1.0'], ['2.0']))),
+    ('advanced_search (publisher)', 'advanced_search', (['publisher'],)),
+    ('advanced_search (product)', 'advanced_search', (['publisher'], ['product'])),
+    ('advanced_search (min)', 'advanced_search', (['publisher'], ['product'], ['1.0'], [None])),
+    ('advanced_search (max)', 'advanced_search', (['publisher'], ['product'], [None], ['2.0'])),
+    ('advanced_search (range)', 'advanced_search', (['publisher'], ['product'], ['1.0'], ['2.0'])),
+]
+
+
+def _index_name(statement):
+    return re.match(r'CREATE INDEX (\w+)', statement).group(1)
+
+
+def ensure_schema(session):
+    """
+    Create every constraint and index that does not exist yet.
+
+    Returns:
+        list: ``(name, status, detail)`` tuples, one per schema object.
+    """
+    results = []
+    for name, statement, fallback in CONSTRAINTS:
+        try:
+            session.run(statement).consume()
+            results.append((name, 'ok', ''))
+        except Neo4jError as e:
+            # A range index from an earlier fallback, or from before the
+            # constraint existed, blocks a constraint on the same properties
+            try:
+                session.run(f"DROP INDEX {_index_name(fallback)} IF EXISTS").consume()
+                session.run(statement).consume()
+                results.append((name, 'ok', 'replaced its range index'))
+                continue
+            except Neo4jError:
+                pass
+            try:
+                session.run(fallback).consume()
+            except Neo4jError as fallback_error:
+                results.append((name, 'failed', f"{e.message}; range index fallback: {fallback_error.message}"))
+                continue
+            results.append((name, 'fallback', f"range index created instead: {e.message}"))
+    for name, statement in INDEXES:
+        try:
+            session.run(statement).consume()
+            results.append((name, 'ok', ''))
+        except Neo4jError as e:
+            results.append((name, 'failed', e.message))
+    return results
+
+
+class _Explained(Exception):
+    pass
+
+
+class _ExplainSession:
+    """Session stand-in that EXPLAINs the first query and aborts the caller."""
+
+    def __init__(self, session, plans):
+        self.session = session
+        self.plans = plans
+
+    def run(self, query, parameters=None, **kwargs):
+        summary = self.session.run('EXPLAIN ' + query, parameters, **kwargs).consume()
+        self.plans.append(summary.plan)
+        raise _Explained()
+
+
+class ExplainDriver(Driver):
+    """Driver whose read methods return the plan of their own query instead of running it."""
+
+    def __init__(self):
+        super().__init__()
+        self.cache = None
+        self.metrics = None
+        self.plans = []
+
+    @contextmanager
+    def session(self, **config):
+        with super().session(**config) as session:
+            yield _ExplainSession(session, self.plans)
+
+    def _request(self, request):
+        # Follow each read to its own query: skip risk materialization, and answer
+        # its lookups of the counters and sketches with None, as on a graph
+        # without them, so the plan is that of the query the method is named after
+        if request == ENSURE_RISK_SCORES or isinstance(request, Call):
+            return None
+        return super()._request(request)
+
+    def explain(self, method, *args):
+        self.plans.clear()
+        try:
+            getattr(self, method)(*args)
+        except _Explained:
+            pass
+        return self.plans[0] if self.plans else None
+
+
+def _index_operators(plan):
+    if plan is None:
+        return []
+    found = []
+    if 'Index' in plan['operatorType'] or 'ByElementId' in plan['operatorType']:
+        found.append(f"{plan['operatorType']}: {plan['args'].get('Details', '')}")
+    for child in plan.get('children', []):
+        found.extend(_index_operators(child))
+    return found
+
+
+def explain_report(driver=None):
+    """
+    Returns:
+        dict: Report label -> list of index operators in the query plan.
+    """
+    driver = driver or ExplainDriver()
+    return {label: _index_operators(driver.explain(method, *args)) for label, method, args in REPORTED_QUERIES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create FuSec indexes and constraints.')
+    parser.add_argument('--report', action='store_true', help='EXPLAIN the Driver queries and list the indexes they use')
+    parser.add_argument('--strict', action='store_true', help='Exit non-zero if anything could not be created')
+    args = parser.parse_args()
+
+    try:
+        driver = Driver()
+        with driver.session() as session:
+            results = ensure_schema(session)
+    except ServiceUnavailable as e:
+        print(f"Schema bootstrap skipped, database unavailable: {e}")
+        return 1 if args.strict else 0
+
+    for name, status, detail in results:
+        print(f"{status:<8} {name} {detail}".rstrip())
+
+    if args.report:
+        print()
+        for label, operators in explain_report().items():
+            print(label)
+            for operator in operators or ['(no index used)']:
+                print(f"    {operator}")
+
+    failed = any(status != 'ok' for _, status, _ in results)
+    return 1 if args.strict and failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,43 @@
+import configparser
+import os
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', 'config.ini')
+
+_config = None
+
+
+def _load_config():
+    global _config
+    if _config is None:
+        _config = configparser.ConfigParser()
+        if os.path.exists(CONFIG_PATH):
+            _config.read(CONFIG_PATH)
+    return _config
+
+
+def get_setting(section, key, default=None, cast=str):
+    """
+    Read a setting from config.ini, falling back to the environment.
+
+    The environment variable name is ``<SECTION>_<KEY>``, e.g. ``NEO4J_URI`` for
+    ``[NEO4J] URI``.
+
+    Args:
+        section (str): The config.ini section.
+        key (str): The key inside the section.
+        default: Returned when the setting is defined in neither place.
+        cast (callable): Applied to the raw string value.
+
+    Returns:
+        The setting value, or ``default``.
+    """
+    config = _load_config()
+    if config.has_option(section, key):
+        value = config.get(section, key)
+    else:
+        value = os.getenv(f'{section}_{key}')
+    if value is None or value == '':
+        return default
+    if cast is bool:
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return cast(value)
@@ -0,0 +1,870 @@
+"""
+In-process, array-backed snapshot of the FuSec graph.
+
+``GraphSnapshot`` holds the graph as NumPy arrays: one row per System, Finding
+and SoftwareInstallation with integer-coded labels (type, state, provider,
+country, severity, title, CVE, publisher, product, version), the ``critical``
+and known-exploited flags, and CSR adjacency (``indptr``/``indices``) for
+
+    System -> Finding               (related_weakness)
+    System -> Finding via apps      (runs_on, related_weakness)
+    Application -> System           (runs_on)
+    Application -> Finding          (related_weakness)
+    Finding -> CVE                  (related_vulnerability)
+    System -> SoftwareInstallation  (has_software)
+
+Risk scores use the weights of ``database.risk`` but are computed for the whole
+fleet at once with ``bincount`` over the adjacency, so ``score()`` takes well
+under a second on a million hosts and can be re-run with different flags for
+what-if analysis. ``SnapshotDriver`` answers the Driver queries from a snapshot
+with vectorized masks, without a database.
+
+Snapshots are exported from Neo4j or built from scanner rows and stored as
+``.npz`` files. Run from the ``src`` directory:
+
+    python -m database.snapshot export [--path data/graph.npz]
+    python -m database.snapshot stats [--path data/graph.npz]
+"""
+import argparse
+from collections import namedtuple
+import functools
+from itertools import islice
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from database import queries
+from database.backend import QueryBackend
+from database.catalog import SoftwareCatalog
+from database.frames import RISK_LEVEL_DTYPE, STRING_DTYPE, records_to_frame
+from database.settings import get_setting
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'graph.npz')
+
+# Mirrors SCORE_EXPRESSION and RISK_LEVEL_EXPRESSION in database.risk
+SEVERITY_WEIGHTS = {'Low': 1, 'Medium': 2, 'High': 4}
+KEV_MULTIPLIER = 8
+CRITICAL_MULTIPLIER = 2
+RISK_LEVEL_THRESHOLDS = [(32, 'Critical'), (16, 'High'), (8, 'Medium')]
+RISK_LEVELS = list(RISK_LEVEL_DTYPE.categories)
+
+LABELS = ['type', 'sub_type', 'state', 'provider', 'country', 'severity', 'title', 'cve', 'publisher', 'product',
+          'version']
+
+ARRAYS = [
+    'system_id', 'system_type', 'system_sub_type', 'system_state', 'system_provider', 'system_country',
+    'system_critical',
+    'finding_severity', 'finding_title', 'finding_kev',
+    'system_findings_indptr', 'system_findings_indices',
+    'system_application_findings_indptr', 'system_application_findings_indices',
+    'application_id',
+    'application_systems_indptr', 'application_systems_indices',
+    'application_findings_indptr', 'application_findings_indices',
+    'finding_cves_indptr', 'finding_cves_indices',
+    'installation_publisher', 'installation_product', 'installation_version', 'installation_version_key',
+    'system_software_indptr', 'system_software_indices',
+]
+
+# Blast radius exposure codes, strongest first
+SYSTEM_EXPOSURES = ['Finding', 'Application', 'Software']
+APPLICATION_EXPOSURES = ['Finding', 'Host']
+
+RiskScores = namedtuple('RiskScores', ['score', 'finding_count', 'level'])
+BlastRadius = namedtuple('BlastRadius', ['cves', 'system_exposure', 'application_exposure', 'suspect_installations',
+                                         'suspect_share', 'suspect_lift'])
+
+
+def _csr(rows, cols, n_rows):
+    """``(indptr, indices)`` of the edges ``rows[i] -> cols[i]``."""
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int32)
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols[np.argsort(rows, kind='stable')]
+
+
+def _row_ids(indptr):
+    """Row index of every entry in ``indices``."""
+    return np.repeat(np.arange(len(indptr) - 1, dtype=np.int32), np.diff(indptr))
+
+
+def _transpose(indptr, indices, n_cols):
+    return _csr(indices, _row_ids(indptr), n_cols)
+
+
+def _gather(indptr, indices, rows):
+    """Concatenated ``indices`` of ``rows``, duplicates kept."""
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=indices.dtype)
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+    return indices[offsets]
+
+
+def _encode(values):
+    """Integer codes and the label table of ``values``; missing values get -1."""
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+    return codes.astype(np.int32), [str(u) for u in uniques]
+
+
+def _label_array(labels):
+    """Object array of ``labels`` with a trailing None, so code -1 decodes to None."""
+    return np.array(list(labels) + [None], dtype=object)
+
+
+class GraphSnapshot:
+    """
+    Array-backed copy of the graph. Build one with ``from_graph``, ``from_rows``
+    or ``load``; the arrays are read-only afterwards.
+
+    Args:
+        arrays (dict): Every name in ``ARRAYS``.
+        labels (dict): Label tables for every name in ``LABELS``. Codes index
+            into these; -1 means the value is missing.
+        mitigations (dict): CVE -> stored mitigation.
+        created_at (float): When the graph was read, as a Unix timestamp.
+        data_version (int): Data version of the graph when it was read, or None
+            if it was not read from a graph.
+    """
+
+    def __init__(self, arrays, labels, mitigations=None, created_at=None, data_version=None):
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        self.labels = {name: list(labels[name]) for name in LABELS}
+        self.mitigations = mitigations or {}
+        self.created_at = created_at if created_at is not None else time.time()
+        self.data_version = data_version
+        self.risk = self.score()
+
+    # Construction
+
+    @classmethod
+    def _build(cls, systems, findings, system_findings, applications, application_findings, finding_cves, cves,
+               installations, system_software, mitigations):
+        """
+        Encode graph elements given as Python rows.
+
+        Args:
+            systems (list): ``(id, type, sub_type, state, provider, critical, country)``.
+            findings (list): ``(key, severity, title, known_exploited)``.
+            system_findings (iterable): ``(system id, finding key)``.
+            applications (iterable): ``(application id, system id)`` it runs on.
+            application_findings (iterable): ``(application id, finding key)``.
+            finding_cves (iterable): ``(finding key, cve)``.
+            cves (iterable): Every CVE in the graph.
+            installations (list): ``(key, publisher, product, version, version_key)``.
+            system_software (iterable): ``(system id, installation key)``.
+            mitigations (dict): CVE -> stored mitigation.
+        """
+        arrays = {}
+        labels = {}
+        system_ids, types, sub_types, states, providers, critical, countries = (
+            list(column) for column in zip(*systems)) if systems else ([] for _ in range(7))
+        arrays['system_id'] = np.array(system_ids, dtype=str)
+        for name, values in (('type', types), ('sub_type', sub_types), ('state', states),
+                             ('provider', providers), ('country', countries)):
+            arrays[f'system_{name}'], labels[name] = _encode(values)
+        arrays['system_critical'] = np.array([-1 if c is None else int(c) for c in critical], dtype=np.int8)
+
+        finding_keys, severities, titles, kev = (
+            list(column) for column in zip(*findings)) if findings else ([] for _ in range(4))
+        arrays['finding_severity'], labels['severity'] = _encode(severities)
+        arrays['finding_title'], labels['title'] = _encode(titles)
+        arrays['finding_kev'] = np.array(kev, dtype=bool)
+
+        system_index = {system_id: i for i, system_id in enumerate(system_ids)}
+        finding_index = {key: i for i, key in enumerate(finding_keys)}
+        pairs = [(system_index[s], finding_index[f]) for s, f in system_findings
+                 if s in system_index and f in finding_index]
+        arrays['system_findings_indptr'], arrays['system_findings_indices'] = _csr(
+            [p[0] for p in pairs], [p[1] for p in pairs], len(system_ids))
+
+        runs_on = [(a, s) for a, s in applications if a is not None and s in system_index]
+        application_findings = [(a, f) for a, f in application_findings if a is not None and f in finding_index]
+        application_ids = sorted({a for a, _ in runs_on} | {a for a, _ in application_findings})
+        application_index = {application_id: i for i, application_id in enumerate(application_ids)}
+        arrays['application_id'] = np.array(application_ids, dtype=str)
+        arrays['application_systems_indptr'], arrays['application_systems_indices'] = _csr(
+            [application_index[a] for a, _ in runs_on], [system_index[s] for _, s in runs_on], len(application_ids))
+        arrays['application_findings_indptr'], arrays['application_findings_indices'] = _csr(
+            [application_index[a] for a, _ in application_findings],
+            [finding_index[f] for _, f in application_findings], len(application_ids))
+
+        # Findings each system reaches through the applications running on it, one entry per path
+        application_findings_csr = arrays['application_findings_indptr'], arrays['application_findings_indices']
+        edge_applications = _row_ids(arrays['application_systems_indptr'])
+        edge_findings = np.diff(application_findings_csr[0])[edge_applications]
+        arrays['system_application_findings_indptr'], arrays['system_application_findings_indices'] = _csr(
+            np.repeat(arrays['application_systems_indices'], edge_findings),
+            _gather(*application_findings_csr, edge_applications),
+            len(system_ids))
+
+        labels['cve'] = sorted(set(cves) | {cve for _, cve in finding_cves if cve is not None})
+        cve_index = {cve: i for i, cve in enumerate(labels['cve'])}
+        pairs = [(finding_index[f], cve_index[cve]) for f, cve in finding_cves
+                 if f in finding_index and cve in cve_index]
+        arrays['finding_cves_indptr'], arrays['finding_cves_indices'] = _csr(
+            [p[0] for p in pairs], [p[1] for p in pairs], len(finding_keys))
+
+        installation_keys, publishers, products, versions, version_keys = (
+            list(column) for column in zip(*installations)) if installations else ([] for _ in range(5))
+        for name, values in (('publisher', publishers), ('product', products), ('version', versions)):
+            arrays[f'installation_{name}'], labels[name] = _encode(values)
+        arrays['installation_version_key'] = np.array([k or '' for k in version_keys], dtype=str)
+        installation_index = {key: i for i, key in enumerate(installation_keys)}
+        pairs = [(system_index[s], installation_index[n]) for s, n in system_software
+                 if s in system_index and n in installation_index]
+        arrays['system_software_indptr'], arrays['system_software_indices'] = _csr(
+            [p[0] for p in pairs], [p[1] for p in pairs], len(system_ids))
+
+        return cls(arrays, labels, mitigations)
+
+    @classmethod
+    def from_graph(cls, driver=None):
+        """Export the graph behind ``driver`` (a Neo4j Driver) in one read transaction."""
+        if driver is None:
+            from database.connection import Driver
+
+            driver = Driver()
+
+        from database.connection import get_data_version
+
+        def read(tx):
+            rows = {name: [tuple(record.values()) for record in tx.run(query)] for name, query in EXPORT_QUERIES}
+            return rows, get_data_version(tx)
+
+        with driver.session() as session:
+            rows, data_version = session.execute_read(read)
+        snapshot = cls._build(
+            systems=rows['systems'],
+            findings=rows['findings'],
+            system_findings=rows['system_findings'],
+            applications=rows['applications'],
+            application_findings=rows['application_findings'],
+            finding_cves=rows['finding_cves'],
+            cves=[cve for cve, in rows['vulnerabilities'] if cve is not None],
+            installations=rows['installations'],
+            system_software=rows['system_software'],
+            mitigations={cve: {'type': t, 'content': c, 'description': d} for cve, t, c, d in rows['mitigations']},
+        )
+        snapshot.data_version = data_version
+        return snapshot
+
+    @classmethod
+    def from_rows(cls, findings, software=(), batch_size=50000):
+        """
+        Build a snapshot from scanner rows, as ``database.ingest`` would write them
+        to the graph. Needs no database.
+
+        Args:
+            findings (iterable): ``findings`` row dicts, e.g. from ``read_rows``.
+            software (iterable): ``software`` row dicts.
+        """
+        from database.ingest import prepare_findings, prepare_software
+
+        systems, countries, finding_props = {}, {}, {}
+        application_systems = {}
+        system_edges, application_edges, cve_edges = set(), set(), set()
+        rows = iter(findings)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            prepared = prepare_findings(batch)
+            for system in prepared['systems']:
+                systems.setdefault(system['id'], {}).update(system['props'])
+            countries.update((c['system_id'], c['country']) for c in prepared['countries'])
+            application_systems.update((a['id'], a['system_id']) for a in prepared['applications'])
+            for finding in prepared['system_findings'] + prepared['application_findings']:
+                finding_props[finding['id']] = (
+                    finding['severity'], finding['title'], finding['known_exploited_vulnerability'] == 'TRUE')
+            system_edges.update((f['owner'], f['id']) for f in prepared['system_findings'])
+            application_edges.update((f['owner'], f['id']) for f in prepared['application_findings'])
+            cve_edges.update((v['finding_id'], v['cve']) for v in prepared['vulnerabilities'])
+
+        installations = {}
+        system_software = set()
+        rows = iter(software)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            for row in prepare_software(batch):
+                key = (row['publisher'], row['product'], row['version'])
+                installations.setdefault(key, (key, *key, row['version_key']))
+                system_software.add((row['system_id'], key))
+
+        return cls._build(
+            systems=[
+                (system_id, p.get('type'), p.get('sub_type'), p.get('state'), p.get('provider_name'),
+                 p.get('critical'), countries.get(system_id))
+                for system_id, p in systems.items()
+            ],
+            findings=[(key, *props) for key, props in finding_props.items()],
+            system_findings=system_edges,
+            applications=application_systems.items(),
+            application_findings=application_edges,
+            finding_cves=cve_edges,
+            cves=(),
+            installations=list(installations.values()),
+            system_software=system_software,
+            mitigations={},
+        )
+
+    def save(self, path):
+        """Write the snapshot to ``path``, replacing any previous file atomically."""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        extra = {'data_version': np.array(self.data_version)} if self.data_version is not None else {}
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as file:
+            np.savez_compressed(
+                file,
+                **{name: getattr(self, name) for name in ARRAYS},
+                **{f'labels_{name}': np.array(self.labels[name], dtype=str) for name in LABELS},
+                mitigations=np.array(json.dumps(self.mitigations)),
+                created_at=np.array(self.created_at),
+                **extra,
+            )
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                {name: data[name] for name in ARRAYS},
+                {name: data[f'labels_{name}'].tolist() for name in LABELS},
+                json.loads(str(data['mitigations'])),
+                float(data['created_at']),
+                int(data['data_version']) if 'data_version' in data else None,
+            )
+
+    def __len__(self):
+        return len(self.system_id)
+
+    # Analytics
+
+    @functools.cached_property
+    def _system_finding_rows(self):
+        return _row_ids(self.system_findings_indptr)
+
+    @functools.cached_property
+    def _application_finding_rows(self):
+        return _row_ids(self.system_application_findings_indptr)
+
+    @functools.cached_property
+    def _severity_weights(self):
+        # Trailing 0 is the weight of code -1 (no severity)
+        return np.array([SEVERITY_WEIGHTS.get(s, 0) for s in self.labels['severity']] + [0], dtype=np.int64)
+
+    def score(self, finding_kev=None, system_critical=None):
+        """
+        Risk score, finding count and risk level code (into ``RISK_LEVELS``) of
+        every host, computed like ``database.risk``.
+
+        Args:
+            finding_kev (numpy.ndarray): Known-exploited flags to use instead of
+                the stored ones, e.g. to see the effect of new KEV entries.
+            system_critical (numpy.ndarray): ``critical`` values to use instead.
+
+        Returns:
+            RiskScores: int64 ``score`` and ``finding_count``, int8 ``level``.
+        """
+        kev = self.finding_kev if finding_kev is None else finding_kev
+        critical = self.system_critical if system_critical is None else system_critical
+        weights = self._severity_weights[self.finding_severity] * np.where(kev, KEV_MULTIPLIER, 1)
+
+        n = len(self.system_id)
+        score = np.bincount(self._system_finding_rows, weights=weights[self.system_findings_indices], minlength=n)
+        score += np.bincount(self._application_finding_rows,
+                             weights=weights[self.system_application_findings_indices], minlength=n)
+        score = score.astype(np.int64) * np.where(critical == 1, CRITICAL_MULTIPLIER, 1)
+        finding_count = np.diff(self.system_findings_indptr) + np.diff(self.system_application_findings_indptr)
+
+        level = np.ones(n, dtype=np.int8)
+        for threshold, name in reversed(RISK_LEVEL_THRESHOLDS):
+            level[score >= threshold] = RISK_LEVELS.index(name)
+        level[score == 0] = 0
+        return RiskScores(score, finding_count, level)
+
+    @functools.cached_property
+    def ranking(self):
+        """Host indexes ordered by risk score, then ID, descending."""
+        return np.lexsort((self.system_id, self.risk.score))[::-1]
+
+    @functools.cached_property
+    def _cve_findings(self):
+        return _transpose(self.finding_cves_indptr, self.finding_cves_indices, len(self.labels['cve']))
+
+    @functools.cached_property
+    def _finding_systems(self):
+        return _transpose(self.system_findings_indptr, self.system_findings_indices, len(self.finding_severity))
+
+    @functools.cached_property
+    def _installation_systems(self):
+        return _transpose(self.system_software_indptr, self.system_software_indices,
+                          len(self.installation_publisher))
+
+    @functools.cached_property
+    def _finding_applications(self):
+        return _transpose(self.application_findings_indptr, self.application_findings_indices,
+                          len(self.finding_severity))
+
+    @functools.cached_property
+    def _system_applications(self):
+        return _transpose(self.application_systems_indptr, self.application_systems_indices, len(self.system_id))
+
+    def build_index(self):
+        """Compute the ranking and every reverse adjacency up front instead of on first use."""
+        for name in ('ranking', '_cve_findings', '_finding_systems', '_finding_applications',
+                     '_system_applications', '_installation_systems'):
+            getattr(self, name)
+        return self
+
+    def _mask(self, rows):
+        mask = np.zeros(len(self.system_id), dtype=bool)
+        mask[rows] = True
+        return mask
+
+    def _cve_codes(self, cves):
+        index = {cve: i for i, cve in enumerate(self.labels['cve'])}
+        return np.array([index[c] for c in cves if c in index], dtype=np.int64)
+
+    def systems_by_cve(self, cves):
+        """Mask of the hosts with a finding of any of ``cves``."""
+        findings = _gather(*self._cve_findings, self._cve_codes(cves))
+        return self._mask(_gather(*self._finding_systems, findings))
+
+    def blast_radius(self, cves, via_software=True, min_share=0.5, min_lift=2.0):
+        """
+        Every host and application affected by any of ``cves``, expanded over the
+        adjacency index. A host is affected through, strongest first:
+
+        - ``Finding``: it has a finding of the CVE.
+        - ``Application``: it runs an application with such a finding.
+        - ``Software``: with ``via_software``, it has a suspect installation. Suspect
+          installations are on at least ``min_share`` of the hosts above and at
+          least ``min_lift`` times as common there as in the whole fleet, i.e. the
+          likely carrier of the CVE on hosts that were not scanned for it.
+
+        An application is affected through ``Finding`` (it has a finding of the CVE)
+        or ``Host`` (it runs on an affected host).
+
+        Returns:
+            BlastRadius: Exposure code of every host and application, an index into
+            ``SYSTEM_EXPOSURES`` or ``APPLICATION_EXPOSURES`` or -1 if unaffected,
+            and the suspect installations with their share and lift.
+        """
+        findings = np.unique(_gather(*self._cve_findings, self._cve_codes(cves)))
+        direct = _gather(*self._finding_systems, findings)
+        applications = np.unique(_gather(*self._finding_applications, findings))
+        application_hosts = _gather(self.application_systems_indptr, self.application_systems_indices, applications)
+
+        system_exposure = np.full(len(self.system_id), -1, dtype=np.int8)
+        suspects = np.empty(0, dtype=np.int64)
+        share = lift = np.empty(0, dtype=np.float64)
+        affected = np.unique(np.concatenate([direct, application_hosts]))
+        if via_software and len(affected):
+            installed = _gather(self.system_software_indptr, self.system_software_indices, affected)
+            affected_share = np.bincount(installed, minlength=len(self.installation_publisher)) / len(affected)
+            fleet_share = np.diff(self._installation_systems[0]) / len(self.system_id)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                affected_lift = np.where(fleet_share > 0, affected_share / fleet_share, 0.0)
+            suspects = np.flatnonzero((affected_share >= min_share) & (affected_lift >= min_lift))
+            share, lift = affected_share[suspects], affected_lift[suspects]
+            system_exposure[_gather(*self._installation_systems, suspects)] = SYSTEM_EXPOSURES.index('Software')
+        system_exposure[application_hosts] = SYSTEM_EXPOSURES.index('Application')
+        system_exposure[direct] = SYSTEM_EXPOSURES.index('Finding')
+
+        application_exposure = np.full(len(self.application_id), -1, dtype=np.int8)
+        application_exposure[_gather(*self._system_applications, np.flatnonzero(system_exposure >= 0))] = (
+            APPLICATION_EXPOSURES.index('Host'))
+        application_exposure[applications] = APPLICATION_EXPOSURES.index('Finding')
+
+        known = [self.labels['cve'][code] for code in self._cve_codes(cves)]
+        return BlastRadius(known, system_exposure, application_exposure, suspects, share, lift)
+
+    def systems_by_software(self, sequences):
+        """Mask of the hosts with an installation matching any ``search_sequences`` entry."""
+        installations = np.zeros(len(self.installation_publisher), dtype=bool)
+        keys = self.installation_version_key
+        for seq in sequences:
+            if seq['publisher'] not in self.labels['publisher']:
+                continue
+            match = self.installation_publisher == self.labels['publisher'].index(seq['publisher'])
+            if seq.get('product') is not None:
+                if seq['product'] not in self.labels['product']:
+                    continue
+                match &= self.installation_product == self.labels['product'].index(seq['product'])
+            if seq.get('min_key') is not None:
+                match &= (keys != '') & (keys >= seq['min_key'])
+            if seq.get('max_key') is not None:
+                match &= (keys != '') & (keys <= seq['max_key'])
+            installations |= match
+        return self._mask(_gather(*self._installation_systems, np.flatnonzero(installations)))
+
+    def _categorical(self, name, codes):
+        return pd.Categorical.from_codes(codes, self.labels[name])
+
+    def host_frame(self, rows):
+        """DataFrame with ``HOST_COLUMNS`` of the hosts at ``rows``, in that order."""
+        critical = self.system_critical[rows]
+        return pd.DataFrame({
+            'ID': pd.array(self.system_id[rows].astype(object), dtype=STRING_DTYPE)
+            if STRING_DTYPE is not object else self.system_id[rows].astype(object),
+            'Type': self._categorical('type', self.system_type[rows]),
+            'Sub_Type': self._categorical('sub_type', self.system_sub_type[rows]),
+            'State': self._categorical('state', self.system_state[rows]),
+            'Critical': pd.arrays.IntegerArray(critical.astype(np.int64), critical < 0),
+            'Total_Risk_Score': self.risk.score[rows],
+            'risk_level': pd.Categorical.from_codes(self.risk.level[rows], dtype=RISK_LEVEL_DTYPE),
+        }, columns=queries.HOST_COLUMNS)
+
+    def level_distribution(self, mask=None):
+        """``risk_level``/``count`` DataFrame of the hosts in ``mask``, largest first."""
+        levels = self.risk.level if mask is None else self.risk.level[mask]
+        counts = np.bincount(levels, minlength=len(RISK_LEVELS))
+        rows = sorted(((RISK_LEVELS[i], int(c)) for i, c in enumerate(counts) if c), key=lambda r: -r[1])
+        return records_to_frame(rows, queries.RISK_LEVEL_COLUMNS)
+
+    def breakdown(self, mask, limit=10):
+        """Top ``limit`` hosts and the risk level distribution of the hosts in ``mask``."""
+        ranked = self.ranking[(mask & (self.risk.finding_count > 0))[self.ranking]]
+        return self.host_frame(ranked[:limit]), self.level_distribution(mask)
+
+
+EXPORT_QUERIES = [
+    ('systems', """
+        MATCH (s:System)
+        OPTIONAL MATCH (s)-[:in_country]->(c:Country)
+        WITH s, HEAD(COLLECT(c.name)) AS country
+        RETURN s.id, s.type, s.sub_type, s.state, s.provider_name, s.critical, country
+    """),
+    ('findings', """
+        MATCH (f:Finding)
+        RETURN elementId(f), f.severity, f.title, f.known_exploited_vulnerability = "TRUE"
+    """),
+    ('system_findings', """
+        MATCH (s:System)-[:related_weakness]->(f:Finding)
+        RETURN s.id, elementId(f)
+    """),
+    ('applications', """
+        MATCH (a:Application)-[:runs_on]->(s:System)
+        RETURN a.id, s.id
+    """),
+    ('application_findings', """
+        MATCH (a:Application)-[:related_weakness]->(f:Finding)
+        RETURN a.id, elementId(f)
+    """),
+    ('finding_cves', """
+        MATCH (f:Finding)-[:related_vulnerability]->(v:Vulnerability)
+        RETURN elementId(f), v.cve
+    """),
+    ('vulnerabilities', """
+        MATCH (v:Vulnerability)
+        RETURN DISTINCT v.cve
+    """),
+    ('installations', """
+        MATCH (n:SoftwareInstallation)
+        RETURN elementId(n), n.publisher, n.product, n.version, n.version_key
+    """),
+    ('system_software', """
+        MATCH (s:System)-[:has_software]->(n:SoftwareInstallation)
+        RETURN s.id, elementId(n)
+    """),
+    ('mitigations', """
+        MATCH (v:Vulnerability)-[:has_mitigation]->(m:Mitigation)
+        RETURN v.cve, m.type, m.content, m.description
+    """),
+]
+
+
+def _count_by(codes, labels, exposure, column):
+    """Affected hosts per label and exposure, largest first."""
+    n = len(SYSTEM_EXPOSURES)
+    counts = np.bincount((codes.astype(np.int64) + 1) * n + exposure, minlength=(len(labels) + 1) * n)
+    names = [None] + list(labels)
+    rows = sorted(((names[i // n], SYSTEM_EXPOSURES[i % n], int(counts[i])) for i in np.flatnonzero(counts)),
+                  key=lambda r: -r[2])
+    return pd.DataFrame(rows, columns=[column, 'Exposure', 'count'])
+
+
+def blast_radius_report(snapshot, cves, via_software=True, min_share=0.5, min_lift=2.0):
+    """
+    Tables of ``GraphSnapshot.blast_radius`` for the dashboard.
+
+    Returns:
+        dict: ``systems`` (every affected host, ranked, with country, provider and
+        exposure), ``applications``, ``suspect_software``, counts ``by_exposure``,
+        ``by_country``, ``by_provider`` and ``by_risk_level``, the totals, the
+        ``cves`` found and ``unknown_cves``, and ``as_of``, the snapshot time.
+    """
+    radius = snapshot.blast_radius(cves, via_software, min_share, min_lift)
+    affected = snapshot.ranking[(radius.system_exposure >= 0)[snapshot.ranking]]
+    exposure = radius.system_exposure[affected]
+
+    systems = snapshot.host_frame(affected)
+    systems['country'] = snapshot._categorical('country', snapshot.system_country[affected])
+    systems['Provider'] = snapshot._categorical('provider', snapshot.system_provider[affected])
+    systems['Exposure'] = pd.Categorical.from_codes(exposure, SYSTEM_EXPOSURES)
+
+    applications = np.flatnonzero(radius.application_exposure >= 0)
+    application_frame = pd.DataFrame({
+        'Application': snapshot.application_id[applications].astype(object),
+        'Hosts': np.diff(snapshot.application_systems_indptr)[applications],
+        'Exposure': pd.Categorical.from_codes(radius.application_exposure[applications], APPLICATION_EXPOSURES),
+    }).sort_values(['Exposure', 'Application'], ignore_index=True)
+
+    suspects = radius.suspect_installations
+    suspect_software = pd.DataFrame({
+        'publisher': snapshot._categorical('publisher', snapshot.installation_publisher[suspects]),
+        'product': snapshot._categorical('product', snapshot.installation_product[suspects]),
+        'version': snapshot._categorical('version', snapshot.installation_version[suspects]),
+        'Hosts': np.diff(snapshot._installation_systems[0])[suspects],
+        'share': radius.suspect_share,
+        'lift': radius.suspect_lift,
+    }).sort_values('share', ascending=False, ignore_index=True)
+
+    counts = np.bincount(exposure, minlength=len(SYSTEM_EXPOSURES))
+    return {
+        'cves': radius.cves,
+        'unknown_cves': [cve for cve in cves if cve not in radius.cves],
+        'as_of': snapshot.created_at,
+        'total_systems': len(affected),
+        'total_applications': len(applications),
+        'systems': systems,
+        'applications': application_frame,
+        'suspect_software': suspect_software,
+        'by_exposure': pd.DataFrame({'Exposure': SYSTEM_EXPOSURES, 'count': counts}),
+        'by_country': _count_by(snapshot.system_country[affected], snapshot.labels['country'], exposure, 'country'),
+        'by_provider': _count_by(snapshot.system_provider[affected], snapshot.labels['provider'], exposure,
+                                 'Provider'),
+        'by_risk_level': _count_by(snapshot.risk.level[affected], RISK_LEVELS, exposure, 'risk_level'),
+    }
+
+
+_snapshot = None
+_snapshot_mtime = None
+_snapshot_lock = threading.Lock()
+_export_thread = None
+
+
+def get_snapshot():
+    """
+    Return the process-wide snapshot from ``[BACKEND] SNAPSHOT_PATH``. The file
+    is reloaded when it changes. Without a file, the graph is exported once and
+    saved there.
+    """
+    global _snapshot, _snapshot_mtime
+    path = get_setting('BACKEND', 'SNAPSHOT_PATH', DEFAULT_PATH)
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    if _snapshot is None or (mtime is not None and mtime != _snapshot_mtime):
+        with _snapshot_lock:
+            if _snapshot is None or (mtime is not None and mtime != _snapshot_mtime):
+                if mtime is None:
+                    snapshot = GraphSnapshot.from_graph()
+                    snapshot.save(path)
+                    mtime = os.path.getmtime(path)
+                else:
+                    snapshot = GraphSnapshot.load(path)
+                _snapshot, _snapshot_mtime = snapshot.build_index(), mtime
+    return _snapshot
+
+
+def _export_snapshot(path):
+    global _snapshot, _snapshot_mtime
+    started = time.perf_counter()
+    try:
+        snapshot = GraphSnapshot.from_graph()
+        snapshot.save(path)
+        snapshot.build_index()
+    except Exception as e:
+        logger.warning("Graph snapshot export failed: %s", e)
+        return
+    with _snapshot_lock:
+        _snapshot, _snapshot_mtime = snapshot, os.path.getmtime(path)
+    logger.info("Exported %d systems at data version %s to %s in %.1fs",
+                len(snapshot), snapshot.data_version, path, time.perf_counter() - started)
+
+
+def get_graph_snapshot(data_version):
+    """
+    Return the process-wide snapshot of a live graph at ``data_version`` without
+    waiting for an export.
+
+    If there is no snapshot yet, or it was read at another data version and is
+    older than ``[BACKEND] SNAPSHOT_REFRESH_INTERVAL`` seconds, the graph is
+    exported to ``[BACKEND] SNAPSHOT_PATH`` in a background thread. Until that
+    finishes, the current snapshot is returned, or None if there is none.
+    """
+    global _export_thread
+    path = get_setting('BACKEND', 'SNAPSHOT_PATH', DEFAULT_PATH)
+    snapshot = _snapshot
+    if snapshot is None and os.path.exists(path):
+        snapshot = get_snapshot()
+    refresh_interval = get_setting('BACKEND', 'SNAPSHOT_REFRESH_INTERVAL', 300.0, float)
+    if snapshot is None or (snapshot.data_version != data_version
+                            and time.time() - snapshot.created_at >= refresh_interval):
+        with _snapshot_lock:
+            if _export_thread is None or not _export_thread.is_alive():
+                _export_thread = threading.Thread(
+                    target=_export_snapshot, args=(path,), name='snapshot-export', daemon=True)
+                _export_thread.start()
+    return snapshot
+
+
+def snapshot_refreshing():
+    """Whether a background export of the graph snapshot is running."""
+    return _export_thread is not None and _export_thread.is_alive()
+
+
+class SnapshotDriver(QueryBackend):
+    """Driver that answers the dashboard queries from a ``GraphSnapshot``."""
+
+    def __init__(self, snapshot=None):
+        self.snapshot = snapshot if snapshot is not None else get_snapshot()
+        self.cache = None
+        self.metrics = None
+
+    def get_general_summary(self):
+        return {
+            'total_hosts': self.get_hosts(),
+            'total_critical_hosts': self.get_critical_hosts(),
+            'total_findings': self.get_findings(),
+            'total_unique_findings': self.get_total_unique_findings(),
+            'total_vulnerabilities': self.get_vulnerabilities(),
+            'findings_by_severity': self.get_findings_by_severity(),
+            'country_count': self.get_country_count(),
+        }
+
+    def get_hosts(self):
+        return len(self.snapshot)
+
+    def get_critical_hosts(self):
+        return int((self.snapshot.system_critical > 0).sum())
+
+    def get_findings(self):
+        return len(self.snapshot.finding_severity)
+
+    def get_vulnerabilities(self):
+        return len(self.snapshot.labels['cve'])
+
+    def get_findings_by_severity(self):
+        # Shifted by one so findings without a severity are counted under None
+        counts = np.bincount(self.snapshot.finding_severity + 1, minlength=len(self.snapshot.labels['severity']) + 1)
+        severities = [None] + self.snapshot.labels['severity']
+        return records_to_frame(
+            ((severities[i], int(c)) for i, c in enumerate(counts) if c), ['Severity', 'Count'])
+
+    def get_total_unique_findings(self):
+        titles = self.snapshot.finding_title
+        return int(np.count_nonzero(np.bincount(titles[titles >= 0], minlength=len(self.snapshot.labels['title']))))
+
+    def get_host_criticality_count(self):
+        return self.snapshot.level_distribution()
+
+    def get_host_criticality(self):
+        snapshot = self.snapshot
+        return snapshot.breakdown(np.ones(len(snapshot), dtype=bool))[0]
+
+    def get_software_catalog(self):
+        snapshot = self.snapshot
+        triples = np.unique(np.stack([
+            snapshot.installation_publisher, snapshot.installation_product, snapshot.installation_version,
+        ], axis=1), axis=0) if len(snapshot.installation_publisher) else []
+        publishers, products, versions = (_label_array(snapshot.labels[name])
+                                          for name in ('publisher', 'product', 'version'))
+        return SoftwareCatalog(
+            (publishers[publisher], products[product], [versions[version]])
+            for publisher, product, version in triples
+        )
+
+    def get_systems_by_cve_vulnerability(self, cve):
+        return self.snapshot.breakdown(self.snapshot.systems_by_cve([cve]))
+
+    def advanced_search(self, publishers, products=None, min_versions=None, max_versions=None):
+        sequences = queries.search_sequences(publishers, products, min_versions, max_versions)
+        return self.snapshot.breakdown(self.snapshot.systems_by_software(sequences))
+
+    def get_host_risk_page(self, after=None, page_size=50, types=None, states=None, providers=None,
+                           include_na=False, cve=None, search=None):
+        snapshot = self.snapshot
+        score = snapshot.risk.score
+        mask = snapshot.risk.finding_count > 0
+        if not include_na:
+            mask &= score > 0
+        for values, column, name in ((types, snapshot.system_type, 'type'),
+                                     (states, snapshot.system_state, 'state'),
+                                     (providers, snapshot.system_provider, 'provider')):
+            if values:
+                codes = [i for i, label in enumerate(snapshot.labels[name]) if label in values]
+                mask &= np.isin(column, codes)
+        if cve is not None:
+            mask &= snapshot.systems_by_cve([cve])
+        elif search is not None:
+            mask &= snapshot.systems_by_software(queries.search_sequences(*search))
+        if after is not None:
+            after_score, after_id = after
+            mask &= (score < after_score) | ((score == after_score) & (snapshot.system_id < after_id))
+        ranked = snapshot.ranking[mask[snapshot.ranking]]
+        return snapshot.host_frame(ranked[:page_size])
+
+    def get_host_filter_options(self):
+        labels = self.snapshot.labels
+        return {key: sorted(labels[name], key=str)
+                for key, name in (('types', 'type'), ('states', 'state'), ('providers', 'provider'))}
+
+    def get_mitigation(self, cve):
+        return self.snapshot.mitigations.get(cve)
+
+    def get_blast_radius(self, cves, via_software=True, min_share=0.5, min_lift=2.0):
+        return blast_radius_report(self.snapshot, cves, via_software, min_share, min_lift)
+
+    def get_country_count(self):
+        countries = self.snapshot.system_country
+        counts = np.bincount(countries[countries >= 0], minlength=len(self.snapshot.labels['country']))
+        rows = sorted(((self.snapshot.labels['country'][i], int(c)) for i, c in enumerate(counts) if c),
+                      key=lambda r: -r[1])
+        return records_to_frame(rows, ['country', 'count'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export and inspect in-memory graph snapshots.')
+    parser.add_argument('command', choices=['export', 'stats'],
+                        help='export: write a snapshot of the graph; stats: load one and time risk scoring')
+    parser.add_argument('--path', help='Snapshot file path')
+    args = parser.parse_args()
+    path = args.path or get_setting('BACKEND', 'SNAPSHOT_PATH', DEFAULT_PATH)
+
+    started = time.perf_counter()
+    if args.command == 'export':
+        snapshot = GraphSnapshot.from_graph()
+        snapshot.save(path)
+        print(f"Exported {len(snapshot)} systems to {path} in {time.perf_counter() - started:.1f}s")
+        return
+
+    snapshot = GraphSnapshot.load(path)
+    print(f"Loaded {path} in {time.perf_counter() - started:.2f}s")
+    print(f"systems: {len(snapshot)}")
+    print(f"findings: {len(snapshot.finding_severity)}")
+    print(f"applications: {len(snapshot.application_id)}")
+    print(f"system/application finding edges: {len(snapshot.system_findings_indices)}"
+          f"/{len(snapshot.application_findings_indices)}")
+    print(f"vulnerabilities: {len(snapshot.labels['cve'])}")
+    print(f"software installations: {len(snapshot.installation_publisher)}")
+    started = time.perf_counter()
+    snapshot.score()
+    print(f"Scored all systems in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+"""
+Dashboard totals maintained at write time.
+
+The General page needs fleet-wide totals: hosts, critical hosts, findings,
+unique findings, vulnerabilities, findings by severity and systems by country.
+Counting them with Cypher scans every System and Finding on each load. Instead,
+writers add the change they made to counters in the same transaction, so the
+totals are read from a handful of small nodes and are exact after every commit:
+
+    (:Statistic {name, stripe, value})   one counter, split into stripes
+    (:FindingTitle {title, refcount})    findings per title, deleted at zero
+
+A counter's value is the sum over its stripes. Each ingest worker writes its
+own stripe, so parallel writers never wait for each other's counter locks.
+Unique findings are the number of FindingTitle nodes, which Neo4j answers from
+its count store without a scan.
+
+Counters are only trusted once ``reconcile`` has rebuilt them from the graph;
+until then the Driver falls back to counting. ``reconcile`` also reports how far
+the counters had drifted, e.g. after writes that bypassed ``database.ingest``.
+Run it from the ``src`` directory while no ingest is running:
+
+    python -m database.statistics reconcile [--dry-run] [--if-missing | --max-age HOURS]
+
+The counters only drift through such writes, so reconcile on a schedule outside
+the ingest window, e.g. nightly from cron. The container does so on start when
+the last reconciliation is older than a day (``--max-age 24``).
+"""
+import argparse
+import sys
+from collections import Counter
+
+from database.frames import maps_to_frame
+
+HOSTS = 'hosts'
+CRITICAL_HOSTS = 'critical_hosts'
+FINDINGS = 'findings'
+VULNERABILITIES = 'vulnerabilities'
+SEVERITY_PREFIX = 'severity:'
+COUNTRY_PREFIX = 'country:'
+
+TITLE_BATCH_SIZE = 10_000
+
+STATISTICS = """
+    OPTIONAL MATCH (v:DataVersion {name: 'graph'})
+    CALL {
+        MATCH (s:Statistic)
+        WITH s.name AS name, SUM(s.value) AS value
+        RETURN COLLECT({name: name, value: value}) AS counters
+    }
+    CALL {
+        MATCH (t:FindingTitle)
+        RETURN COUNT(t) AS total_unique_findings
+    }
+    RETURN v.statistics_reconciled_at AS reconciled_at, counters, total_unique_findings
+"""
+
+
+def to_statistics(records):
+    """
+    The ``get_general_summary`` dict built from the counters, or None if they
+    have never been reconciled.
+    """
+    record = next(iter(records))
+    if record['reconciled_at'] is None:
+        return None
+    counters = {c['name']: c['value'] for c in record['counters']}
+    severities = [
+        {'Severity': name[len(SEVERITY_PREFIX):] or None, 'Count': value}
+        for name, value in counters.items()
+        if name.startswith(SEVERITY_PREFIX) and value > 0
+    ]
+    countries = sorted(
+        (
+            {'country': name[len(COUNTRY_PREFIX):], 'count': value}
+            for name, value in counters.items()
+            if name.startswith(COUNTRY_PREFIX) and value > 0
+        ),
+        key=lambda c: c['count'],
+        reverse=True,
+    )
+    return {
+        'total_hosts': counters.get(HOSTS, 0),
+        'total_critical_hosts': counters.get(CRITICAL_HOSTS, 0),
+        'total_findings': counters.get(FINDINGS, 0),
+        'total_unique_findings': record['total_unique_findings'],
+        'total_vulnerabilities': counters.get(VULNERABILITIES, 0),
+        'findings_by_severity': maps_to_frame(severities, ['Severity', 'Count']),
+        'country_count': maps_to_frame(countries, ['country', 'count']),
+    }
+
+
+def severity_counter(severity):
+    return SEVERITY_PREFIX + (severity or '')
+
+
+def country_counter(country):
+    return COUNTRY_PREFIX + country
+
+
+def apply_statistics(tx, counters, titles, stripe=0):
+    """
+    Add counter deltas inside the writer's transaction.
+
+    Counters and titles are updated in sorted order, so concurrent writers
+    touching the same FindingTitle nodes lock them in the same order and do not
+    deadlock. Titles whose reference count drops to zero are deleted.
+
+    Args:
+        counters (Counter): Counter name -> change.
+        titles (Counter): Finding title -> change in the number of findings.
+        stripe (int): Stripe of the calling writer.
+    """
+    changes = [{'name': name, 'delta': delta} for name, delta in sorted(counters.items()) if delta]
+    if changes:
+        tx.run(
+            """
+            UNWIND $changes AS change
+            MERGE (s:Statistic {name: change.name, stripe: $stripe})
+            SET s.value = COALESCE(s.value, 0) + change.delta
+            """,
+            changes=changes,
+            stripe=stripe,
+        )
+    references = [{'title': title, 'delta': delta} for title, delta in sorted(titles.items()) if delta]
+    if references:
+        tx.run(
+            """
+            UNWIND $references AS reference
+            MERGE (t:FindingTitle {title: reference.title})
+            SET t.refcount = COALESCE(t.refcount, 0) + reference.delta
+            WITH t
+            WHERE t.refcount <= 0
+            DELETE t
+            """,
+            references=references,
+        )
+
+
+def count_graph(session):
+    """
+    Count everything the counters track by scanning the graph.
+
+    Returns:
+        tuple: ``(counters, titles)`` in the form ``apply_statistics`` takes.
+    """
+    counters = Counter()
+    record = session.run(
+        """
+        CALL {
+            MATCH (s:System)
+            RETURN COUNT(s) AS hosts, COUNT(CASE WHEN s.critical > 0 THEN 1 END) AS critical_hosts
+        }
+        CALL { MATCH (f:Finding) RETURN COUNT(f) AS findings }
+        CALL { MATCH (v:Vulnerability) RETURN COUNT(v) AS vulnerabilities }
+        RETURN hosts, critical_hosts, findings, vulnerabilities
+        """
+    ).single()
+    for name in (HOSTS, CRITICAL_HOSTS, FINDINGS, VULNERABILITIES):
+        counters[name] = record[name]
+    for r in session.run("MATCH (f:Finding) RETURN f.severity AS severity, COUNT(*) AS count"):
+        counters[severity_counter(r['severity'])] += r['count']
+    for r in session.run("MATCH (:System)-[:in_country]->(c:Country) RETURN c.name AS country, COUNT(*) AS count"):
+        counters[country_counter(r['country'])] += r['count']
+
+    titles = Counter()
+    for r in session.run("MATCH (f:Finding) WHERE f.title IS NOT NULL RETURN f.title AS title, COUNT(*) AS count"):
+        titles[r['title']] = r['count']
+    return counters, titles
+
+
+def read_statistics(session):
+    """The stored counters and title reference counts, stripes summed."""
+    counters = Counter()
+    for r in session.run("MATCH (s:Statistic) RETURN s.name AS name, SUM(s.value) AS value"):
+        counters[r['name']] = r['value']
+    titles = Counter()
+    for r in session.run("MATCH (t:FindingTitle) RETURN t.title AS title, t.refcount AS refcount"):
+        titles[r['title']] = r['refcount']
+    return counters, titles
+
+
+def drift(expected, stored):
+    """Every key whose stored value differs, as ``key -> (stored, expected)``."""
+    return {
+        key: (stored.get(key, 0), expected.get(key, 0))
+        for key in sorted(set(expected) | set(stored))
+        if stored.get(key, 0) != expected.get(key, 0)
+    }
+
+
+def _set_counters(tx, counters):
+    """
+    Store each counter on stripe 0 and drop its other stripes, and counters that
+    no longer exist, in one transaction, so readers see the old or the new totals.
+    """
+    tx.run(
+        """
+        UNWIND $counters AS counter
+        MERGE (s:Statistic {name: counter.name, stripe: 0})
+        SET s.value = counter.value
+        """,
+        counters=[{'name': name, 'value': value} for name, value in sorted(counters.items())],
+    )
+    tx.run(
+        """
+        MATCH (s:Statistic)
+        WHERE s.stripe <> 0 OR NOT s.name IN $names
+        DELETE s
+        """,
+        names=list(counters),
+    )
+
+
+def _set_titles(tx, titles):
+    tx.run(
+        """
+        UNWIND $titles AS title
+        MERGE (t:FindingTitle {title: title.title})
+        SET t.refcount = title.refcount
+        """,
+        titles=[{'title': title, 'refcount': refcount} for title, refcount in titles],
+    )
+
+
+def _delete_titles(tx, titles):
+    tx.run(
+        """
+        UNWIND $titles AS title
+        MATCH (t:FindingTitle {title: title})
+        DELETE t
+        """,
+        titles=titles,
+    )
+
+
+def _mark_reconciled(tx):
+    from database.connection import bump_data_version
+
+    tx.run(
+        """
+        MERGE (v:DataVersion {name: 'graph'})
+        SET v.statistics_reconciled_at = datetime()
+        """
+    )
+    bump_data_version(tx)
+
+
+def reconciled_age(session):
+    """Seconds since the counters were last reconciled, or None if they never were."""
+    record = session.run(
+        """
+        MATCH (v:DataVersion {name: 'graph'})
+        WHERE v.statistics_reconciled_at IS NOT NULL
+        RETURN duration.inSeconds(v.statistics_reconciled_at, datetime()).seconds AS age
+        """
+    ).single()
+    return record['age'] if record is not None else None
+
+
+def reconcile(driver, dry_run=False):
+    """
+    Rebuild the counters from a full scan of the graph.
+
+    Counters are overwritten in place in one transaction. Finding titles are
+    overwritten, then the obsolete ones deleted, in batches of
+    ``TITLE_BATCH_SIZE``. The counters never disappear in between, so readers
+    do not fall back to scanning.
+
+    Args:
+        driver (Driver): Connection to use.
+        dry_run (bool): Only report the drift, leave the counters as they are.
+
+    Returns:
+        tuple: ``(counter_drift, title_drift)``, each ``key -> (stored, expected)``.
+    """
+    with driver.session() as session:
+        expected_counters, expected_titles = count_graph(session)
+        stored_counters, stored_titles = read_statistics(session)
+        if not dry_run:
+            session.execute_write(_set_counters, expected_counters)
+            titles = sorted(expected_titles.items())
+            for start in range(0, len(titles), TITLE_BATCH_SIZE):
+                session.execute_write(_set_titles, titles[start:start + TITLE_BATCH_SIZE])
+            obsolete = sorted(set(stored_titles) - set(expected_titles))
+            for start in range(0, len(obsolete), TITLE_BATCH_SIZE):
+                session.execute_write(_delete_titles, obsolete[start:start + TITLE_BATCH_SIZE])
+            session.execute_write(_mark_reconciled)
+    return drift(expected_counters, stored_counters), drift(expected_titles, stored_titles)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain the FuSec dashboard counters.')
+    parser.add_argument('command', choices=['reconcile'])
+    parser.add_argument('--dry-run', action='store_true', help='Report drift without rewriting the counters')
+    freshness = parser.add_mutually_exclusive_group()
+    freshness.add_argument('--if-missing', action='store_true', help='Only rebuild if never reconciled before')
+    freshness.add_argument('--max-age', type=float, metavar='HOURS',
+                           help='Only rebuild if not reconciled within this many hours')
+    args = parser.parse_args()
+
+    from database.connection import Driver
+
+    driver = Driver()
+    if args.if_missing or args.max_age is not None:
+        with driver.session() as session:
+            age = reconciled_age(session)
+        max_age = float('inf') if args.if_missing else args.max_age * 3600
+        if age is not None and age < max_age:
+            print(f'Counters reconciled {age / 3600:.1f} hours ago')
+            return 0
+
+    counter_drift, title_drift = reconcile(driver, args.dry_run)
+    for name, (stored, expected) in counter_drift.items():
+        print(f"{name:<40}{stored:>12}{expected:>12}{expected - stored:>+12}")
+    print(f"{len(counter_drift)} counters and {len(title_drift)} finding titles drifted"
+          f"{'' if args.dry_run else ', rebuilt'}")
+    return 1 if args.dry_run and (counter_drift or title_drift) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
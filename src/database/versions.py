@@ -0,0 +1,127 @@
+"""
+Sortable encoding of software version strings.
+
+``version_key`` turns a version into a string whose plain lexicographic order
+is the semantic version order, so it can be stored on SoftwareInstallation,
+indexed, and used for index range seeks:
+
+    version_key('9.1') < version_key('10.0')
+    version_key('2.0.0-rc1') < version_key('2.0.0') < version_key('2.0.0-4ubuntu3')
+
+The numeric release components are zero padded and at least ``RELEASE_PARTS``
+of them are kept, so '1.2' and '1.2.0' share a key. A suffix of '-' and a digit
+(a Debian or RPM package revision such as ``-4ubuntu3``) is a post-release and
+sorts after the bare release but before any longer release. Any other suffix
+(``-rc1``, ``beta2``) is a pre-release and sorts before the bare release. Build
+metadata after ``+`` is ignored.
+
+Backfill keys for existing nodes from the ``src`` directory:
+
+    python -m database.versions [--full]
+
+Use ``--full`` once after the key encoding changes, since only missing keys are
+filled otherwise.
+"""
+import argparse
+import re
+
+RELEASE_PARTS = 4
+NUMBER_WIDTH = 10
+
+_RELEASE = re.compile(r'^[vV]?(\d+(?:\.\d+)*)(.*)$')
+_REVISION = re.compile(r'^-\d')
+_TOKEN = re.compile(r'\d+|[a-z]+')
+
+
+def _pad(number):
+    return number.lstrip('0').rjust(NUMBER_WIDTH, '0')
+
+
+def version_key(version):
+    """
+    Return the sortable key of a version string, or None for a missing version.
+
+    Release components are joined with '.', a bare release ends with '-', a
+    post-release with '-' and a pre-release with '!', each followed by its own
+    padded tokens. Since '!' < '-' < '.', a pre-release sorts before its release,
+    which is a prefix of, and so sorts before, its post-releases, which sort
+    before any longer release. Versions without a numeric release sort after all
+    others.
+    """
+    if version is None:
+        return None
+    version = str(version).strip().split('+', 1)[0]
+    match = _RELEASE.match(version)
+    if match is None:
+        return '~' + version.lower()
+
+    parts = match.group(1).split('.')
+    while len(parts) > RELEASE_PARTS and int(parts[-1]) == 0:
+        parts.pop()
+    parts += ['0'] * (RELEASE_PARTS - len(parts))
+    release = '.'.join(_pad(part) for part in parts)
+
+    suffix = match.group(2).lower()
+    marker = '-' if _REVISION.match(suffix) else '!'
+    suffix = suffix.lstrip('.-_~')
+    if not suffix:
+        return release + '-'
+    tokens = [_pad(token) if token.isdigit() else token for token in _TOKEN.findall(suffix)]
+    return release + marker + '.'.join(tokens)
+
+
+def sort_versions(versions, reverse=False):
+    """Sort version strings semantically."""
+    return sorted(versions, key=lambda v: version_key(v) or '', reverse=reverse)
+
+
+def backfill_version_keys(driver=None, batch_size=5000, full=False):
+    """
+    Store ``version_key`` on every SoftwareInstallation that lacks one, or on
+    all of them when ``full`` is set. Nodes are matched through the
+    ``(publisher, product, version)`` index.
+
+    Returns:
+        int: The number of nodes updated.
+    """
+    # Imported here because database.connection imports this module through database.queries
+    from database.connection import Driver, bump_data_version
+
+    driver = driver or Driver()
+    where = "" if full else "WHERE n.version_key IS NULL AND n.version IS NOT NULL"
+    updated = 0
+    with driver.session() as session:
+        rows = [{**r.data(), 'key': version_key(r['version'])} for r in session.run(
+            f"""
+            MATCH (n:SoftwareInstallation)
+            {where}
+            RETURN DISTINCT n.publisher AS publisher, n.product AS product, n.version AS version
+            """
+        )]
+        for start in range(0, len(rows), batch_size):
+            updated += session.execute_write(
+                lambda tx, batch: tx.run(
+                    """
+                    UNWIND $rows AS row
+                    MATCH (n:SoftwareInstallation {publisher: row.publisher, product: row.product, version: row.version})
+                    SET n.version_key = row.key
+                    RETURN COUNT(n) AS updated
+                    """,
+                    rows=batch,
+                ).single()['updated'],
+                rows[start:start + batch_size],
+            )
+        if updated:
+            session.execute_write(bump_data_version)
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Store sortable version keys on SoftwareInstallation nodes.')
+    parser.add_argument('--full', action='store_true', help='Recompute every key, not just missing ones')
+    args = parser.parse_args()
+    print(f"Updated version keys of {backfill_version_keys(full=args.full)} software installations")
+
+
+if __name__ == '__main__':
+    main()
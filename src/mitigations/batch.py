@@ -0,0 +1,192 @@
+"""
+Headless batch generation of mitigations for every Vulnerability in the graph.
+
+Vulnerabilities without a ``(:Mitigation)`` are walked in CVE order. The
+details of each page of CVEs come from ``enrich_cves`` (local NVD mirror first,
+then the rate-limited NVD API with retries), the mitigations are generated with
+bounded concurrency, and validated results are written back in batches as
+``(v)-[:has_mitigation]->(m:Mitigation)``. The data version is bumped once per
+page, so the shared query cache is not dropped on every write.
+
+Progress is checkpointed to a JSON file after every page, so an interrupted run
+continues where it stopped. CVEs that failed are recorded there and skipped on
+later runs unless ``--retry-failed`` is given. Run from the ``src`` directory:
+
+    python -m mitigations.batch [--concurrency 4] [--checkpoint data/mitigation_batch.json]
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import time
+
+from database.connection import Driver, bump_data_version
+from database.nist import enrich_cves
+from database.nvd_mirror import get_mirror
+from database.settings import get_setting
+from mitigations.llm import MODEL, PROMPT_VERSION, get_mitigations
+
+DEFAULT_CHECKPOINT = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'mitigation_batch.json')
+
+
+def _load_checkpoint(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {'after': '', 'done': 0, 'failed': {}}
+
+
+def _save_checkpoint(path, checkpoint):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _pending_cves(session, after, limit):
+    return [r['cve'] for r in session.run(
+        """
+        MATCH (v:Vulnerability)
+        WHERE v.cve > $after AND NOT (v)-[:has_mitigation]->(:Mitigation)
+        RETURN DISTINCT v.cve AS cve
+        ORDER BY cve
+        LIMIT $limit
+        """,
+        after=after,
+        limit=limit,
+    )]
+
+
+def _write_mitigations(tx, rows):
+    tx.run(
+        """
+        UNWIND $rows AS row
+        MATCH (v:Vulnerability {cve: row.cve})
+        MERGE (m:Mitigation {cve: row.cve})
+        SET m.type = row.type,
+            m.content = row.content,
+            m.description = row.description,
+            m.model = row.model,
+            m.prompt_version = row.prompt_version,
+            m.created_at = datetime()
+        MERGE (v)-[:has_mitigation]->(m)
+        """,
+        rows=rows,
+    )
+
+
+def _cve_details(cves):
+    """``(cve, details, error)`` per CVE, from the mirror and, if allowed, the NVD API."""
+    if get_setting('NVD', 'API_FALLBACK', True, bool):
+        yield from enrich_cves(cves)
+        return
+    mirror = get_mirror()
+    for cve in cves:
+        details = mirror.get_response_text(cve) if mirror is not None else None
+        yield cve, details, None if details is not None else 'CVE details not found'
+
+
+def _mitigate(item):
+    cve, details = item
+    try:
+        mitigation = get_mitigations(details, cve)
+    except Exception as e:
+        return cve, None, str(e)
+    if mitigation is None:
+        return cve, None, 'no valid mitigation generated'
+    return cve, mitigation, None
+
+
+def run_batch(driver=None, checkpoint_path=DEFAULT_CHECKPOINT, concurrency=4, page_size=200,
+              write_batch_size=50, limit=None, retry_failed=False):
+    """
+    Generate and store mitigations for every Vulnerability that has none.
+
+    Args:
+        driver (Driver): Connection to use, defaults to a new Driver.
+        checkpoint_path (str): JSON file recording progress and failures.
+        concurrency (int): Number of mitigations generated in parallel.
+        page_size (int): Number of CVEs fetched from the graph per page.
+        write_batch_size (int): Number of mitigations per write transaction.
+        limit (int): Stop after this many CVEs, e.g. for a trial run.
+        retry_failed (bool): Retry CVEs that failed in earlier runs.
+
+    Returns:
+        dict: The final checkpoint.
+    """
+    driver = driver or Driver()
+    checkpoint = _load_checkpoint(checkpoint_path)
+    if retry_failed:
+        checkpoint['after'] = ''
+        checkpoint['failed'] = {}
+    failed = checkpoint['failed']
+    processed = 0
+    started = time.perf_counter()
+
+    with driver.session() as session, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while limit is None or processed < limit:
+            page = _pending_cves(session, checkpoint['after'], page_size)
+            if not page:
+                break
+            remaining = [cve for cve in page if cve not in failed]
+            todo = remaining if limit is None else remaining[:limit - processed]
+
+            found = []
+            for cve, details, error in _cve_details(todo):
+                if error is not None:
+                    processed += 1
+                    failed[cve] = error
+                    print(f"{cve}: {error}")
+                else:
+                    found.append((cve, details))
+
+            rows = []
+            stored = checkpoint['done']
+            for cve, mitigation, error in executor.map(_mitigate, found):
+                processed += 1
+                if error is not None:
+                    failed[cve] = error
+                    print(f"{cve}: {error}")
+                    continue
+                rows.append({'cve': cve, 'model': MODEL, 'prompt_version': PROMPT_VERSION, **mitigation})
+                if len(rows) >= write_batch_size:
+                    session.execute_write(_write_mitigations, rows)
+                    checkpoint['done'] += len(rows)
+                    rows = []
+            if rows:
+                session.execute_write(_write_mitigations, rows)
+                checkpoint['done'] += len(rows)
+            if checkpoint['done'] > stored:
+                session.execute_write(bump_data_version)
+
+            # A page cut short by --limit is resumed from its last processed CVE
+            checkpoint['after'] = todo[-1] if len(todo) < len(remaining) else page[-1]
+            _save_checkpoint(checkpoint_path, checkpoint)
+            elapsed = time.perf_counter() - started
+            print(f"{checkpoint['done']} stored, {len(failed)} failed, {processed / elapsed:.2f} CVEs/s, at {checkpoint['after']}")
+
+    return checkpoint
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate mitigations for all Vulnerability nodes.')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--page-size', type=int, default=200)
+    parser.add_argument('--write-batch-size', type=int, default=50)
+    parser.add_argument('--limit', type=int)
+    parser.add_argument('--retry-failed', action='store_true')
+    args = parser.parse_args()
+    run_batch(
+        checkpoint_path=args.checkpoint,
+        concurrency=args.concurrency,
+        page_size=args.page_size,
+        write_batch_size=args.write_batch_size,
+        limit=args.limit,
+        retry_failed=args.retry_failed,
+    )
+
+
+if __name__ == '__main__':
+    main()
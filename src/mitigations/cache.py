@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from database.settings import get_setting
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'mitigations.sqlite3')
+
+
+def _canonical_details(cve_details):
+    """
+    The CVE record of an NVD API response, serialized with sorted keys. Envelope
+    fields such as ``timestamp`` change on every call and are left out. Text
+    that is not such a response is used as is.
+    """
+    try:
+        record = json.loads(cve_details)['vulnerabilities'][0]['cve']
+    except (ValueError, TypeError, KeyError, IndexError):
+        return cve_details
+    return json.dumps(record, sort_keys=True, separators=(',', ':'))
+
+
+def mitigation_key(cve_id, cve_details, model, prompt_version):
+    """Cache key of a mitigation: CVE ID plus hashes of everything that shapes the answer."""
+    details_hash = hashlib.sha256(_canonical_details(cve_details).encode('utf-8')).hexdigest()
+    raw = f"{(cve_id or '').strip().upper()}|{details_hash}|{model}|{prompt_version}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class MitigationCache:
+    """
+    Persistent SQLite cache of validated LLM mitigations, shared by every user
+    of the server. The least recently used entries are evicted once more than
+    ``max_entries`` are stored.
+    """
+
+    def __init__(self, path=None, max_entries=None):
+        self.path = path or get_setting('MITIGATIONS', 'CACHE_PATH', DEFAULT_PATH)
+        self.max_entries = max_entries or get_setting('MITIGATIONS', 'CACHE_MAX_ENTRIES', 10000, int)
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        with self._connection() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS mitigations (
+                    key TEXT PRIMARY KEY,
+                    cve TEXT,
+                    model TEXT NOT NULL,
+                    prompt_version INTEGER NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS mitigations_accessed_at ON mitigations (accessed_at);
+                """
+            )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connection()
+        row = conn.execute("SELECT response FROM mitigations WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with conn:
+            conn.execute("UPDATE mitigations SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key, cve_id, model, prompt_version, mitigation):
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO mitigations (key, cve, model, prompt_version, response, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (key, (cve_id or '').strip().upper(), model, prompt_version, json.dumps(mitigation), now, now),
+            )
+            conn.execute(
+                """
+                DELETE FROM mitigations WHERE key IN (
+                    SELECT key FROM mitigations ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+
+    def stats(self):
+        count = self._connection().execute("SELECT COUNT(*) FROM mitigations").fetchone()[0]
+        return {'entries': count, 'max_entries': self.max_entries, 'hits': self.hits, 'misses': self.misses}
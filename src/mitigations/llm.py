@@ -0,0 +1,230 @@
+import functools
+import json
+import logging
+import time
+
+from groq import Groq
+
+from database.settings import get_setting
+from mitigations.cache import MitigationCache, mitigation_key
+
+MODEL = "llama3-70b-8192"
+# Bump whenever system_prompt changes so cached mitigations are regenerated
+PROMPT_VERSION = 1
+# Characters of an invalid response kept in the log
+LOGGED_CONTENT_CHARS = 200
+
+logger = logging.getLogger(__name__)
+
+system_prompt = """
+You are an Incident Manager, helping the Teams to find mitigations for Security Incidents. The User provides you with a description of the Vulnerability. You then provide the User with a Mitigation. This can either be an "ansible" playbook to be executed on the vulnerable servers. The other type is "manual", there you just provide a step by step plan for the Teams should do to mitigate the vulnerability formatted in markdown, like "Add a Firewall Rule to the central Firewall, to deny all external traffic to the Kubernetes Master Nodes on their KubeAPI Port". The Description should be a short description of the Mitigation used in both cases.
+"content" and "description" values need to be escaped properly into one line!
+For Ansible Mitigations, further mitigations can be provided in the description in markdown format.
+Ansible Mitigations are preffered, even if they are just partial
+You answer in JSON Format Only!!
+Example:
+{"type": "ansible","content": ""---\n- hosts: all\n  tasks:\n    - name: Print JSON value\n      debug:\n        msg: \"{{ my_json_value.key1 }}\"\n      vars:\n        my_json_value: \'{\"key1\": \"value1\", \"key2\": \"value2\"}\'\n", "description": "This is just an example for an ansible playbook"}
+"""
+
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+_WHITESPACE = ' \t\r\n'
+
+
+@functools.lru_cache(maxsize=None)
+def get_groq_client():
+    """Return the process-wide Groq client. ``[GROQ] BASE_URL`` points it at another endpoint, e.g. a stub."""
+    return Groq(api_key=get_setting('GROQ', 'API_KEY'), base_url=get_setting('GROQ', 'BASE_URL'))
+
+
+@functools.lru_cache(maxsize=None)
+def get_mitigation_cache():
+    """Return the process-wide persistent mitigation cache."""
+    return MitigationCache()
+
+
+def _scan_string(text, i):
+    """Decode the JSON string starting at ``text[i] == '"'``, tolerating raw control characters."""
+    chars = []
+    i += 1
+    while i < len(text):
+        c = text[i]
+        if c == '"':
+            return ''.join(chars), i + 1, True
+        if c == '\\':
+            if i + 1 >= len(text):
+                break
+            escape = text[i + 1]
+            if escape == 'u':
+                if i + 6 > len(text):
+                    break
+                try:
+                    chars.append(chr(int(text[i + 2:i + 6], 16)))
+                except ValueError:
+                    chars.append(text[i:i + 6])
+                i += 6
+                continue
+            chars.append(_ESCAPES.get(escape, escape))
+            i += 2
+            continue
+        chars.append(c)
+        i += 1
+    return ''.join(chars), i, False
+
+
+def partial_json_fields(text):
+    """
+    Parse the top-level fields of a possibly incomplete or slightly malformed
+    JSON object, e.g. a response that is still streaming in.
+
+    The last string value may be cut off and is returned as far as it got.
+    Raw newlines inside strings, trailing commas and missing closing quotes or
+    braces are accepted.
+
+    Returns:
+        dict: The fields parsed so far.
+    """
+    decoder = json.JSONDecoder()
+    fields = {}
+    i = text.find('{')
+    if i == -1:
+        return fields
+    i += 1
+    n = len(text)
+    while i < n:
+        while i < n and text[i] in _WHITESPACE + ',':
+            i += 1
+        if i >= n or text[i] != '"':
+            break
+        key, i, done = _scan_string(text, i)
+        if not done:
+            break
+        while i < n and text[i] in _WHITESPACE:
+            i += 1
+        if i >= n or text[i] != ':':
+            break
+        i += 1
+        while i < n and text[i] in _WHITESPACE:
+            i += 1
+        if i >= n:
+            break
+        if text[i] == '"':
+            fields[key], i, done = _scan_string(text, i)
+            if not done:
+                break
+        else:
+            try:
+                fields[key], i = decoder.raw_decode(text, i)
+            except json.JSONDecodeError:
+                break
+    return fields
+
+
+def repair_json(text):
+    """
+    Parse an LLM JSON answer, repairing small format errors locally instead of
+    asking the model again: code fences, text around the object, unescaped
+    newlines, trailing commas and a truncated ending.
+
+    Returns:
+        dict: The parsed object, or None if no object could be recovered.
+    """
+    start = text.find('{')
+    if start == -1:
+        return None
+    try:
+        value, _ = json.JSONDecoder().raw_decode(text, start)
+        if isinstance(value, dict):
+            return value
+    except json.JSONDecodeError:
+        pass
+    return partial_json_fields(text[start:]) or None
+
+
+def normalize_type(value):
+    """The mitigation type as compared against ``ansible`` and ``manual``, or None if not a string."""
+    return value.strip().lower() if isinstance(value, str) else None
+
+
+def validate_mitigation(mitigation):
+    """Normalize a parsed mitigation in place and check that it is complete."""
+    if not isinstance(mitigation, dict):
+        return False
+    if not all(isinstance(mitigation.get(k), str) for k in ('type', 'content', 'description')):
+        return False
+    mitigation['type'] = normalize_type(mitigation['type'])
+    return mitigation['type'] in ['ansible', 'manual']
+
+
+def _messages(cve_details):
+    return [{"role": "system", "content": system_prompt}, {"role": "user", "content": cve_details}]
+
+
+def _generate(cve_details, retries, on_update=None, update_interval=0.1):
+    """
+    Ask the LLM for a mitigation in JSON mode. With ``on_update`` the answer is
+    streamed and the fields parsed so far are passed to it as tokens arrive.
+    A response is only regenerated if local repair cannot make it valid.
+    """
+    groq = get_groq_client()
+    for attempt in range(retries + 1):
+        if on_update is None:
+            response = groq.chat.completions.create(
+                model=MODEL,
+                messages=_messages(cve_details),
+                temperature=0.8,
+                response_format={"type": "json_object"},
+            )
+            content = response.choices[0].message.content or ''
+        else:
+            stream = groq.chat.completions.create(
+                model=MODEL,
+                messages=_messages(cve_details),
+                temperature=0.8,
+                response_format={"type": "json_object"},
+                stream=True,
+            )
+            parts = []
+            last_update = 0.0
+            for chunk in stream:
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                parts.append(chunk.choices[0].delta.content)
+                now = time.monotonic()
+                if now - last_update >= update_interval:
+                    last_update = now
+                    on_update(partial_json_fields(''.join(parts)))
+            content = ''.join(parts)
+            on_update(partial_json_fields(content))
+
+        mitigation = repair_json(content)
+        if validate_mitigation(mitigation):
+            return mitigation
+        logger.warning("Invalid mitigation, %d retries left. Content: %.*s", retries - attempt,
+                       LOGGED_CONTENT_CHARS, content)
+    return None
+
+
+def get_mitigations(cve_details, cve_id=None, retries=1, on_update=None):
+    """
+    Return a validated mitigation for the CVE, generating it only on a cache miss.
+
+    Args:
+        cve_details (str): The vulnerability description sent to the LLM.
+        cve_id (str): The CVE ID, part of the cache key.
+        retries (int): Regeneration attempts for responses that cannot be repaired.
+        on_update (callable): Stream the answer and call this with the fields
+            parsed so far (``type``, ``description``, ``content``) as tokens arrive.
+
+    Returns:
+        dict: The mitigation with ``type``, ``content`` and ``description``, or None.
+    """
+    cache = get_mitigation_cache()
+    key = mitigation_key(cve_id, cve_details, MODEL, PROMPT_VERSION)
+    mitigation = cache.get(key)
+    if mitigation is not None:
+        return mitigation
+    mitigation = _generate(cve_details, retries, on_update)
+    if mitigation is not None:
+        cache.put(key, cve_id, MODEL, PROMPT_VERSION, mitigation)
+    return mitigation
@@ -1,10 +1,13 @@
 import streamlit as st
 
-from database.connection import Driver
+from database.async_connection import AsyncDriver
+from database.backend import backend_type, create_driver
 from visualization.dashboard import Dashboard
 
-driver = Driver()
+driver = create_driver()
+# Concurrent page queries only apply to the Neo4j backend
+async_driver = AsyncDriver() if backend_type() == 'neo4j' else None
 dashboard = Dashboard()
 
 
-dashboard.display_investigation_dashboards(driver)
\ No newline at end of file
+dashboard.display_investigation_dashboards(driver, async_driver)
\ No newline at end of file
@@ -1,66 +1,12 @@
 import streamlit as st
-from groq import Groq
-import configparser
-import os
+from database.backend import create_driver
 from database.nist import get_vulnerability_by_cve
-import json
+from mitigations.llm import get_mitigations, normalize_type
+from visualization.dashboard import Dashboard
 
-system_prompt = """
-You are an Incident Manager, helping the Teams to find mitigations for Security Incidents. The User provides you with a description of the Vulnerability. You then provide the User with a Mitigation. This can either be an "ansible" playbook to be executed on the vulnerable servers. The other type is "manual", there you just provide a step by step plan for the Teams should do to mitigate the vulnerability formatted in markdown, like "Add a Firewall Rule to the central Firewall, to deny all external traffic to the Kubernetes Master Nodes on their KubeAPI Port". The Description should be a short description of the Mitigation used in both cases.
-"content" and "description" values need to be escaped properly into one line!
-For Ansible Mitigations, further mitigations can be provided in the description in markdown format.
-Ansible Mitigations are preffered, even if they are just partial
-You answer in JSON Format Only!!
-Example:
-{"type": "ansible","content": ""---\n- hosts: all\n  tasks:\n    - name: Print JSON value\n      debug:\n        msg: \"{{ my_json_value.key1 }}\"\n      vars:\n        my_json_value: \'{\"key1\": \"value1\", \"key2\": \"value2\"}\'\n", "description": "This is just an example for an ansible playbook"}
-"""
+driver = create_driver()
+dashboard = Dashboard()
 
-def get_groq_client():
-    path = os.path.join(os.path.dirname(__file__), '..', 'config.ini')
-    if os.path.exists(path):
-        config = configparser.ConfigParser()
-        config.read(path)
-        api_key = config['GROQ']['API_KEY']
-    else:
-        api_key = os.getenv('GROQ_API_KEY')
-
-    groq = Groq(api_key=api_key)
-    return groq
-
-def get_mitigations(cve_details, retries=3):
-    groq = get_groq_client()
-    response = groq.chat.completions.create(
-        model="llama3-70b-8192",
-        messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": cve_details}],
-        temperature=0.8
-    )
-    if response.choices[0].message.content is not None:
-        
-        try:
-            response = json.loads(response.choices[0].message.content)
-        except json.JSONDecodeError:
-            if retries > 0:
-                print(f"JSONDecodeError, retrying... {retries} retries left. Content: {response.choices[0].message.content}")
-                return get_mitigations(cve_details, retries - 1)
-            else:
-                return None
-        ## Check that all keys are present and valid types
-        if 'type' not in response or 'content' not in response or 'description' not in response:
-            if retries > 0:
-                print("Invalid JSON, retrying...")
-                return get_mitigations(cve_details, retries - 1)
-            else:
-                return None
-        if response['type'] not in ['ansible', 'manual']:
-            if retries > 0:
-                print("Invalid Mitigation Type, retrying...")
-                return get_mitigations(cve_details, retries - 1)
-            else:   
-                return None
-        return response
-    else:
-        return None
-    
 
 def display_mitigations():
     st.title('Mitigations')
@@ -86,8 +32,26 @@ def display_mitigations():
     # Always show the text area for CVE details
     cve_details = st.text_area('CVE Details', value=st.session_state.cve_details, key='cve_details_input')
 
-    if st.button('Get Mitigations from Groq'):
-        mitigations = get_mitigations(cve_details)  # Use the current text area value
+    # Mitigations generated by the batch job are stored in the graph
+    stored_mitigations = driver.get_mitigation(cve_id) if cve_id else None
+    if stored_mitigations is not None:
+        st.session_state.mitigations = stored_mitigations
+
+    if stored_mitigations is None and st.button('Get Mitigations from Groq'):
+        # Render the answer while it streams in; the final result is shown after the rerun
+        description_placeholder = st.empty()
+        content_placeholder = st.empty()
+
+        def render_partial(fields):
+            if fields.get('description'):
+                description_placeholder.markdown(fields['description'])
+            if fields.get('content'):
+                if normalize_type(fields.get('type')) == 'manual':
+                    content_placeholder.markdown(fields['content'])
+                else:
+                    content_placeholder.code(fields['content'], language='yaml')
+
+        mitigations = get_mitigations(cve_details, cve_id, on_update=render_partial)  # Use the current text area value
         if mitigations is not None:
             st.session_state.mitigations = mitigations
             st.rerun()
@@ -95,15 +59,7 @@ def display_mitigations():
             st.error('No mitigations found')
 
     if 'mitigations' in st.session_state:
-        mitigations = st.session_state.mitigations
-        if mitigations['type'] == 'ansible':
-            st.subheader('Ansible Playbook')
-            st.markdown(mitigations['description'])
-            st.code(mitigations['content'], language='yaml')
-            st.warning("This code is AI generated, please verify it! It can negatively impact the production environment! Just use it as a starting point!")
-        else:
-            st.subheader('Manual Mitigation')
-            st.markdown(mitigations['content'])
+        dashboard.display_mitigation(st.session_state.mitigations)
 
 display_mitigations()
 
@@ -0,0 +1,80 @@
+import plotly.express as px
+import streamlit as st
+
+from database.connection import Driver, prometheus_text
+
+st.set_page_config(layout="wide")
+
+driver = Driver()
+
+st.title('Performance')
+
+if driver.metrics is None:
+    st.info('Query instrumentation is disabled. Set [METRICS] ENABLED to true to collect query metrics.')
+    st.stop()
+
+# Percentiles are per process, over the last MAX_SAMPLES executions of each query
+summary = driver.metrics.summary()
+if summary.empty:
+    st.info('No queries have run in this process yet. Open one of the dashboards first.')
+else:
+    st.subheader('Query Latency')
+    st.dataframe(summary, hide_index=True, use_container_width=True)
+
+    samples = driver.metrics.samples()
+    selected = st.multiselect('Queries', summary['query'].tolist(), default=summary['query'].tolist()[:5])
+    samples = samples[samples['query'].isin(selected)]
+    if not samples.empty:
+        fig = px.line(
+            samples,
+            x='timestamp',
+            y='wall_ms',
+            color='query',
+            markers=True,
+            title='Wall Time per Execution (ms)',
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+        server = samples.dropna(subset=['available_ms', 'consumed_ms'])
+        if not server.empty:
+            fig = px.box(
+                server.melt(id_vars='query', value_vars=['available_ms', 'consumed_ms', 'wall_ms'],
+                            var_name='phase', value_name='ms'),
+                x='query',
+                y='ms',
+                color='phase',
+                title='Server vs. Client Time (ms)',
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+    slow = driver.metrics.slow_queries()
+    st.subheader(f'Slow Queries (≥ {driver.metrics.slow_query_ms:.0f} ms)' if driver.metrics.slow_query_ms
+                 else 'Slow Queries')
+    if slow.empty:
+        st.caption('None recorded.')
+    else:
+        st.dataframe(slow, hide_index=True, use_container_width=True)
+
+col1, col2 = st.columns(2)
+with col1:
+    st.subheader('Query Cache')
+    cache_stats = driver.cache_stats()
+    if cache_stats is None:
+        st.caption('Caching is disabled.')
+    else:
+        st.json(cache_stats)
+with col2:
+    st.subheader('Connection Pools')
+    pool_stats = driver.pool_stats()
+    if not pool_stats:
+        st.caption('No connection pool is open.')
+    else:
+        st.json(pool_stats)
+
+col1, col2, _ = st.columns([1, 1, 4])
+with col1:
+    st.download_button('Export metrics', prometheus_text(), file_name='fusec.prom', mime='text/plain')
+with col2:
+    if st.button('Reset metrics'):
+        driver.metrics.reset()
+        st.rerun()
@@ -0,0 +1,87 @@
+"""
+Country names to ISO 3166-1 alpha-3 codes.
+
+Plotly's ``"country names"`` location mode matches every name against its own
+list on each render. Resolving names once through this table lets the
+choropleth use exact ``ISO-3`` locations instead. Lookups ignore case and
+surrounding whitespace, and accept alpha-2 and alpha-3 codes as well as the
+common short names scanners report.
+"""
+import functools
+
+ISO3 = {
+    'Afghanistan': 'AFG', 'Albania': 'ALB', 'Algeria': 'DZA', 'Andorra': 'AND', 'Angola': 'AGO',
+    'Antigua and Barbuda': 'ATG', 'Argentina': 'ARG', 'Armenia': 'ARM', 'Australia': 'AUS', 'Austria': 'AUT',
+    'Azerbaijan': 'AZE', 'Bahamas': 'BHS', 'Bahrain': 'BHR', 'Bangladesh': 'BGD', 'Barbados': 'BRB',
+    'Belarus': 'BLR', 'Belgium': 'BEL', 'Belize': 'BLZ', 'Benin': 'BEN', 'Bhutan': 'BTN', 'Bolivia': 'BOL',
+    'Bosnia and Herzegovina': 'BIH', 'Botswana': 'BWA', 'Brazil': 'BRA', 'Brunei': 'BRN', 'Bulgaria': 'BGR',
+    'Burkina Faso': 'BFA', 'Burundi': 'BDI', 'Cabo Verde': 'CPV', 'Cambodia': 'KHM', 'Cameroon': 'CMR',
+    'Canada': 'CAN', 'Central African Republic': 'CAF', 'Chad': 'TCD', 'Chile': 'CHL', 'China': 'CHN',
+    'Colombia': 'COL', 'Comoros': 'COM', 'Congo': 'COG', 'Democratic Republic of the Congo': 'COD',
+    'Costa Rica': 'CRI', "Cote d'Ivoire": 'CIV', 'Croatia': 'HRV', 'Cuba': 'CUB', 'Cyprus': 'CYP',
+    'Czechia': 'CZE', 'Denmark': 'DNK', 'Djibouti': 'DJI', 'Dominica': 'DMA', 'Dominican Republic': 'DOM',
+    'Ecuador': 'ECU', 'Egypt': 'EGY', 'El Salvador': 'SLV', 'Equatorial Guinea': 'GNQ', 'Eritrea': 'ERI',
+    'Estonia': 'EST', 'Eswatini': 'SWZ', 'Ethiopia': 'ETH', 'Fiji': 'FJI', 'Finland': 'FIN', 'France': 'FRA',
+    'Gabon': 'GAB', 'Gambia': 'GMB', 'Georgia': 'GEO', 'Germany': 'DEU', 'Ghana': 'GHA', 'Greece': 'GRC',
+    'Greenland': 'GRL', 'Grenada': 'GRD', 'Guatemala': 'GTM', 'Guinea': 'GIN', 'Guinea-Bissau': 'GNB',
+    'Guyana': 'GUY', 'Haiti': 'HTI', 'Honduras': 'HND', 'Hong Kong': 'HKG', 'Hungary': 'HUN', 'Iceland': 'ISL',
+    'India': 'IND', 'Indonesia': 'IDN', 'Iran': 'IRN', 'Iraq': 'IRQ', 'Ireland': 'IRL', 'Israel': 'ISR',
+    'Italy': 'ITA', 'Jamaica': 'JAM', 'Japan': 'JPN', 'Jordan': 'JOR', 'Kazakhstan': 'KAZ', 'Kenya': 'KEN',
+    'Kiribati': 'KIR', 'Kosovo': 'XKX', 'Kuwait': 'KWT', 'Kyrgyzstan': 'KGZ', 'Laos': 'LAO', 'Latvia': 'LVA',
+    'Lebanon': 'LBN', 'Lesotho': 'LSO', 'Liberia': 'LBR', 'Libya': 'LBY', 'Liechtenstein': 'LIE',
+    'Lithuania': 'LTU', 'Luxembourg': 'LUX', 'Macao': 'MAC', 'Madagascar': 'MDG', 'Malawi': 'MWI',
+    'Malaysia': 'MYS', 'Maldives': 'MDV', 'Mali': 'MLI', 'Malta': 'MLT', 'Marshall Islands': 'MHL',
+    'Mauritania': 'MRT', 'Mauritius': 'MUS', 'Mexico': 'MEX', 'Micronesia': 'FSM', 'Moldova': 'MDA',
+    'Monaco': 'MCO', 'Mongolia': 'MNG', 'Montenegro': 'MNE', 'Morocco': 'MAR', 'Mozambique': 'MOZ',
+    'Myanmar': 'MMR', 'Namibia': 'NAM', 'Nauru': 'NRU', 'Nepal': 'NPL', 'Netherlands': 'NLD',
+    'New Zealand': 'NZL', 'Nicaragua': 'NIC', 'Niger': 'NER', 'Nigeria': 'NGA', 'North Korea': 'PRK',
+    'North Macedonia': 'MKD', 'Norway': 'NOR', 'Oman': 'OMN', 'Pakistan': 'PAK', 'Palau': 'PLW',
+    'Palestine': 'PSE', 'Panama': 'PAN', 'Papua New Guinea': 'PNG', 'Paraguay': 'PRY', 'Peru': 'PER',
+    'Philippines': 'PHL', 'Poland': 'POL', 'Portugal': 'PRT', 'Puerto Rico': 'PRI', 'Qatar': 'QAT',
+    'Romania': 'ROU', 'Russia': 'RUS', 'Rwanda': 'RWA', 'Saint Kitts and Nevis': 'KNA', 'Saint Lucia': 'LCA',
+    'Saint Vincent and the Grenadines': 'VCT', 'Samoa': 'WSM', 'San Marino': 'SMR',
+    'Sao Tome and Principe': 'STP', 'Saudi Arabia': 'SAU', 'Senegal': 'SEN', 'Serbia': 'SRB',
+    'Seychelles': 'SYC', 'Sierra Leone': 'SLE', 'Singapore': 'SGP', 'Slovakia': 'SVK', 'Slovenia': 'SVN',
+    'Solomon Islands': 'SLB', 'Somalia': 'SOM', 'South Africa': 'ZAF', 'South Korea': 'KOR',
+    'South Sudan': 'SSD', 'Spain': 'ESP', 'Sri Lanka': 'LKA', 'Sudan': 'SDN', 'Suriname': 'SUR',
+    'Sweden': 'SWE', 'Switzerland': 'CHE', 'Syria': 'SYR', 'Taiwan': 'TWN', 'Tajikistan': 'TJK',
+    'Tanzania': 'TZA', 'Thailand': 'THA', 'Timor-Leste': 'TLS', 'Togo': 'TGO', 'Tonga': 'TON',
+    'Trinidad and Tobago': 'TTO', 'Tunisia': 'TUN', 'Turkey': 'TUR', 'Turkmenistan': 'TKM', 'Tuvalu': 'TUV',
+    'Uganda': 'UGA', 'Ukraine': 'UKR', 'United Arab Emirates': 'ARE', 'United Kingdom': 'GBR',
+    'United States': 'USA', 'Uruguay': 'URY', 'Uzbekistan': 'UZB', 'Vanuatu': 'VUT', 'Vatican City': 'VAT',
+    'Venezuela': 'VEN', 'Vietnam': 'VNM', 'Yemen': 'YEM', 'Zambia': 'ZMB', 'Zimbabwe': 'ZWE',
+}
+
+ALIASES = {
+    'USA': 'United States', 'US': 'United States', 'United States of America': 'United States',
+    'UK': 'United Kingdom', 'GB': 'United Kingdom', 'Great Britain': 'United Kingdom', 'England': 'United Kingdom',
+    'DE': 'Germany', 'Deutschland': 'Germany', 'FR': 'France', 'NL': 'Netherlands', 'The Netherlands': 'Netherlands',
+    'Holland': 'Netherlands', 'IE': 'Ireland', 'SE': 'Sweden', 'PL': 'Poland', 'ES': 'Spain', 'IT': 'Italy',
+    'CH': 'Switzerland', 'AT': 'Austria', 'CA': 'Canada', 'BR': 'Brazil', 'IN': 'India', 'JP': 'Japan',
+    'SG': 'Singapore', 'AU': 'Australia', 'ZA': 'South Africa', 'MX': 'Mexico', 'CN': 'China',
+    'Czech Republic': 'Czechia', 'Russian Federation': 'Russia', 'Republic of Korea': 'South Korea',
+    'Korea, Republic of': 'South Korea', 'Korea': 'South Korea', "Korea, Democratic People's Republic of": 'North Korea',
+    'Viet Nam': 'Vietnam', 'Iran, Islamic Republic of': 'Iran', 'Syrian Arab Republic': 'Syria',
+    'Lao People\'s Democratic Republic': 'Laos', 'Moldova, Republic of': 'Moldova', 'Tanzania, United Republic of': 'Tanzania',
+    'Bolivia, Plurinational State of': 'Bolivia', 'Venezuela, Bolivarian Republic of': 'Venezuela',
+    'Turkiye': 'Turkey', 'Türkiye': 'Turkey', 'Ivory Coast': "Cote d'Ivoire", "Côte d'Ivoire": "Cote d'Ivoire",
+    'Cape Verde': 'Cabo Verde', 'Swaziland': 'Eswatini', 'Macedonia': 'North Macedonia', 'Burma': 'Myanmar',
+    'East Timor': 'Timor-Leste', 'DR Congo': 'Democratic Republic of the Congo',
+    'Congo, The Democratic Republic of the': 'Democratic Republic of the Congo', 'Republic of the Congo': 'Congo',
+    'UAE': 'United Arab Emirates', 'Holy See': 'Vatican City', 'Brunei Darussalam': 'Brunei',
+    'Palestine, State of': 'Palestine', 'Taiwan, Province of China': 'Taiwan', 'Macau': 'Macao',
+}
+
+_LOOKUP = {
+    **{code.casefold(): code for code in ISO3.values()},
+    **{name.casefold(): code for name, code in ISO3.items()},
+    **{alias.casefold(): ISO3[name] for alias, name in ALIASES.items()},
+}
+
+
+@functools.lru_cache(maxsize=1024)
+def iso3(name):
+    """The ISO 3166-1 alpha-3 code of a country name or code, or None if unknown."""
+    if not isinstance(name, str):
+        return None
+    return _LOOKUP.get(name.strip().casefold())
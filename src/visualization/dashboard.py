@@ -1,67 +1,194 @@
 import streamlit as st
 import plotly.express as px
 import re
+import time
+
+from database.frames import cursor_value
+from database.hll import HyperLogLog, precision
+from database.versions import version_key
+from visualization import figures
+
+
+def _metric_value(summary, key):
+    """Format a summary total, marking HyperLogLog estimates with ≈."""
+    value = summary[key]
+    if key in summary.get('approximate', ()):
+        return f"≈{value:,}"
+    return value
 
 
 class Dashboard:
-    def display_general_dashboard(self, total_unique_hosts, total_critical_hosts, total_findings, total_unique_findings, total_vulnerabilities):
+    def display_general_dashboard(self, summary):
         st.title('General Dashboard')
 
         with st.container(border=True):
             col1, col2, col3, col4, col5 = st.columns(5)
             with col1:
                 # Display total unique hosts
-                st.metric(label="Total Unique Hosts", value=total_unique_hosts)
+                st.metric(label="Total Unique Hosts", value=_metric_value(summary, 'total_hosts'))
             with col2:
                 # Display total critical hosts
-                st.metric(label="Total Critical Hosts", value=total_critical_hosts)
+                st.metric(label="Total Critical Hosts", value=summary['total_critical_hosts'])
             with col3:
                 # Display total findings
-                st.metric(label="Total Findings", value=total_findings)
+                st.metric(label="Total Findings", value=summary['total_findings'])
             with col4:
                 # Display unique findings
-                st.metric(label="Total Unique Findings", value=total_unique_findings)
+                st.metric(label="Total Unique Findings", value=_metric_value(summary, 'total_unique_findings'))
             with col5:
                 # Display total vulnerabilities
-                st.metric(label="Total Vulnerabilities", value=total_vulnerabilities)
+                st.metric(label="Total Vulnerabilities", value=_metric_value(summary, 'total_vulnerabilities'))
+
+        if summary.get('approximate'):
+            st.caption(f"≈ HyperLogLog estimate, relative standard error {HyperLogLog(precision()).relative_error:.2%}")
 
-    def display_findings_dashboard(self, findings_by_severity_df, total_unique_findings):
+    def display_distinct_slice(self, driver):
+        """Approximate distinct counts for a selection of countries and providers, merged from sketches."""
+        countries, providers = driver.get_sketch_partitions()
+        if not countries and not providers:
+            return
+        with st.container(border=True):
+            st.subheader('Distinct Counts by Country and Provider')
+            col1, col2 = st.columns(2)
+            with col1:
+                selected_countries = st.multiselect('Countries', [c for c in countries if c], key='slice_countries')
+            with col2:
+                selected_providers = st.multiselect('Providers', [p for p in providers if p], key='slice_providers')
+            estimates = driver.get_distinct_estimates(selected_countries or None, selected_providers or None)
+            if estimates is None:
+                st.info('No sketches for this selection.')
+                return
+            approximate = {**estimates, 'approximate': list(estimates)}
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric(label="Unique Hosts", value=_metric_value(approximate, 'total_hosts'))
+            with col2:
+                st.metric(label="Unique Findings", value=_metric_value(approximate, 'total_unique_findings'))
+            with col3:
+                st.metric(label="Vulnerabilities", value=_metric_value(approximate, 'total_vulnerabilities'))
+            st.caption(f"≈ HyperLogLog estimate, relative standard error {HyperLogLog(precision()).relative_error:.2%}")
+
+    def display_findings_dashboard(self, summary):
         st.title('Findings Dashboard')
 
         # Display total unique findings
-        st.metric(label="Total Unique Findings", value=total_unique_findings)
-
-        # Create pie chart with custom colors
-        fig = px.pie(
-            findings_by_severity_df,
-            names='Severity',
-            values='Count',
-            title='Findings by Severity',
-            color='Severity',
-            color_discrete_map={
-                'Low': 'yellow',
-                'Medium': 'orange',
-                'High': 'red'
-            }
-        )
+        st.metric(label="Total Unique Findings", value=_metric_value(summary, 'total_unique_findings'))
 
-        st.plotly_chart(fig)
+        # Pie chart with custom colors, rebuilt only when the counts change
+        st.plotly_chart(figures.severity_pie(summary['findings_by_severity']))
 
-    def display_country_dashboard(self, country_count_df):
+    def display_country_dashboard(self, summary):
         st.title('Country Dashboard')
 
-        fig = px.choropleth(
-            country_count_df,
-            locations="country",
-            locationmode="country names",
-            color="count",
-            color_continuous_scale="Viridis",
-            title="Occurrences by Country",
-        )
-
+        fig, unmapped = figures.country_map(summary['country_count'])
         st.plotly_chart(fig)
-
-    def display_investigation_dashboards(self, driver):
+        if unmapped:
+            st.caption(f"Not shown on the map, unknown country: {', '.join(unmapped)}")
+
+    def display_mitigation(self, mitigations):
+        if mitigations['type'] == 'ansible':
+            st.subheader('Ansible Playbook')
+            st.markdown(mitigations['description'])
+            st.code(mitigations['content'], language='yaml')
+            st.warning("This code is AI generated, please verify it! It can negatively impact the production environment! Just use it as a starting point!")
+        else:
+            st.subheader('Manual Mitigation')
+            st.markdown(mitigations['content'])
+
+    def display_host_ranking(self, driver, key, include_na=False, cve=None, search=None):
+        """
+        Paged host risk ranking with type, state and provider filters. Pages are
+        fetched on demand with keyset pagination, so only the visible page is loaded.
+        """
+        options = driver.get_host_filter_options()
+        col1, col2, col3, col4 = st.columns([2, 2, 2, 1])
+        with col1:
+            types = st.multiselect('Type', options['types'], key=f'{key}_types')
+        with col2:
+            states = st.multiselect('State', options['states'], key=f'{key}_states')
+        with col3:
+            providers = st.multiselect('Provider', options['providers'], key=f'{key}_providers')
+        with col4:
+            page_size = st.selectbox('Rows', [25, 50, 100, 250], key=f'{key}_page_size')
+
+        # Cursors of the pages visited so far, reset whenever the query changes
+        query = (types, states, providers, page_size, include_na, cve, search)
+        pager_key = f'{key}_pager'
+        if pager_key not in st.session_state or st.session_state[pager_key]['query'] != query:
+            st.session_state[pager_key] = {'query': query, 'cursors': [None]}
+        cursors = st.session_state[pager_key]['cursors']
+
+        page = driver.get_host_risk_page(cursors[-1], page_size, types, states, providers, include_na, cve, search)
+        st.dataframe(page, hide_index=True, use_container_width=True)
+
+        col1, col2, col3 = st.columns([1, 1, 4])
+        with col1:
+            if st.button('◀ Previous', key=f'{key}_previous', disabled=len(cursors) == 1):
+                cursors.pop()
+                st.rerun()
+        with col2:
+            if st.button('Next ▶', key=f'{key}_next', disabled=len(page) < page_size):
+                last = page.iloc[-1]
+                cursors.append((cursor_value(last['Total_Risk_Score']), cursor_value(last['ID'])))
+                st.rerun()
+        with col3:
+            st.caption(f'Page {len(cursors)}')
+
+    def display_blast_radius(self, driver, cve):
+        """
+        Every host and application affected by one or more CVEs, including hosts
+        reached through applications and shared software, with the full host list.
+        """
+        col1, col2, col3 = st.columns([3, 1, 1])
+        with col1:
+            cves = st.text_input('CVEs', value=cve, key=f'blast_radius_cves_{cve}', help='Comma separated')
+        with col2:
+            via_software = st.checkbox('Include shared software', value=True, key='blast_radius_software')
+        with col3:
+            min_share = st.slider('Min. software share', 0.1, 1.0, 0.5, 0.05, key='blast_radius_min_share',
+                                  disabled=not via_software)
+        if not st.toggle('Compute blast radius', key='blast_radius'):
+            return
+
+        cves = [c.strip().upper() for c in cves.split(',') if c.strip()]
+        report = driver.get_blast_radius(cves, via_software, min_share)
+        if report is None:
+            st.info('The graph snapshot is being built in the background. Try again in a few minutes.')
+            return
+        if report['unknown_cves']:
+            st.warning(f"Not found in the graph: {', '.join(report['unknown_cves'])}")
+        as_of = time.strftime('%Y-%m-%d %H:%M', time.localtime(report['as_of']))
+        refreshing = '; a newer snapshot is being built' if report.get('refreshing') else ''
+        st.caption(f'Computed on the graph snapshot as of {as_of}{refreshing}')
+
+        counts = dict(zip(report['by_exposure']['Exposure'], report['by_exposure']['count']))
+        col1, col2, col3, col4, col5 = st.columns(5)
+        col1.metric('Affected Hosts', report['total_systems'])
+        col2.metric('With Finding', counts['Finding'])
+        col3.metric('Via Application', counts['Application'])
+        col4.metric('Via Shared Software', counts['Software'])
+        col5.metric('Affected Applications', report['total_applications'])
+        if not report['total_systems']:
+            return
+
+        col1, col2, col3 = st.columns(3)
+        for col, key, column, title in ((col1, 'by_country', 'country', 'Affected Hosts by Country'),
+                                        (col2, 'by_provider', 'Provider', 'Affected Hosts by Provider'),
+                                        (col3, 'by_risk_level', 'risk_level', 'Affected Hosts by Risk Level')):
+            with col:
+                fig = px.bar(report[key], x=column, y='count', color='Exposure', title=title)
+                st.plotly_chart(fig, use_container_width=True)
+
+        st.dataframe(report['systems'], hide_index=True, use_container_width=True)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown('**Applications**')
+            st.dataframe(report['applications'], hide_index=True, use_container_width=True)
+        with col2:
+            st.markdown('**Suspect Software**')
+            st.dataframe(report['suspect_software'], hide_index=True, use_container_width=True)
+
+    def display_investigation_dashboards(self, driver, async_driver=None):
         if 'button_state' not in st.session_state:
             st.session_state.button_state = False
 
@@ -99,12 +226,15 @@ class Dashboard:
                 if st.button('🔄 Reset Sequences'):
                     st.session_state.sequences = [{}]
 
+            # The catalog is loaded once and cached, so the cascade below runs without queries
+            catalog = driver.get_software_catalog()
+
             # Iterate through sequences and dynamically build selection boxes
             for idx, sequence in enumerate(st.session_state.sequences):
                 st.markdown(f"**Sequence {idx + 1}**")
 
                 # Select Publisher
-                publishers = driver.get_publishers()
+                publishers = catalog.publishers()
                 selected_publisher = st.selectbox(
                     f"Publisher for Sequence {idx + 1}",
                     options=[''] + publishers,
@@ -115,7 +245,7 @@ class Dashboard:
                     st.session_state.sequences[idx]['publisher'] = selected_publisher
 
                     # Select Product
-                    products = driver.get_products(selected_publisher)
+                    products = catalog.products(selected_publisher)
                     selected_product = st.selectbox(
                         f"Product for Sequence {idx + 1}",
                         options=[''] + products,
@@ -126,7 +256,7 @@ class Dashboard:
                         st.session_state.sequences[idx]['product'] = selected_product
 
                         # Select Version Range
-                        versions = driver.get_versions(selected_publisher, selected_product)
+                        versions = catalog.versions(selected_publisher, selected_product)
                         selected_min_version = st.selectbox(
                             f"Minimum Version for Sequence {idx + 1}",
                             options=[''] + versions,
@@ -137,7 +267,8 @@ class Dashboard:
                         if selected_min_version:
                             st.session_state.sequences[idx]['min_version'] = selected_min_version
                             # Remove versions that are less than the selected min version
-                            versions = [version for version in versions if version >= selected_min_version]
+                            min_key = version_key(selected_min_version)
+                            versions = [version for version in versions if version_key(version) >= min_key]
 
                         selected_max_version = st.selectbox(
                             f"Maximum Version for Sequence {idx + 1}",
@@ -153,83 +284,63 @@ class Dashboard:
             # Execute the search when ready
             if st.button('Execute Search'):
                 # Collect data for search
-                publishers = [seq.get('publisher') for seq in st.session_state.sequences if 'publisher' in seq]
-                products = [seq.get('product') for seq in st.session_state.sequences if 'product' in seq]
-                min_versions = [seq.get('min_version') for seq in st.session_state.sequences if 'min_version' in seq]
-                max_versions = [seq.get('max_version') for seq in st.session_state.sequences if 'max_version' in seq]
-
-                table, pie_df = driver.advanced_search(publishers, products, min_versions, max_versions)
+                # Keep the lists aligned per sequence, with None for unset fields
+                selected = [seq for seq in st.session_state.sequences if 'publisher' in seq]
+                publishers = [seq['publisher'] for seq in selected]
+                products = [seq.get('product') for seq in selected]
+                min_versions = [seq.get('min_version') for seq in selected]
+                max_versions = [seq.get('max_version') for seq in selected]
+                # Kept in session state so the result survives paging reruns
+                st.session_state.advanced_search = (publishers, products, min_versions, max_versions)
+
+            if st.session_state.get('advanced_search'):
+                search = st.session_state.advanced_search
+                table, pie_df = driver.advanced_search(*search)
                 if not include_na_filtered and 'risk_level' in table.columns:
                     pie_df = pie_df[pie_df['risk_level'] != 'N/A']
-                    table = table[table['risk_level'] != 'N/A']
-                fig = px.pie(
-                    pie_df,
-                    names='risk_level',
-                    values='count',
-                    title='Host Criticality',
-                    color='risk_level',
-                    color_discrete_map={
-                        'N/A': 'green',
-                        'Low': 'yellow',
-                        'Medium': 'orange',
-                        'High': 'red',
-                        'Critical': 'darkred',
-                    },
-                )
-                st.plotly_chart(fig)
-                st.table(table)
+                st.plotly_chart(figures.risk_level_pie(pie_df))
+                self.display_host_ranking(driver, 'advanced_search', include_na_filtered, search=search)
 
 
         else:
             if re.match(r'^CVE-\d{4}-\d{4,}$', search_cve):
                 st.subheader(f'Filtering Systems by {search_cve}')
-                table_df, pie_df = driver.get_systems_by_cve_vulnerability(search_cve)
-
-                fig = px.pie(
-                    pie_df,
-                    names='risk_level',
-                    values='count',
-                    title='Host Criticality',
-                    color='risk_level',
-                    color_discrete_map={
-                        'N/A': 'green',
-                        'Low': 'yellow',
-                        'Medium': 'orange',
-                        'High': 'red',
-                        'Critical': 'darkred',
-                    },
-                )
-                st.plotly_chart(fig)
-                st.table(table_df)
+                if async_driver is not None:
+                    (_, pie_df), mitigation = async_driver.gather(
+                        async_driver.get_systems_by_cve_vulnerability(search_cve),
+                        async_driver.get_mitigation(search_cve),
+                    )
+                else:
+                    _, pie_df = driver.get_systems_by_cve_vulnerability(search_cve)
+                    mitigation = driver.get_mitigation(search_cve)
+
+                st.plotly_chart(figures.risk_level_pie(pie_df))
+                self.display_host_ranking(driver, 'cve', include_na=True, cve=search_cve)
+
+                if mitigation is not None:
+                    with st.expander('Mitigation'):
+                        self.display_mitigation(mitigation)
+
+                st.subheader('Blast Radius')
+                self.display_blast_radius(driver, search_cve)
             elif search_cve != '🔍 Search CVE':
                 st.subheader('Showing all Systems')
                 # Handle non-specific search
-                host_criticality_count_df = driver.get_host_criticality_count()
-                host_criticality_df = driver.get_host_criticality()
+                if async_driver is not None:
+                    host_criticality_count_df, _ = async_driver.gather(
+                        async_driver.get_host_criticality_count(),
+                        async_driver.get_host_filter_options(),
+                    )
+                else:
+                    host_criticality_count_df = driver.get_host_criticality_count()
 
                 include_na = st.checkbox('Include N/A', value=False)
                 if not include_na:
                     host_criticality_count_df = host_criticality_count_df[
                         host_criticality_count_df['risk_level'] != 'N/A'
                         ]
-                    host_criticality_df = host_criticality_df[host_criticality_df['risk_level'] != 'N/A']
-
-                fig = px.pie(
-                    host_criticality_count_df,
-                    names='risk_level',
-                    values='count',
-                    title='Host Criticality',
-                    color='risk_level',
-                    color_discrete_map={
-                        'N/A': 'green',
-                        'Low': 'yellow',
-                        'Medium': 'orange',
-                        'High': 'red',
-                        'Critical': 'darkred',
-                    },
-                )
-                st.plotly_chart(fig)
 
-                st.subheader('Top 10 Hosts by Criticality')
-                host_criticality_df = host_criticality_df.head(10)
-                st.table(host_criticality_df)
+                st.plotly_chart(figures.risk_level_pie(host_criticality_count_df))
+
+                st.subheader('Hosts by Criticality')
+                self.display_host_ranking(driver, 'all_systems', include_na)
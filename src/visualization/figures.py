@@ -0,0 +1,89 @@
+"""
+Plotly figures of the dashboards, memoized on the content of their data.
+
+Streamlit reruns the whole page on every widget interaction. The builders here
+hash the input DataFrame (values, columns and dtypes) and keep the finished
+figure in ``st.cache_resource``, shared by all sessions, so a rerun whose data
+did not change reuses the figure instead of building it again. Cached figures
+are shared and must not be modified by callers.
+"""
+import hashlib
+
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from visualization.countries import iso3
+
+FIGURE_CACHE_ENTRIES = 256
+
+SEVERITY_COLORS = {
+    'Low': 'yellow',
+    'Medium': 'orange',
+    'High': 'red',
+}
+
+RISK_LEVEL_COLORS = {
+    'N/A': 'green',
+    'Low': 'yellow',
+    'Medium': 'orange',
+    'High': 'red',
+    'Critical': 'darkred',
+}
+
+
+def frame_digest(frame):
+    """Content hash of a DataFrame, independent of its index."""
+    digest = hashlib.sha1()
+    digest.update(repr([(str(c), str(t)) for c, t in frame.dtypes.items()]).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(frame, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+# The frame is excluded from Streamlit's argument hashing (leading underscore);
+# the digest stands in for it.
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def _pie(digest, _frame, names, values, title, colors):
+    return px.pie(
+        _frame,
+        names=names,
+        values=values,
+        title=title,
+        color=names,
+        color_discrete_map=dict(colors),
+    )
+
+
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def _country_map(digest, _frame, title):
+    frame = _frame.assign(iso3=_frame['country'].map(iso3))
+    return px.choropleth(
+        frame.dropna(subset=['iso3']),
+        locations='iso3',
+        locationmode='ISO-3',
+        color='count',
+        hover_name='country',
+        color_continuous_scale='Viridis',
+        title=title,
+    )
+
+
+def severity_pie(frame):
+    return _pie(frame_digest(frame), frame, 'Severity', 'Count', 'Findings by Severity',
+                tuple(SEVERITY_COLORS.items()))
+
+
+def risk_level_pie(frame, title='Host Criticality'):
+    return _pie(frame_digest(frame), frame, 'risk_level', 'count', title, tuple(RISK_LEVEL_COLORS.items()))
+
+
+def country_map(frame, title='Occurrences by Country'):
+    """
+    Choropleth of a ``country``/``count`` frame with ISO-3 locations.
+
+    Returns:
+        tuple: ``(figure, unmapped)``, where ``unmapped`` lists the country names
+        the lookup table does not know.
+    """
+    unmapped = sorted({str(c) for c in frame['country'] if iso3(c) is None})
+    return _country_map(frame_digest(frame), frame, title), unmapped
@@ -0,0 +1,24 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip('neo4j')
+
+from database.frames import cursor_value, records_to_frame  # noqa: E402
+from database.ingest import prepare_findings  # noqa: E402
+from database.queries import HOST_COLUMNS  # noqa: E402
+
+
+def test_host_ids_of_ingested_rows_round_trip_as_cursors():
+    # As read from CSV: every value is a string
+    systems = prepare_findings([{'system_id': '42'}, {'system_id': 'host-7'}])['systems']
+    page = records_to_frame(
+        [(s['id'], 'VM', None, 'running', pd.NA, 10 - i, 'Low') for i, s in enumerate(systems)], HOST_COLUMNS)
+    cursors = [(cursor_value(row['Total_Risk_Score']), cursor_value(row['ID'])) for _, row in page.iterrows()]
+    assert cursors == [(10, 42), (9, 'host-7')]
+    assert [type(value) for cursor in cursors for value in cursor] == [int, int, int, str]
+
+
+def test_missing_values_become_none():
+    assert cursor_value(pd.NA) is None
+    assert cursor_value(float('nan')) is None
+    assert cursor_value(None) is None
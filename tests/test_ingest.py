@@ -0,0 +1,33 @@
+import pytest
+
+pytest.importorskip('neo4j')
+
+from database.ingest import prepare_findings, prepare_software  # noqa: E402
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2', 2), (3, 3), ('1.0', 1), (True, 1), ('TRUE', 1), ('yes', 1), ('FALSE', 0), ('No', 0), (' ', 0),
+])
+def test_critical_accepts_numbers_and_flags(value, expected):
+    batch = prepare_findings([{'system_id': 1, 'critical': value}])
+    assert batch['systems'][0]['props']['critical'] == expected
+
+
+def test_unparseable_critical_is_left_unset():
+    batch = prepare_findings([{'system_id': 1, 'critical': 'high', 'system_type': 'VM'}])
+    assert batch['systems'][0]['props'] == {'type': 'VM'}
+
+
+def test_software_rows_without_a_full_key_are_skipped():
+    rows = prepare_software([
+        {'system_id': 1, 'publisher': 'OpenSSL', 'product': 'openssl', 'version': '3.0.2'},
+        {'system_id': 1, 'publisher': 'OpenSSL', 'product': 'openssl'},
+        {'system_id': 2, 'product': 'curl', 'version': '8.0'},
+    ])
+    assert [(r['system_id'], r['version']) for r in rows] == [(1, '3.0.2')]
+
+
+def test_system_ids_keep_the_graphs_integer_type():
+    batch = prepare_findings([{'system_id': '42'}, {'system_id': 7}, {'system_id': ' host-1 '}, {'system_id': '007'}])
+    assert [s['id'] for s in batch['systems']] == [42, 7, 'host-1', '007']
+    assert prepare_software([{'system_id': '42', 'publisher': 'a', 'product': 'b', 'version': '1'}])[0]['system_id'] == 42
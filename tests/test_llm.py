@@ -0,0 +1,101 @@
+"""
+Mitigation parsing and the streaming repair path, against a local stub of the
+OpenAI-compatible chat completions endpoint that ``[GROQ] BASE_URL`` points to.
+"""
+import http.server
+import json
+import threading
+
+import pytest
+
+pytest.importorskip('groq')
+
+from mitigations import llm  # noqa: E402
+
+VALID = {'type': 'Ansible', 'content': '---\n- hosts: all', 'description': 'Patch it'}
+
+
+def test_partial_json_fields_returns_the_fields_streamed_so_far():
+    assert llm.partial_json_fields('{"type": "manual", "description": "Block the po') == {
+        'type': 'manual',
+        'description': 'Block the po',
+    }
+    assert llm.partial_json_fields('no object yet') == {}
+
+
+def test_repair_json_fixes_fences_raw_newlines_and_truncation():
+    assert llm.repair_json('```json\n{"type": "manual", "content": "line 1\nline 2", "description": "x",}\n```') == {
+        'type': 'manual',
+        'content': 'line 1\nline 2',
+        'description': 'x',
+    }
+    assert llm.repair_json('{"type": "manual", "content": "cut') == {'type': 'manual', 'content': 'cut'}
+    assert llm.repair_json('no json here') is None
+
+
+def test_validate_mitigation_normalizes_type_and_rejects_incomplete_answers():
+    mitigation = dict(VALID)
+    assert llm.validate_mitigation(mitigation)
+    assert mitigation['type'] == 'ansible'
+    assert not llm.validate_mitigation({'type': 'manual', 'content': 'x'})
+    assert not llm.validate_mitigation({'type': 'reboot', 'content': 'x', 'description': 'y'})
+    assert not llm.validate_mitigation(None)
+
+
+def test_streamed_type_is_normalized_like_the_final_answer():
+    assert llm.normalize_type(llm.partial_json_fields('{"type": " Manual ", "content": "1. Cl')['type']) == 'manual'
+    assert llm.normalize_type(None) is None
+
+
+class _StubHandler(http.server.BaseHTTPRequestHandler):
+    """Streams ``server.chunks`` as server-sent chat completion deltas."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        for chunk in self.server.chunks:
+            event = {
+                'id': 'stub',
+                'object': 'chat.completion.chunk',
+                'created': 0,
+                'model': llm.MODEL,
+                'choices': [{'index': 0, 'delta': {'content': chunk}, 'finish_reason': None}],
+            }
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_llm(monkeypatch):
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv('GROQ_BASE_URL', f'http://127.0.0.1:{server.server_port}')
+    monkeypatch.setenv('GROQ_API_KEY', 'stub')
+    llm.get_groq_client.cache_clear()
+    yield server
+    server.shutdown()
+    llm.get_groq_client.cache_clear()
+
+
+def test_streamed_answer_is_repaired_and_reported_as_it_arrives(stub_llm):
+    # Raw newline inside a string and a trailing comma: invalid JSON, repaired locally
+    stub_llm.chunks = ['{"type": "Manual", ', '"content": "1. Close\n2. Patch", ', '"description": "Close the port",}']
+    updates = []
+    mitigation = llm._generate('CVE details', retries=0, on_update=updates.append, update_interval=0)
+    assert mitigation == {'type': 'manual', 'content': '1. Close\n2. Patch', 'description': 'Close the port'}
+    assert updates[0] == {'type': 'Manual'}
+    assert updates[-1]['description'] == 'Close the port'
+
+
+def test_unrepairable_answer_is_logged_truncated(stub_llm, caplog):
+    stub_llm.chunks = ['{"type": "manual", ', '"content": "' + 'x' * 1000 + '"}']
+    assert llm._generate('CVE details', retries=0, on_update=lambda fields: None) is None
+    message = caplog.records[-1].getMessage()
+    assert message.startswith('Invalid mitigation, 0 retries left.')
+    assert len(message) < llm.LOGGED_CONTENT_CHARS + 100
@@ -0,0 +1,34 @@
+import json
+
+from mitigations.cache import MitigationCache, mitigation_key
+
+
+def _response(timestamp, description='Buffer overflow'):
+    return json.dumps({
+        'resultsPerPage': 1,
+        'format': 'NVD_CVE',
+        'version': '2.0',
+        'timestamp': timestamp,
+        'vulnerabilities': [{'cve': {'id': 'CVE-2024-0001', 'descriptions': [{'lang': 'en', 'value': description}]}}],
+    })
+
+
+def test_key_ignores_the_response_timestamp():
+    first = mitigation_key('CVE-2024-0001', _response('2026-10-18T10:00:00.000'), 'model', 1)
+    second = mitigation_key('cve-2024-0001 ', _response('2026-10-18T10:05:12.345'), 'model', 1)
+    assert first == second
+
+
+def test_key_changes_with_the_cve_record_model_and_prompt():
+    key = mitigation_key('CVE-2024-0001', _response('t'), 'model', 1)
+    assert mitigation_key('CVE-2024-0001', _response('t', 'Use after free'), 'model', 1) != key
+    assert mitigation_key('CVE-2024-0001', _response('t'), 'other', 1) != key
+    assert mitigation_key('CVE-2024-0001', _response('t'), 'model', 2) != key
+    assert mitigation_key('CVE-2024-0001', 'plain text details', 'model', 1) != key
+
+
+def test_cached_mitigation_is_found_under_a_later_response(tmp_path):
+    cache = MitigationCache(path=str(tmp_path / 'mitigations.sqlite3'))
+    mitigation = {'type': 'manual', 'content': 'Patch', 'description': 'Update the package'}
+    cache.put(mitigation_key('CVE-2024-0001', _response('t1'), 'model', 1), 'CVE-2024-0001', 'model', 1, mitigation)
+    assert cache.get(mitigation_key('CVE-2024-0001', _response('t2'), 'model', 1)) == mitigation
@@ -0,0 +1,102 @@
+"""
+Bulk CVE enrichment against a local stub of the NVD CVE API that ``base_url``
+points to.
+"""
+import http.server
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+pytest.importorskip('requests')
+
+from database import nist  # noqa: E402
+
+
+class _StubHandler(http.server.BaseHTTPRequestHandler):
+    """Answers after ``server.delay`` seconds; CVEs in ``server.missing`` get a 404."""
+
+    def do_GET(self):
+        server = self.server
+        cve = parse_qs(urlparse(self.path).query)['cveId'][0]
+        with server.lock:
+            server.arrivals.append(time.monotonic())
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            time.sleep(server.delay)
+            status = 404 if cve in server.missing else 200
+            body = f'{{"cve": "{cve}"}}'.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_nvd():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    server.lock = threading.Lock()
+    server.arrivals = []
+    server.active = server.max_active = 0
+    server.delay = 0.0
+    server.missing = set()
+    server.url = f'http://127.0.0.1:{server.server_port}/rest/json/cves/2.0'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+
+
+def _enrich(server, cves, **kwargs):
+    kwargs.setdefault('requests_per_window', 1000)
+    kwargs.setdefault('window', 1.0)
+    return nist.enrich_cves(cves, base_url=server.url, api_key='stub', use_mirror=False, max_retries=0,
+                            backoff=0.01, timeout=5.0, **kwargs)
+
+
+def test_requests_run_concurrently_up_to_max_workers(stub_nvd):
+    stub_nvd.delay = 0.5
+    cves = [f'CVE-2024-{i:04d}' for i in range(8)]
+    results = list(_enrich(stub_nvd, cves + cves[:2], max_workers=4))
+    assert sorted(cve for cve, _, _ in results) == cves
+    assert all(details == f'{{"cve": "{cve}"}}' and error is None for cve, details, error in results)
+    assert stub_nvd.max_active == 4
+
+
+def test_requests_are_paced_by_the_window_limit(stub_nvd):
+    list(_enrich(stub_nvd, [f'CVE-2024-{i:04d}' for i in range(6)], max_workers=4,
+                 requests_per_window=5, window=0.5))
+    gaps = [b - a for a, b in zip(stub_nvd.arrivals, stub_nvd.arrivals[1:])]
+    assert len(stub_nvd.arrivals) == 6
+    assert min(gaps) >= 0.08
+    assert stub_nvd.arrivals[-1] - stub_nvd.arrivals[0] >= 0.45
+
+
+def test_failed_lookups_are_logged_and_yielded(stub_nvd, caplog):
+    stub_nvd.missing = {'CVE-2024-0002'}
+    results = {cve: (details, error) for cve, details, error in
+               _enrich(stub_nvd, ['CVE-2024-0001', 'CVE-2024-0002'])}
+    assert results['CVE-2024-0002'] == (None, 'HTTP 404')
+    assert results['CVE-2024-0001'][1] is None
+    assert [r.getMessage() for r in caplog.records] == ['NVD lookup of CVE-2024-0002 failed: HTTP 404']
+
+
+def test_closing_the_job_early_stops_queued_lookups(stub_nvd):
+    # One request per 0.5s: all but the first few lookups are still queued
+    results = _enrich(stub_nvd, [f'CVE-2024-{i:04d}' for i in range(20)], max_workers=2,
+                      requests_per_window=2, window=1.0)
+    next(results)
+    started = time.monotonic()
+    results.close()
+    assert time.monotonic() - started < 0.2
+    time.sleep(1.2)
+    assert len(stub_nvd.arrivals) <= 4
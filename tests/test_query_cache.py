@@ -0,0 +1,57 @@
+import asyncio
+
+from database.cache import QueryCache, cached
+
+
+class _Reader:
+    def __init__(self, cache, during=None):
+        self.cache = cache
+        self.during = during
+        self.calls = 0
+
+    @cached
+    def read(self, value):
+        self.calls += 1
+        if self.during is not None:
+            self.during()
+        return value
+
+    @cached
+    async def read_async(self, value):
+        self.calls += 1
+        if self.during is not None:
+            self.during()
+        return value
+
+
+def test_results_are_served_from_the_cache():
+    reader = _Reader(QueryCache())
+    assert reader.read(1) == reader.read(1) == 1
+    assert reader.calls == 1
+
+
+def test_result_computed_across_an_invalidation_is_not_stored():
+    cache = QueryCache()
+    reader = _Reader(cache, during=cache.invalidate)
+    assert reader.read(1) == 1
+    assert cache.get(('read', (1,), ()), check_version=False) == (False, None)
+    assert asyncio.run(reader.read_async(2)) == 2
+    assert cache.stats()['entries'] == 0
+
+
+def test_result_computed_across_a_data_version_change_is_not_stored():
+    versions = iter([1, 2])
+    cache = QueryCache(version_loader=lambda: next(versions), version_check_interval=0)
+    reader = _Reader(cache, during=cache.check_version)
+    reader.read(1)
+    assert cache.stats()['data_version'] == 2
+    assert cache.stats()['entries'] == 0
+
+
+def test_failed_version_check_keeps_serving_cached_results():
+    def fail():
+        raise ConnectionError('database unavailable')
+
+    cache = QueryCache(version_loader=fail, version_check_interval=0)
+    cache.put('key', 'value')
+    assert cache.get('key') == (True, 'value')
@@ -0,0 +1,69 @@
+from contextlib import contextmanager
+
+import pytest
+
+pytest.importorskip('neo4j')
+
+from database import risk  # noqa: E402
+
+
+class _Result(list):
+    def single(self):
+        return self[0] if self else None
+
+
+class _Graph:
+    """Answers the queries of ``database.risk`` from an in-memory version and dirty set."""
+
+    def __init__(self, version, dirty):
+        self.version = version
+        self.dirty = list(dirty)
+        self.queries = []
+        self.bumps = 0
+
+    def run(self, query, **params):
+        self.queries.append(query)
+        if 'DataVersion' in query:
+            return _Result([{'version': self.version}])
+        if query == risk.DIRTY_SYSTEMS:
+            return _Result({'id': id} for id in self.dirty)
+        if 'UNWIND $ids' in query:
+            scored = [id for id in params['ids'] if id in self.dirty]
+            self.dirty = [id for id in self.dirty if id not in scored]
+            return _Result([{'updated': len(scored)}])
+        raise AssertionError(f'unexpected query: {query}')
+
+    def execute_write(self, work, *args):
+        if work is risk.bump_data_version:
+            self.bumps += 1
+            return None
+        return work(self, *args)
+
+    @contextmanager
+    def session(self):
+        yield self
+
+
+@pytest.fixture(autouse=True)
+def unchecked():
+    risk._checked_version = object()
+
+
+def test_flagged_hosts_are_scored_without_bumping_the_data_version():
+    graph = _Graph(version=3, dirty=['a', 'b'])
+    assert risk.ensure_risk_scores(graph) == 2
+    assert graph.dirty == []
+    assert graph.bumps == 0
+
+
+def test_read_path_only_seeks_flagged_hosts_once_per_data_version():
+    graph = _Graph(version=3, dirty=[])
+    assert risk.ensure_risk_scores(graph) == 0
+    assert risk.ensure_risk_scores(graph) == 0
+    assert graph.queries.count(risk.DIRTY_SYSTEMS) == 1
+    assert risk.STALE_SYSTEMS not in graph.queries
+
+    graph.version = 4
+    graph.dirty = ['c']
+    assert risk.ensure_risk_scores(graph) == 1
+    assert graph.queries.count(risk.DIRTY_SYSTEMS) == 2
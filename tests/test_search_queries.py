@@ -0,0 +1,27 @@
+import pytest
+
+pytest.importorskip('neo4j')
+
+from database.queries import advanced_search_query, host_risk_page, search_parameters, search_sequences  # noqa: E402
+
+
+def test_sequences_are_grouped_by_the_bounds_they_set():
+    shapes, parameters = search_parameters(search_sequences(
+        ['a', 'b', 'c'], ['x', None, 'z'], ['1.0', None, None], [None, None, '2.0']))
+    assert shapes == ('publisher', 'publisher_product_max', 'publisher_product_min')
+    assert [seq['publisher'] for seq in parameters['search_publisher']] == ['b']
+    assert [seq['publisher'] for seq in parameters['search_publisher_product_min']] == ['a']
+    assert [seq['publisher'] for seq in parameters['search_publisher_product_max']] == ['c']
+
+
+def test_search_queries_only_test_the_bounds_that_are_present():
+    shapes, _ = search_parameters(search_sequences(['a', 'b'], ['x', None], ['1.0', None], ['2.0', None]))
+    for query in (advanced_search_query(shapes), host_risk_page('search', True, shapes)):
+        assert 'IS NULL OR' not in query.split('WITH DISTINCT s')[0]
+        assert 'MATCH (n:SoftwareInstallation {publisher: seq.publisher, product: seq.product})' in query
+        assert 'WHERE n.version_key >= seq.min_key AND n.version_key <= seq.max_key' in query
+        assert 'MATCH (n:SoftwareInstallation {publisher: seq.publisher})\n' in query
+
+
+def test_empty_search_still_binds_its_parameter():
+    assert search_parameters([]) == (('publisher',), {'search_publisher': []})
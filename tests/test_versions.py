@@ -0,0 +1,18 @@
+from database.versions import sort_versions, version_key
+
+
+def test_release_order_is_numeric():
+    assert version_key('9.1') < version_key('10.0')
+    assert version_key('1.2') == version_key('1.2.0')
+    assert version_key('v2.0') == version_key('2.0')
+
+
+def test_pre_releases_sort_before_and_revisions_after_the_release():
+    assert sort_versions(['1.3', '1.2-4ubuntu3', '1.2', '1.2-rc1', '1.2.0.1', '1.2-10', '1.2beta2']) == [
+        '1.2beta2', '1.2-rc1', '1.2', '1.2-4ubuntu3', '1.2-10', '1.2.0.1', '1.3',
+    ]
+
+
+def test_build_metadata_is_ignored_and_missing_versions_have_no_key():
+    assert version_key('1.2+build.5') == version_key('1.2')
+    assert version_key(None) is None